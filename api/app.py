@@ -1,11 +1,15 @@
 """Flask应用入口"""
 import atexit
 import logging
+import logging.handlers
 import os
+import queue
 
 from flask import Flask, jsonify
+from flask.logging import default_handler
 from flask_cors import CORS
 from flask_restful import Api
+from sqlalchemy import event
 
 from .config import config
 from .controllers.chat_controller import (
@@ -40,10 +44,14 @@ from .controllers.model_controller import (
 from .models.model import db
 from .utils.exceptions import APIError
 from .utils.helpers import format_error_response
+from .utils.serialization import FastJSONProvider, output_json
 from .utils.event_queue import init_event_queue, shutdown_event_queue
 from .websockets import init_socketio
 from .websockets.broadcast_ws import init_websocket_event_system
 from .services.monitor_service import start_monitoring, stop_monitoring
+from .services.health_scheduler import start_health_scheduler, stop_health_scheduler
+from .services.deployment_service import clear_request_deployment_cache
+from .services.notification_service import notification_service
 
 
 def create_app(config_name=None):
@@ -105,11 +113,56 @@ def setup_logging(app):
         file_handler.setFormatter(file_formatter)
         app.logger.addHandler(file_handler)
 
+    # 日志处理器的I/O交给后台线程，记录日志的线程只需入队
+    _use_queue_handlers(logging.getLogger())
+    _use_queue_handlers(app.logger)
+
+
+# 后台日志监听器，进程退出时停止并刷新剩余日志
+_log_listeners = []
+
+
+def _use_queue_handlers(target_logger):
+    """将日志器现有的处理器移到QueueListener后台线程中执行"""
+    # Flask的默认处理器依赖请求上下文中的wsgi.errors，保留在原线程
+    handlers = [h for h in target_logger.handlers
+                if h is not default_handler and not isinstance(h, logging.handlers.QueueHandler)]
+    if not handlers:
+        return
+
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    for handler in handlers:
+        target_logger.removeHandler(handler)
+    target_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener.start()
+    _log_listeners.append(listener)
+
+
+def stop_log_listeners():
+    """停止后台日志监听器"""
+    while _log_listeners:
+        _log_listeners.pop().stop()
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """SQLite使用WAL日志，提交时不再每次fsync，由检查点统一落盘"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.close()
+
 
 def setup_extensions(app):
     """初始化扩展"""
+    # 使用orjson序列化JSON响应
+    app.json = FastJSONProvider(app)
+
     # 初始化数据库
     db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _set_sqlite_pragmas)
 
     # 初始化CORS
     CORS(app, resources={
@@ -120,25 +173,32 @@ def setup_extensions(app):
         }
     })
 
-    # 初始化事件队列
-    init_event_queue()
-
     # 初始化WebSocket
     socketio = init_socketio(app)
     app.socketio = socketio
 
+    # 初始化事件队列，监听器作为Socket.IO后台任务运行
+    init_event_queue(spawn=socketio.start_background_task)
+
     # 初始化WebSocket事件系统
     init_websocket_event_system()
 
     # 启动统一监控服务
     start_monitoring(app)
 
+    # 部署健康检查调度只在API服务进程中启动（见run.py），Celery worker等导入应用的进程不启动
+
     # 注册应用关闭时的清理函数
     @app.teardown_appcontext
     def cleanup_event_queue(exception):
         """应用上下文结束时清理事件队列"""
         if exception:
             app.logger.error(f"Application context ended with exception: {exception}")
+
+    @app.teardown_request
+    def cleanup_request_caches(exception):
+        """请求结束时清理请求级缓存"""
+        clear_request_deployment_cache()
     
     # 注册进程退出时的清理函数
     def shutdown_cleanup():
@@ -146,9 +206,14 @@ def setup_extensions(app):
         try:
             stop_monitoring()
             app.logger.info("Unified monitoring stopped")
+
+            stop_health_scheduler()
+            app.logger.info("Deployment health scheduler stopped")
             
             shutdown_event_queue()
             app.logger.info("Event queue shutdown completed")
+
+            stop_log_listeners()
         except Exception as e:
             app.logger.error(f"Error during shutdown cleanup: {e}")
     
@@ -159,6 +224,7 @@ def setup_routes(app):
     """设置路由"""
     # 创建API实例
     api = Api(app)
+    api.representations['application/json'] = output_json
 
     # 健康检查端点
     @app.route('/health')
@@ -375,6 +441,12 @@ app = create_app()
 if __name__ == '__main__':
     # 直接运行时的配置
     port = int(os.getenv('PORT', 5000))
+    # 调试模式下只在重载器启动的子进程中运行后台任务
+    if not (app.config.get('DEBUG', False) and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'):
+        if app.config.get('DEPLOYMENT_HEALTH_SCHEDULER_ENABLED', True):
+            start_health_scheduler(app)
+        # 通知发件箱只在负责广播的API服务进程中启用
+        notification_service.start_outbox(app)
     app.socketio.run(
         app,
         host='0.0.0.0',
@@ -32,6 +32,32 @@ class Config:
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # 数据库连接池配置，API请求和Celery任务并发时避免连接池耗尽
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 20))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # 获取连接的最长等待秒数
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # 连接回收秒数
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True
+    }
+
+    # Celery worker进程的连接池：每个子进程同时只执行一个任务，连接池较小；
+    # 按较短的回收时间替换连接，不在每次取出连接时执行ping
+    WORKER_DB_POOL_SIZE = int(os.environ.get('WORKER_DB_POOL_SIZE', 5))
+    WORKER_DB_MAX_OVERFLOW = int(os.environ.get('WORKER_DB_MAX_OVERFLOW', 10))
+    WORKER_DB_POOL_RECYCLE = int(os.environ.get('WORKER_DB_POOL_RECYCLE', 300))
+    WORKER_SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': WORKER_DB_POOL_SIZE,
+        'max_overflow': WORKER_DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': WORKER_DB_POOL_RECYCLE,
+        'pool_pre_ping': False
+    }
+
     # Redis配置
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
 
@@ -47,15 +73,43 @@ class Config:
     # HuggingFace配置
     HUGGINGFACE_TOKEN = os.environ.get('HUGGINGFACE_TOKEN')
     HUGGINGFACE_CACHE_TTL = int(os.environ.get('HUGGINGFACE_CACHE_TTL', 3600))  # 1小时
+    HF_DOWNLOAD_MAX_WORKERS = int(os.environ.get('HF_DOWNLOAD_MAX_WORKERS', min(16, (os.cpu_count() or 1) * 2)))  # snapshot_download并发下载的文件数
 
     # Ollama配置
     OLLAMA_BASE_URL = os.environ.get('OLLAMA_BASE_URL') or 'http://localhost:11434'
     OLLAMA_CACHE_TTL = int(os.environ.get('OLLAMA_CACHE_TTL', 3600))  # 1小时
 
+    # 模型目录配置
+    MODEL_CATALOG_CACHE_TTL = int(os.environ.get('MODEL_CATALOG_CACHE_TTL', 300))  # 分类和热门模型缓存秒数
+
     # 分页配置
     DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 20))
     MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 100))
 
+    # 下载配置
+    DOWNLOAD_LIST_CACHE_TTL = int(os.environ.get('DOWNLOAD_LIST_CACHE_TTL', 3))  # 下载列表Redis缓存秒数
+    STORAGE_SIZE_CACHE_TTL = int(os.environ.get('STORAGE_SIZE_CACHE_TTL', 30))  # 下载目录大小Redis缓存秒数
+    DOWNLOAD_PROGRESS_COMMIT_INTERVAL = float(os.environ.get('DOWNLOAD_PROGRESS_COMMIT_INTERVAL', 2.0))  # 下载进度写库最小间隔秒数
+    DOWNLOAD_PROGRESS_COMMIT_DELTA = float(os.environ.get('DOWNLOAD_PROGRESS_COMMIT_DELTA', 1.0))  # 进度增量达到该百分比时立即写库
+    DOWNLOAD_STOP_FLAG_TTL = int(os.environ.get('DOWNLOAD_STOP_FLAG_TTL', 3600))  # 暂停/取消标记在Redis中的保留秒数
+    DOWNLOAD_STATUS_CHECK_INTERVAL = float(os.environ.get('DOWNLOAD_STATUS_CHECK_INTERVAL', 30))  # 下载任务查询数据库确认状态的间隔秒数
+    DOWNLOAD_PROGRESS_FLUSH_INTERVAL = float(os.environ.get('DOWNLOAD_PROGRESS_FLUSH_INTERVAL', 0.1))  # 下载进度合并推送间隔秒数
+
+    # 部署配置
+    DEPLOYMENT_STATUS_CACHE_TTL = float(os.environ.get('DEPLOYMENT_STATUS_CACHE_TTL', 2))  # 容器状态缓存秒数
+    DEPLOYMENT_HEALTH_SCHEDULER_ENABLED = os.environ.get('DEPLOYMENT_HEALTH_SCHEDULER_ENABLED', 'true').lower() == 'true'  # API服务进程是否启动后台健康检查
+    DEPLOYMENT_HEALTH_CHECK_INTERVAL = float(os.environ.get('DEPLOYMENT_HEALTH_CHECK_INTERVAL', 10))  # 后台健康检查间隔秒数
+    DEPLOYMENT_HEALTH_CACHE_TTL = float(os.environ.get('DEPLOYMENT_HEALTH_CACHE_TTL', 30))  # 健康检查结果缓存秒数
+    DEPLOYMENT_HEALTH_FANOUT_SIZE = int(os.environ.get('DEPLOYMENT_HEALTH_FANOUT_SIZE', 50))  # 批量健康检查超过该数量时按块分发到多个worker
+    DEPLOYMENT_LOG_STREAM_THRESHOLD = int(os.environ.get('DEPLOYMENT_LOG_STREAM_THRESHOLD', 1000))  # 超过该行数时流式返回日志
+
+    # WebSocket配置
+    SOCKETIO_ASYNC_MODE = os.environ.get('SOCKETIO_ASYNC_MODE', 'threading')  # threading/eventlet/gevent，协程模式需在启动前打补丁
+    SOCKETIO_LOGGER = os.environ.get('SOCKETIO_LOGGER', 'false').lower() == 'true'  # 记录每个Socket.IO/Engine.IO数据包
+
+    # 通知配置
+    NOTIFICATION_OUTBOX_ENABLED = os.environ.get('NOTIFICATION_OUTBOX_ENABLED', 'true').lower() == 'true'  # 推送前先写入发件箱表，仅API服务进程启用
+
 
 class DevelopmentConfig(Config):
     """开发环境配置"""
@@ -76,6 +130,10 @@ class TestingConfig(Config):
     """测试环境配置"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # 内存SQLite使用单连接池，不支持连接池大小配置
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # 内存SQLite每个连接是独立的数据库，推送线程无法使用发件箱表
+    NOTIFICATION_OUTBOX_ENABLED = False
 
 
 # 配置字典
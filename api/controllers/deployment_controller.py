@@ -1,12 +1,13 @@
 import logging
 
-from flask import request
+from flask import Response, request, stream_with_context
 from flask_restful import Resource
 
+from ..config import Config
 from ..services.deployment_service import DeploymentService
 from ..services.system_service import SystemService
 from ..utils.exceptions import APIError
-from ..utils.helpers import success_response, error_response
+from ..utils.helpers import success_response, success_response_json, error_response
 from ..utils.validators import validate_json
 
 logger = logging.getLogger(__name__)
@@ -35,6 +36,17 @@ class DeploymentStartController(Resource):
             deployment = deployment_service.create_deployment(model_id, source, name, config)
             result = deployment_service.start_deployment(deployment.id)
 
+            # vLLM部署在后台等待就绪时返回202，客户端轮询部署状态
+            if result.get('status') == 'deploying':
+                return success_response(
+                    data={
+                        "deployment": deployment.to_dict(),
+                        "result": result
+                    },
+                    message="部署启动中",
+                    code=202
+                ), 202
+
             return success_response(
                 data={
                     "deployment": deployment.to_dict(),
@@ -166,6 +178,13 @@ class DeploymentLogsController(Resource):
                 return error_response("日志行数必须在1-10000之间", code='INVALID_LINES'), 400
 
             deployment_service = DeploymentService()
+
+            # 行数较多或显式要求时流式返回纯文本，避免缓冲全部日志
+            stream = request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+            if stream or lines > Config.DEPLOYMENT_LOG_STREAM_THRESHOLD:
+                log_stream = deployment_service.stream_deployment_logs(deployment_id, lines)
+                return Response(stream_with_context(log_stream), mimetype='text/plain')
+
             logs_info = deployment_service.get_deployment_logs(deployment_id, lines)
 
             return success_response(
@@ -188,6 +207,13 @@ class DeploymentHealthController(Resource):
         """检查部署健康状态"""
         try:
             deployment_service = DeploymentService()
+
+            # 命中后台调度器缓存时直接返回预序列化的结果
+            health_json = deployment_service.get_cached_health_json(deployment_id)
+            if health_json is not None:
+                body = success_response_json(health_json, message="健康检查完成")
+                return Response(body, mimetype='application/json')
+
             health_info = deployment_service.check_deployment_health(deployment_id)
 
             return success_response(
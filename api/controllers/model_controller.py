@@ -2,12 +2,12 @@
 import logging
 from urllib.parse import unquote
 
-from flask import request, current_app
+from flask import Response, request, current_app
 from flask_restful import Resource
 
 from ..services.model_service import ModelService
 from ..utils.exceptions import ValidationError, ModelNotFoundError, ExternalServiceError
-from ..utils.helpers import format_response, format_error_response
+from ..utils.helpers import format_response, format_response_bytes, format_error_response
 from ..utils.validators import validate_model_id
 
 logger = logging.getLogger(__name__)
@@ -48,10 +48,9 @@ class ModelController:
             models_count = len(result.get('items', []))
             logger.info(f"Search completed, returning {models_count} models")
 
-            return format_response(
-                data=result,
-                message="Search successful"
-            )
+            # 搜索结果较大，直接序列化为字节串返回，不再经过Flask-RESTful的表示层
+            body = format_response_bytes(data=result, message="Search successful")
+            return Response(body, mimetype='application/json')
 
         except ValidationError as e:
             logger.warning(f"Parameter validation failed: {e.message}")
@@ -2,7 +2,7 @@ import fnmatch
 import logging
 import os
 import re
-from typing import Dict, List, Optional, Any, Callable
+from typing import Dict, Iterator, List, Optional, Any, Callable
 
 from huggingface_hub import HfApi, snapshot_download
 from huggingface_hub.utils import HfHubHTTPError
@@ -193,9 +193,14 @@ class HuggingFaceClient:
 
     def get_trending_models(self, limit: int = 10) -> List[Dict]:
         """获取热门模型"""
-        try:
-            logger.info(f"Get trending HuggingFace models: limit={limit}")
+        logger.info(f"Get trending HuggingFace models: limit={limit}")
+        results = list(self.iter_trending_models(limit))
+        logger.info(f"Successfully got {len(results)} trending models")
+        return results
 
+    def iter_trending_models(self, limit: int = 10) -> Iterator[Dict]:
+        """逐个产出热门模型，list_models本身是分页生成器，调用方可边取边处理"""
+        try:
             # 获取更多模型用于筛选，确保能返回足够的高质量模型
             fetch_limit = max(limit * 2, 50)
 
@@ -207,7 +212,6 @@ class HuggingFaceClient:
                 full=True
             )
 
-            results = []
             processed_count = 0
 
             for model in models:
@@ -218,23 +222,19 @@ class HuggingFaceClient:
                         continue
 
                     model_info = self._convert_model_info(model)
-                    results.append(model_info)
-                    processed_count += 1
-
-                    # 达到所需数量就停止
-                    if processed_count >= limit:
-                        break
-
                 except Exception as e:
                     logger.warning(f"Failed to convert model info: {getattr(model, 'id', 'unknown')}, error: {e}")
                     continue
 
-            logger.info(f"Successfully got {len(results)} trending models")
-            return results
+                yield model_info
+                processed_count += 1
+
+                # 达到所需数量就停止
+                if processed_count >= limit:
+                    break
 
         except Exception as e:
             logger.error(f"Failed to get trending models: {e}")
-            return []
 
     def _convert_model_info(self, model_info, detailed: bool = False) -> Dict:
         """转换模型信息为标准格式"""
@@ -391,7 +391,8 @@ class HuggingFaceClient:
             progress_callback: Optional[Callable] = None,
             allow_patterns: Optional[List[str]] = None,
             ignore_patterns: Optional[List[str]] = None,
-            resume_download: bool = True
+            resume_download: bool = True,
+            max_workers: Optional[int] = None
     ) -> Dict[str, Any]:
         """
         使用snapshot_download方法下载模型
@@ -403,6 +404,7 @@ class HuggingFaceClient:
             allow_patterns: 允许下载的文件模式（如 ["*.json", "*.bin"]）
             ignore_patterns: 忽略的文件模式（如 ["*.msgpack", "*.h5"]）
             resume_download: 是否支持断点续传
+            max_workers: 并发下载的文件数，未指定时使用huggingface_hub的默认值
             
         Returns:
             下载结果信息
@@ -484,6 +486,8 @@ class HuggingFaceClient:
                 download_kwargs['allow_patterns'] = allow_patterns
             if ignore_patterns:
                 download_kwargs['ignore_patterns'] = ignore_patterns
+            if max_workers:
+                download_kwargs['max_workers'] = max_workers
 
             # 执行下载
             logger.info(f"Starting to download model files to: {local_dir}")
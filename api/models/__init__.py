@@ -2,5 +2,6 @@ from .chat import ChatSession, ChatMessage
 from .deployment import Deployment
 from .download_task import DownloadTask
 from .model import Model
+from .notification_outbox import NotificationOutbox
 
-__all__ = ['Model', 'DownloadTask', 'Deployment', 'ChatSession', 'ChatMessage']
+__all__ = ['Model', 'DownloadTask', 'Deployment', 'ChatSession', 'ChatMessage', 'NotificationOutbox']
@@ -1,10 +1,30 @@
 from datetime import datetime
+from functools import lru_cache
 
-from sqlalchemy import Column, String, Text, DateTime, Integer
+from sqlalchemy import Column, String, Text, DateTime, Integer, Index, func, select, update
 from sqlalchemy.dialects.postgresql import JSON
 
 from .model import db
 
+# 服务端点路径模板
+ENDPOINT_PATHS = {
+    'health': '/health',
+    'tags': '/api/tags',
+    'api_base': '/v1',
+    'chat_completions': '/v1/chat/completions',
+    'completions': '/v1/completions',
+    'models': '/v1/models',
+}
+
+
+@lru_cache(maxsize=256)
+def _build_endpoints(host, port):
+    """按主机和端口构建服务端点URL（结果只读共享，不要修改）"""
+    base = f"http://{host}:{port}"
+    endpoints = {name: base + path for name, path in ENDPOINT_PATHS.items()}
+    endpoints['base'] = base
+    return endpoints
+
 
 class Deployment(db.Model):
     """部署信息表"""
@@ -52,6 +72,20 @@ class Deployment(db.Model):
     deployed_at = Column(DateTime, comment='部署时间')
     stopped_at = Column(DateTime, comment='停止时间')
 
+    # 周期任务按状态筛选部署（运行中/活跃部署、超时的失败部署）
+    __table_args__ = (
+        Index('idx_deployment_status_updated_at', 'status', 'updated_at'),
+    )
+
+    # to_dict输出的字段及其中需要格式化的时间字段
+    DICT_FIELDS = (
+        'id', 'model_id', 'model_source', 'name', 'description', 'status', 'port', 'host',
+        'gpu_device', 'cpu_cores', 'memory_limit', 'container_id', 'image_name', 'config',
+        'environment', 'health_check_url', 'last_health_check', 'health_status',
+        'created_at', 'updated_at', 'deployed_at', 'stopped_at',
+    )
+    DATETIME_FIELDS = frozenset(('last_health_check', 'created_at', 'updated_at', 'deployed_at', 'stopped_at'))
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             if hasattr(self, key):
@@ -134,12 +168,64 @@ class Deployment(db.Model):
         self.last_health_check = datetime.utcnow()
         self.updated_at = datetime.utcnow()
         
-        # 只有健康状态变为不健康时才触发事件
-        if status == 'unhealthy' and old_health_status != 'unhealthy':
+        self.notify_health_change(old_health_status)
+
+    def notify_health_change(self, old_health_status):
+        """健康状态更新后调用，只有变为不健康时才触发事件"""
+        if self.health_status == 'unhealthy' and old_health_status != 'unhealthy':
             self._trigger_state_event('health_check_failed',
                                     health_check_time=self.last_health_check.isoformat(),
                                     previous_status=old_health_status)
 
+    @classmethod
+    def bulk_update_health(cls, buckets, checked_at):
+        """按健康状态分组批量更新，每个状态一条UPDATE语句（不提交）
+
+        Args:
+            buckets: 健康状态 -> 部署ID列表
+            checked_at: 检查时间
+        """
+        for status, deployment_ids in buckets.items():
+            if not deployment_ids:
+                continue
+            db.session.execute(
+                update(cls)
+                .where(cls.id.in_(deployment_ids))
+                .values(health_status=status, last_health_check=checked_at, updated_at=checked_at)
+            )
+
+    @classmethod
+    def list_as_dicts(cls, filters=None, offset=0, limit=20):
+        """只读列表查询：按列读取并直接序列化，跳过ORM对象构建
+
+        Returns:
+            (部署字典列表, 总数)；页码越界没有返回行时总数为None
+        """
+        columns = cls.__table__.c
+        stmt = (
+            select(*[columns[field] for field in cls.DICT_FIELDS], func.count().over().label('total'))
+            .where(*(filters or []))
+            .order_by(columns.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        rows = db.session.execute(stmt).mappings().all()
+        total = rows[0]['total'] if rows else None
+        return [cls._row_to_dict(row) for row in rows], total
+
+    @classmethod
+    def _row_to_dict(cls, row):
+        """将查询行转换为与to_dict一致的字典"""
+        result = {}
+        for field in cls.DICT_FIELDS:
+            value = row[field]
+            if field in cls.DATETIME_FIELDS:
+                value = value.isoformat() if value else None
+            elif field in ('config', 'environment'):
+                value = value or {}
+            result[field] = value
+        return result
+
     @classmethod
     def get_active_deployments(cls):
         """获取活跃的部署"""
@@ -168,6 +254,11 @@ class Deployment(db.Model):
         """检查是否健康"""
         return self.health_status == 'healthy'
 
+    @property
+    def endpoints(self):
+        """服务端点URL，按(host, port)缓存"""
+        return _build_endpoints(self.host, self.port)
+
     def get_service_url(self):
         """获取服务URL"""
         if self.port and self.host:
@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, String, DECIMAL, DateTime
+from sqlalchemy import Column, String, DECIMAL, DateTime, Index, func, select
 
 from .model import db
 
@@ -36,6 +36,20 @@ class DownloadTask(db.Model):
     started_at = Column(DateTime, comment='开始时间')
     completed_at = Column(DateTime, comment='完成时间')
 
+    # 索引
+    __table_args__ = (
+        Index('idx_download_task_status_created_at', 'status', created_at.desc()),
+        Index('idx_download_task_model', 'model_id', 'model_source'),
+    )
+
+    # to_dict输出的字段及其中需要格式化的时间字段
+    DICT_FIELDS = (
+        'id', 'model_id', 'model_source', 'status', 'progress', 'download_size', 'total_size',
+        'download_speed', 'file_path', 'created_at', 'updated_at', 'started_at', 'completed_at',
+    )
+    DATETIME_FIELDS = frozenset(('created_at', 'updated_at', 'started_at', 'completed_at'))
+    ACTIVE_STATUSES = ('pending', 'downloading', 'paused')
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             if hasattr(self, key):
@@ -122,11 +136,64 @@ class DownloadTask(db.Model):
         self._trigger_state_event('download_cancelled',
                                 cancelled_at=self.updated_at.isoformat())
 
+    @classmethod
+    def list_as_dicts(cls, filters=None, offset=0, limit=20):
+        """只读列表查询：按列读取并直接序列化，跳过ORM对象构建
+
+        Returns:
+            (任务字典列表, 总数)；页码越界没有返回行时总数为None
+        """
+        columns = cls.__table__.c
+        stmt = (
+            select(*[columns[field] for field in cls.DICT_FIELDS], func.count().over().label('total'))
+            .where(*(filters or []))
+            .order_by(columns.created_at.desc())
+            .offset(offset)
+            .limit(limit)
+        )
+        rows = db.session.execute(stmt).mappings().all()
+        total = rows[0]['total'] if rows else None
+        return [cls._row_to_dict(row) for row in rows], total
+
+    @classmethod
+    def active_as_dicts(cls):
+        """只读查询活跃的下载任务，直接返回字典"""
+        columns = cls.__table__.c
+        stmt = select(*[columns[field] for field in cls.DICT_FIELDS]).where(
+            columns.status.in_(cls.ACTIVE_STATUSES)
+        )
+        return [cls._row_to_dict(row) for row in db.session.execute(stmt).mappings()]
+
+    @classmethod
+    def count_active_by_status(cls):
+        """按状态统计活跃任务数量: status -> count"""
+        stmt = (
+            select(cls.status, func.count())
+            .where(cls.status.in_(cls.ACTIVE_STATUSES))
+            .group_by(cls.status)
+        )
+        return dict(db.session.execute(stmt).all())
+
+    @classmethod
+    def _row_to_dict(cls, row):
+        """将查询行转换为与to_dict一致的字典"""
+        result = {}
+        for field in cls.DICT_FIELDS:
+            value = row[field]
+            if field in cls.DATETIME_FIELDS:
+                value = value.isoformat() if value else None
+            elif field in ('progress', 'download_speed'):
+                value = float(value) if value else 0
+            elif field == 'download_size':
+                value = value or 0
+            result[field] = value
+        return result
+
     @classmethod
     def get_active_tasks(cls):
         """获取活跃的下载任务"""
         return cls.query.filter(
-            cls.status.in_(['pending', 'downloading', 'paused'])
+            cls.status.in_(cls.ACTIVE_STATUSES)
         ).all()
 
     @classmethod
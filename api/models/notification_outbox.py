@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from sqlalchemy import Column, String, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSON
+
+from .model import db
+
+
+class NotificationOutbox(db.Model):
+    """通知发件箱表
+
+    通知推送前先批量写入此表，广播到客户端后删除；进程崩溃后残留的记录在API服务下次启动时重新推送
+    """
+    __tablename__ = 'notification_outbox'
+
+    # 主键（即通知ID）
+    id = Column(String(64), primary_key=True, comment='通知ID')
+
+    # 完整的通知内容
+    payload = Column(JSON, nullable=False, comment='通知内容，JSON格式存储')
+
+    # 时间戳
+    created_at = Column(DateTime, default=datetime.utcnow, comment='写入时间')
+
+    # 索引
+    __table_args__ = (
+        Index('idx_notification_outbox_created_at', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.id}>'
@@ -1,12 +1,26 @@
+import asyncio
+import itertools
 import logging
 import os
+import socket
 import subprocess
+import threading
 import time
 import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from functools import lru_cache
+from typing import Optional, Dict, Any, Iterator, List, Tuple
 
+import docker
+import httpx
 import requests
+from docker.errors import NotFound
+from flask import current_app, has_request_context
+from requests.adapters import HTTPAdapter
+from sqlalchemy import update
 
 from ..config import Config
 from ..models.deployment import Deployment
@@ -19,13 +33,146 @@ from ..utils.exceptions import (
     ConflictError,
     APIError
 )
+from ..utils.serialization import dumps_bytes
 
 logger = logging.getLogger(__name__)
 
+# 请求级部署对象缓存: deployment_id -> Deployment，请求结束时清空
+_request_deployments: ContextVar[Optional[Dict[str, Deployment]]] = ContextVar(
+    'request_deployments', default=None
+)
+
+
+def _create_health_session() -> requests.Session:
+    """创建复用连接的健康检查会话"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def _tail(path: str, n: int, chunk: int = 8192) -> List[str]:
+    """从文件末尾向前读取最后n行（类似 tail -n），读取量与输出大小成正比"""
+    if n <= 0:
+        return []
+
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # 需要 n+1 个换行符才能确定第n行的起点（末尾换行不算一行）
+        while position > 0 and data.count(b'\n') <= n:
+            read_size = min(chunk, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+
+    return data.decode(errors='replace').splitlines(keepends=True)[-n:]
+
+
+# 传递给部署子进程的环境变量白名单及前缀
+_CHILD_ENV_KEYS = ('PATH', 'HOME', 'USER', 'LANG', 'LC_ALL', 'TMPDIR', 'LD_LIBRARY_PATH',
+                   'PYTHONPATH', 'VIRTUAL_ENV', 'CONDA_PREFIX', 'CUDA_VISIBLE_DEVICES')
+_CHILD_ENV_PREFIXES = ('CUDA_', 'NCCL_', 'HF_', 'HUGGING_FACE_', 'TRANSFORMERS_', 'VLLM_', 'TORCH_')
+
+
+def _build_process_env(gpu_device: Optional[str] = None) -> Dict[str, str]:
+    """构建部署子进程所需的最小环境变量，避免复制整个父进程环境"""
+    env = {
+        key: value for key, value in os.environ.items()
+        if key in _CHILD_ENV_KEYS or key.startswith(_CHILD_ENV_PREFIXES)
+    }
+    if gpu_device is not None:
+        env['CUDA_VISIBLE_DEVICES'] = str(gpu_device)
+    return env
+
+
+# 影响vLLM启动命令的部署配置项，顺序与 _vllm_cmd_for 参数一致
+_VLLM_CONFIG_KEYS = ('gpu_memory_utilization', 'max_model_len', 'tensor_parallel_size', 'dtype')
+
+
+def _cmd_arg(value: Any) -> Optional[str]:
+    """配置值转为命令行参数，空值返回None"""
+    return str(value) if value else None
+
+
+@lru_cache(maxsize=128)
+def _vllm_cmd_for(model_path: str, host: str, port: int, model_id: str,
+                  gpu_memory_utilization: Optional[str], max_model_len: Optional[str],
+                  tensor_parallel_size: Optional[str], dtype: Optional[str]) -> Tuple[str, ...]:
+    """构建vLLM启动命令，按模型路径、地址和配置缓存"""
+    cmd = [
+        'python', '-m', 'vllm.entrypoints.openai.api_server',
+        '--model', model_path,
+        '--host', host,
+        '--port', str(port),
+        '--served-model-name', model_id,
+        # 添加内存配置，默认使用80%的GPU内存
+        '--gpu-memory-utilization', gpu_memory_utilization or '0.8'
+    ]
+
+    # 添加最大模型长度配置
+    if max_model_len:
+        cmd.extend(['--max-model-len', max_model_len])
+
+    # 添加其他vLLM配置
+    if tensor_parallel_size:
+        cmd.extend(['--tensor-parallel-size', tensor_parallel_size])
+
+    # 自动选择数据类型
+    cmd.extend(['--dtype', dtype or 'auto'])
+
+    # 启用OpenAI兼容API
+    cmd.extend(['--enable-lora', '--enable-prefix-caching'])
+    return tuple(cmd)
+
+
+def _port_is_bindable(port: int) -> bool:
+    """尝试绑定端口以确认其空闲"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(('', port))
+            return True
+        except OSError:
+            return False
+
+
+def clear_request_deployment_cache():
+    """清空请求级部署对象缓存"""
+    _request_deployments.set(None)
+
 
 class DeploymentService:
     """部署服务"""
 
+    # 容器/进程状态缓存，在所有服务实例间共享: container_id -> (检查时间, 是否存活)
+    _status_cache: Dict[str, Tuple[float, bool]] = {}
+    _status_cache_lock = threading.Lock()
+
+    # 健康检查HTTP会话（keep-alive连接池），在所有服务实例间共享
+    _health_session = _create_health_session()
+
+    # Docker客户端，首次使用时创建并在所有服务实例间共享
+    _docker_client = None
+    _docker_client_lock = threading.Lock()
+
+    # 健康检查结果缓存，由后台调度器定期刷新: deployment_id -> (检查时间, 结果, 预序列化JSON)
+    _health_cache: Dict[str, Tuple[float, Dict[str, Any], bytes]] = {}
+    _health_cache_lock = threading.Lock()
+
+    # 后台等待部署就绪的线程池
+    _startup_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='DeploymentStartup')
+
+    # 自动分配的端口范围及预扫描的空闲端口池，由后台线程补充
+    PORT_RANGE = (8000, 9000)
+    PORT_RESERVE_SECONDS = 60
+    _port_pool: deque = deque(maxlen=32)
+    _port_pool_lock = threading.Lock()
+    _port_refill_thread: Optional[threading.Thread] = None
+    # 最近分配但可能尚未监听的端口: port -> 分配时间
+    _reserved_ports: Dict[int, float] = {}
+
     def __init__(self):
         self.system_service = SystemService()
         self.deployments_path = Config.MODELS_PATH
@@ -70,6 +217,7 @@ class DeploymentService:
 
             db.session.add(deployment)
             db.session.commit()
+            self._remember_deployment(deployment)
 
             logger.info(f"Created deployment: {deployment_id} for {model_id}")
             return deployment
@@ -81,94 +229,173 @@ class DeploymentService:
 
     def start_deployment(self, deployment_id: str) -> Dict[str, Any]:
         """启动部署"""
-        deployment = Deployment.query.get(deployment_id)
-        if not deployment:
-            raise NotFoundError(f"部署 {deployment_id} 不存在")
+        return self._start_deployment_inner(self._get_deployment(deployment_id))
 
+    def _start_deployment_inner(self, deployment: Deployment) -> Dict[str, Any]:
+        """启动已加载的部署"""
+        deployment_id = deployment.id
         if deployment.status in ['running', 'deploying']:
             raise ValidationError(f"部署状态 {deployment.status} 不能启动")
 
         try:
+            # 状态变更留在会话中，待启动结果确定后统一提交一次
             deployment.start_deployment()
-            db.session.commit()
-
-
 
             # 根据模型源启动服务
             if deployment.model_source == 'huggingface':
-                result = self._start_huggingface_deployment(deployment)
+                result = self._launch_vllm_process(deployment)
+                if result.get('success'):
+                    return self._wait_vllm_in_background(deployment, result)
             elif deployment.model_source == 'ollama':
                 result = self._start_ollama_deployment(deployment)
             else:
                 raise ValidationError(f"不支持的模型源: {deployment.model_source}")
 
-            if result.get('success'):
-                deployment.complete_deployment(
-                    container_id=result.get('container_id'),
-                    port=deployment.port
-                )
-                # 设置健康检查URL - 根据模型源设置不同的URL
-                if deployment.model_source == 'huggingface':
-                    deployment.health_check_url = f"http://{deployment.host}:{deployment.port}/health"
-                elif deployment.model_source == 'ollama':
-                    deployment.health_check_url = f"http://{deployment.host}:{deployment.port}/api/tags"
+            if not self._apply_start_result(deployment, result):
+                raise APIError(f"部署启动失败: {result.get('error')}")
 
-                db.session.commit()
+            logger.info(f"Deployment started successfully: {deployment_id}")
+            return self._build_service_info(deployment)
+
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to start deployment: {str(e)}")
+            raise
 
+    def _wait_vllm_in_background(self, deployment: Deployment, launch: Dict[str, Any]) -> Dict[str, Any]:
+        """vLLM初始化耗时较长，在后台线程等待服务就绪，接口立即返回"""
+        deployment.container_id = launch['container_id']
+        db.session.commit()
 
+        self._startup_executor.submit(
+            self._finish_vllm_startup,
+            current_app._get_current_object(),
+            deployment.id,
+            launch['process'],
+            launch['log_file']
+        )
 
-                logger.info(f"Deployment started successfully: {deployment_id}")
+        logger.info(f"Deployment is starting in background: {deployment.id}")
+        return {
+            "message": "部署启动中",
+            "deployment_id": deployment.id,
+            "status": deployment.status,
+            "service_url": deployment.get_service_url()
+        }
 
-                # 构建返回的服务信息
-                service_info = {
-                    "message": "部署启动成功",
-                    "deployment_id": deployment_id,
-                    "service_url": deployment.get_service_url(),
-                    "health_url": deployment.health_check_url
-                }
+    def _finish_vllm_startup(self, app, deployment_id: str, process: subprocess.Popen, log_file: str):
+        """后台等待vLLM服务就绪并更新部署状态"""
+        with app.app_context():
+            try:
+                deployment = Deployment.query.get(deployment_id)
+                if not deployment:
+                    process.terminate()
+                    return
+
+                # 等待期间最长可达数分钟，先读出所需字段并归还连接，避免长时间占用连接池
+                port = deployment.port
+                endpoints = deployment.endpoints
+                db.session.remove()
+
+                result = self._wait_for_vllm_ready(deployment_id, port, endpoints, process, log_file)
+
+                # 仅当部署仍处于deploying且仍是本线程启动的进程时应用结果；期间已被停止、删除
+                # 或重启（container_id已换成新进程）则终止本次启动的进程，不影响新的启动
+                claimed = Deployment.query.filter(
+                    Deployment.id == deployment_id,
+                    Deployment.status == 'deploying',
+                    Deployment.container_id == str(process.pid)
+                ).update(
+                    {Deployment.status: 'running' if result.get('success') else 'failed'},
+                    synchronize_session=False
+                )
+                if not claimed:
+                    db.session.rollback()
+                    process.terminate()
+                    logger.info(f"Deployment {deployment_id} is no longer deploying, discarding startup result")
+                    return
 
-                # 如果是vLLM部署，添加OpenAI兼容的API信息
-                if deployment.model_source == 'huggingface':
-                    service_info.update({
-                        "api_base": f"http://{deployment.host}:{deployment.port}/v1",
-                        "openai_compatible": True,
-                        "endpoints": {
-                            "chat_completions": f"http://{deployment.host}:{deployment.port}/v1/chat/completions",
-                            "completions": f"http://{deployment.host}:{deployment.port}/v1/completions",
-                            "models": f"http://{deployment.host}:{deployment.port}/v1/models"
-                        }
-                    })
+                deployment = Deployment.query.get(deployment_id)
+                if self._apply_start_result(deployment, result):
+                    logger.info(f"Deployment started successfully: {deployment_id}")
+                else:
+                    logger.error(f"Deployment failed to start: {deployment_id}, {result.get('error')}")
+
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Background startup failed for deployment {deployment_id}: {str(e)}")
+
+    def _apply_start_result(self, deployment: Deployment, result: Dict[str, Any]) -> bool:
+        """根据启动结果更新部署状态并提交"""
+        self._invalidate_health(deployment.id)
+        if not result.get('success'):
+            deployment.fail_deployment(result.get('error'))
+            db.session.commit()
+            return False
 
-                return service_info
-            else:
-                deployment.fail_deployment(result.get('error'))
-                db.session.commit()
-                
+        self._invalidate_container_status(result.get('container_id'))
+        deployment.complete_deployment(
+            container_id=result.get('container_id'),
+            port=deployment.port
+        )
+        # 设置健康检查URL - 根据模型源设置不同的URL
+        if deployment.model_source == 'huggingface':
+            deployment.health_check_url = deployment.endpoints['health']
+        elif deployment.model_source == 'ollama':
+            deployment.health_check_url = deployment.endpoints['tags']
+
+        db.session.commit()
+        return True
+
+    def _build_service_info(self, deployment: Deployment) -> Dict[str, Any]:
+        """构建返回的服务信息"""
+        service_info = {
+            "message": "部署启动成功",
+            "deployment_id": deployment.id,
+            "status": deployment.status,
+            "service_url": deployment.get_service_url(),
+            "health_url": deployment.health_check_url
+        }
 
-                
-                raise APIError(f"部署启动失败: {result.get('error')}")
+        # 如果是vLLM部署，添加OpenAI兼容的API信息
+        if deployment.model_source == 'huggingface':
+            endpoints = deployment.endpoints
+            service_info.update({
+                "api_base": endpoints['api_base'],
+                "openai_compatible": True,
+                "endpoints": {
+                    "chat_completions": endpoints['chat_completions'],
+                    "completions": endpoints['completions'],
+                    "models": endpoints['models']
+                }
+            })
 
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Failed to start deployment: {str(e)}")
-            raise
+        return service_info
 
     def stop_deployment(self, deployment_id: str) -> Dict[str, Any]:
-        """停止部署"""
-        deployment = Deployment.query.get(deployment_id)
-        if not deployment:
-            raise NotFoundError(f"部署 {deployment_id} 不存在")
+        """停止部署，发出终止信号后立即返回，等待进程退出在后台完成"""
+        return self._stop_deployment_inner(self._get_deployment(deployment_id), wait=False)
+
+    def _stop_deployment_inner(self, deployment: Deployment, wait: bool = True) -> Dict[str, Any]:
+        """停止已加载的部署
 
+        wait为True时等待进程退出（优雅关闭超时后强制终止），重启、删除等需要立即复用端口和GPU的操作使用
+        """
+        deployment_id = deployment.id
         if deployment.status not in ['running', 'deploying']:
             raise ValidationError(f"部署状态 {deployment.status} 不能停止")
 
         try:
             # 停止服务
             if deployment.container_id:
-                self._stop_container(deployment.container_id)
+                stopped = self._stop_container(deployment.container_id, wait=wait)
+                self._invalidate_container_status(deployment.container_id)
+                if wait and not stopped:
+                    raise APIError(f"部署进程 {deployment.container_id} 未能停止")
 
             deployment.stop_deployment()
             db.session.commit()
+            self._invalidate_health(deployment_id)
 
             logger.info(f"Stopping deployment: {deployment_id}")
             return {"message": "部署已停止", "deployment_id": deployment_id}
@@ -180,29 +407,46 @@ class DeploymentService:
 
     def restart_deployment(self, deployment_id: str) -> Dict[str, Any]:
         """重启部署"""
-        # 先停止
-        self.stop_deployment(deployment_id)
-        time.sleep(2)  # 等待停止完成
+        deployment = self._get_deployment(deployment_id)
+
+        # 先停止并等待进程退出，再确认端口已释放；未能停止时不启动新进程
+        container_id = deployment.container_id
+        self._stop_deployment_inner(deployment)
+        if not self._wait_for_stopped(container_id, deployment.port):
+            raise APIError(f"部署 {deployment_id} 的进程或端口未释放，无法重启")
 
         # 再启动
-        return self.start_deployment(deployment_id)
+        return self._start_deployment_inner(deployment)
+
+    def _wait_for_stopped(self, container_id: Optional[str], port: Optional[int], timeout: float = 10.0) -> bool:
+        """以指数退避轮询等待进程退出、端口可重新绑定，最多等待timeout秒，返回是否已停止"""
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        while True:
+            stopped = not container_id or not self._probe_container_status(container_id)
+            if stopped and (not port or _port_is_bindable(port)):
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.warning(f"Deployment process {container_id} or port {port} not released after {timeout}s")
+                return False
+            time.sleep(min(delay, remaining))
+            delay *= 2
 
     def delete_deployment(self, deployment_id: str) -> Dict[str, Any]:
         """删除部署"""
-        deployment = Deployment.query.get(deployment_id)
-        if not deployment:
-            raise NotFoundError(f"部署 {deployment_id} 不存在")
+        deployment = self._get_deployment(deployment_id)
 
         try:
             # 如果正在运行，先停止
             if deployment.status in ['running', 'deploying']:
-                self.stop_deployment(deployment_id)
-                # 重新获取部署状态
-                deployment = Deployment.query.get(deployment_id)
+                self._stop_deployment_inner(deployment)
 
             # 删除部署记录
             db.session.delete(deployment)
             db.session.commit()
+            self._forget_deployment(deployment_id)
+            self._invalidate_health(deployment_id)
 
             logger.info(f"Deleting deployment: {deployment_id}")
             return {"message": "部署已删除", "deployment_id": deployment_id}
@@ -214,9 +458,7 @@ class DeploymentService:
 
     def get_deployment_status(self, deployment_id: str) -> Dict[str, Any]:
         """获取部署状态"""
-        deployment = Deployment.query.get(deployment_id)
-        if not deployment:
-            raise NotFoundError(f"部署 {deployment_id} 不存在")
+        deployment = self._get_deployment(deployment_id)
 
         # 获取实时状态
         if deployment.is_running():
@@ -231,21 +473,33 @@ class DeploymentService:
 
     def list_deployments(self, status: Optional[str] = None, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
         """获取部署列表"""
-        query = Deployment.query
-
-        if status:
-            query = query.filter(Deployment.status == status)
+        filters = [Deployment.status == status] if status else []
 
-        # 按创建时间倒序
-        query = query.order_by(Deployment.created_at.desc())
-
-        # 分页
+        # 分页（总数由窗口函数在同一次查询中返回）
         offset = (page - 1) * page_size
-        deployments = query.offset(offset).limit(page_size).all()
-        total = query.count()
+        deployments, total = Deployment.list_as_dicts(filters, offset, page_size)
+
+        if total is None:
+            # 页码越界时窗口函数没有返回行，单独统计总数
+            total = Deployment.query.filter(*filters).count() if offset else 0
+
+        # 批量检查运行中部署的实时状态（一次docker inspect）
+        running = [d for d in deployments if d['status'] == 'running' and d['container_id']]
+        if running:
+            statuses = self._check_container_statuses([d['container_id'] for d in running])
+            stale = [d for d in running if not statuses.get(d['container_id'], False)]
+            if stale:
+                db.session.execute(
+                    update(Deployment)
+                    .where(Deployment.id.in_([d['id'] for d in stale]))
+                    .values(status='stopped')
+                )
+                db.session.commit()
+                for deployment in stale:
+                    deployment['status'] = 'stopped'
 
         return {
-            "deployments": [deployment.to_dict() for deployment in deployments],
+            "deployments": deployments,
             "pagination": {
                 "page": page,
                 "page_size": page_size,
@@ -256,9 +510,7 @@ class DeploymentService:
 
     def get_deployment_logs(self, deployment_id: str, lines: int = 100) -> Dict[str, Any]:
         """获取部署日志"""
-        deployment = Deployment.query.get(deployment_id)
-        if not deployment:
-            raise NotFoundError(f"部署 {deployment_id} 不存在")
+        deployment = self._get_deployment(deployment_id)
 
         try:
             logs = []
@@ -270,8 +522,7 @@ class DeploymentService:
                 # 获取进程日志（如果有日志文件）
                 log_file = os.path.join(self.deployments_path, f"{deployment_id}.log")
                 if os.path.exists(log_file):
-                    with open(log_file, 'r') as f:
-                        logs = f.readlines()[-lines:]
+                    logs = _tail(log_file, lines)
 
             return {
                 "deployment_id": deployment_id,
@@ -288,11 +539,41 @@ class DeploymentService:
                 "error": str(e)
             }
 
+    def stream_deployment_logs(self, deployment_id: str, lines: int = 100) -> Iterator[str]:
+        """流式获取部署日志，每次产出一行文本"""
+        deployment = self._get_deployment(deployment_id)
+
+        if deployment.container_id:
+            source = self._iter_container_logs(deployment.container_id, lines)
+        else:
+            log_file = os.path.join(self.deployments_path, f"{deployment_id}.log")
+            source = iter(_tail(log_file, lines)) if os.path.exists(log_file) else iter(())
+
+        def generate():
+            try:
+                for line in source:
+                    yield line if line.endswith('\n') else line + '\n'
+            except NotFound:
+                return
+            except Exception as e:
+                logger.error(f"Failed to stream deployment logs: {str(e)}")
+
+        return generate()
+
     def check_deployment_health(self, deployment_id: str) -> Dict[str, Any]:
-        """检查部署健康状态"""
-        deployment = Deployment.query.get(deployment_id)
-        if not deployment:
-            raise NotFoundError(f"部署 {deployment_id} 不存在")
+        """检查部署健康状态，优先返回后台调度器缓存的结果"""
+        cached = self._get_cached_health(deployment_id)
+        if cached is not None:
+            return cached
+
+        deployment = self._get_deployment(deployment_id)
+        result = self._probe_deployment_health(deployment)
+        self._cache_health(deployment_id, result)
+        return result
+
+    def _probe_deployment_health(self, deployment: Deployment) -> Dict[str, Any]:
+        """实时检查单个部署的健康状态并写入数据库"""
+        deployment_id = deployment.id
 
         try:
             if deployment.status != 'running':
@@ -324,16 +605,14 @@ class DeploymentService:
             if deployment.model_source == 'huggingface':
                 # vLLM健康检查
                 try:
-                    health_url = f"http://{deployment.host}:{deployment.port}/health"
-                    response = requests.get(health_url, timeout=10)
+                    response = self._health_session.get(deployment.endpoints['health'], timeout=10)
                     if response.status_code == 200:
                         healthy = True
                         response_data = response.json()
 
                     # 额外检查模型端点
                     if healthy:
-                        models_url = f"http://{deployment.host}:{deployment.port}/v1/models"
-                        models_response = requests.get(models_url, timeout=5)
+                        models_response = self._health_session.get(deployment.endpoints['models'], timeout=5)
                         if models_response.status_code == 200:
                             models_data = models_response.json()
                             response_data['models'] = models_data.get('data', [])
@@ -346,8 +625,7 @@ class DeploymentService:
             elif deployment.model_source == 'ollama':
                 # Ollama健康检查
                 try:
-                    health_url = f"http://{deployment.host}:{deployment.port}/api/tags"
-                    response = requests.get(health_url, timeout=10)
+                    response = self._health_session.get(deployment.endpoints['tags'], timeout=10)
                     healthy = response.status_code == 200
                     if healthy:
                         response_data = response.json()
@@ -388,6 +666,168 @@ class DeploymentService:
                 "last_check": deployment.last_health_check.isoformat() if deployment.last_health_check else None
             }
 
+    def check_all_health(self, deployment_ids: Optional[List[str]] = None,
+                         deployments: Optional[List[Deployment]] = None,
+                         probe_only: bool = False) -> List[Dict[str, Any]]:
+        """并发检查多个部署的健康状态，默认检查所有运行中的部署
+
+        调用方已加载部署对象时通过deployments传入，不再重复查询。
+        probe_only为True时只检查服务端口、更新健康状态，不检查进程/容器、不把部署标记为已停止，
+        供不在部署所在主机上运行的进程（如Celery worker）使用
+        """
+        if deployments is None:
+            query = Deployment.query
+            if deployment_ids:
+                query = query.filter(Deployment.id.in_(deployment_ids))
+            else:
+                query = query.filter(Deployment.status == 'running')
+            deployments = query.all()
+
+        # 批量检查进程/容器是否存在
+        container_statuses = {} if probe_only else self._check_container_statuses(
+            [d.container_id for d in deployments if d.status == 'running' and d.container_id]
+        )
+
+        now = datetime.utcnow()
+        last_check = now.isoformat()
+        results = {}
+        health_buckets: Dict[str, List[str]] = {'healthy': [], 'unhealthy': []}
+        to_probe = []
+        stale = []
+        for deployment in deployments:
+            if deployment.status != 'running':
+                health_buckets['unhealthy'].append(deployment.id)
+                results[deployment.id] = {
+                    "deployment_id": deployment.id,
+                    "healthy": False,
+                    "status": deployment.status,
+                    "last_check": last_check
+                }
+            elif (not probe_only and deployment.container_id
+                  and not container_statuses.get(deployment.container_id, False)):
+                health_buckets['unhealthy'].append(deployment.id)
+                stale.append((deployment.id, deployment.container_id))
+                results[deployment.id] = {
+                    "deployment_id": deployment.id,
+                    "healthy": False,
+                    "error": "进程不存在",
+                    "last_check": last_check
+                }
+            else:
+                to_probe.append(deployment)
+
+        # 进程已退出的部署在探测前立即标记为停止并提交，不在会话中跨越探测窗口；
+        # 条件中保留status和container_id，期间已被重启的部署不受影响
+        if stale:
+            for deployment_id, container_id in stale:
+                db.session.execute(
+                    update(Deployment)
+                    .where(Deployment.id == deployment_id,
+                           Deployment.status == 'running',
+                           Deployment.container_id == container_id)
+                    .values(status='stopped')
+                )
+            db.session.commit()
+
+        # 并发检查服务端口
+        if to_probe:
+            probes = asyncio.run(self._check_health_async(to_probe))
+            for deployment, (healthy, response_data) in zip(to_probe, probes):
+                health_buckets['healthy' if healthy else 'unhealthy'].append(deployment.id)
+                result = {
+                    "deployment_id": deployment.id,
+                    "healthy": healthy,
+                    "port_accessible": healthy,
+                    "last_check": last_check
+                }
+                if response_data:
+                    result["response"] = response_data
+                results[deployment.id] = result
+
+        # 每种健康状态一条UPDATE，再统一提交；会话中的对象由UPDATE同步，不会再逐行刷新
+        previous_health = {deployment.id: deployment.health_status for deployment in deployments}
+        Deployment.bulk_update_health(health_buckets, now)
+        for deployment in deployments:
+            deployment.notify_health_change(previous_health[deployment.id])
+
+        db.session.commit()
+
+        for deployment_id, result in results.items():
+            self._cache_health(deployment_id, result)
+        return [results[deployment.id] for deployment in deployments]
+
+    async def _check_health_async(self, deployments: List[Deployment]) -> List[Tuple[bool, Optional[Dict]]]:
+        """使用同一个异步HTTP客户端并发检查多个部署"""
+        limits = httpx.Limits(max_connections=100)
+        async with httpx.AsyncClient(timeout=10, limits=limits) as client:
+            return await asyncio.gather(
+                *(self._probe_health_async(client, deployment) for deployment in deployments)
+            )
+
+    async def _probe_health_async(self, client: httpx.AsyncClient,
+                                  deployment: Deployment) -> Tuple[bool, Optional[Dict]]:
+        """异步检查单个部署的服务端口"""
+        endpoints = deployment.endpoints
+        try:
+            if deployment.model_source == 'huggingface':
+                # vLLM健康检查，同时请求模型端点
+                health_response, models_response = await asyncio.gather(
+                    client.get(endpoints['health']),
+                    client.get(endpoints['models'], timeout=5),
+                    return_exceptions=True
+                )
+                if isinstance(health_response, Exception):
+                    raise health_response
+                if health_response.status_code != 200:
+                    return False, None
+
+                response_data = health_response.json() if health_response.content else {}
+                if not isinstance(models_response, Exception) and models_response.status_code == 200:
+                    response_data['models'] = models_response.json().get('data', [])
+                return True, response_data
+
+            elif deployment.model_source == 'ollama':
+                # Ollama健康检查
+                response = await client.get(endpoints['tags'])
+                if response.status_code == 200:
+                    return True, response.json()
+                return False, None
+
+            return False, None
+
+        except Exception as e:
+            logger.warning(f"Health check failed for deployment {deployment.id}: {e}")
+            return False, {"error": str(e)}
+
+    def _get_deployment(self, deployment_id: str) -> Deployment:
+        """获取部署，同一请求内复用已加载的对象"""
+        cache = _request_deployments.get() if has_request_context() else None
+        if cache is not None and deployment_id in cache:
+            return cache[deployment_id]
+
+        deployment = Deployment.query.get(deployment_id)
+        if not deployment:
+            raise NotFoundError(f"部署 {deployment_id} 不存在")
+
+        self._remember_deployment(deployment)
+        return deployment
+
+    def _remember_deployment(self, deployment: Deployment):
+        """缓存当前请求中加载的部署"""
+        if not has_request_context():
+            return
+        cache = _request_deployments.get()
+        if cache is None:
+            cache = {}
+            _request_deployments.set(cache)
+        cache[deployment.id] = deployment
+
+    def _forget_deployment(self, deployment_id: str):
+        """从请求级缓存移除部署"""
+        cache = _request_deployments.get()
+        if cache:
+            cache.pop(deployment_id, None)
+
     def _allocate_port(self, preferred_port: Optional[int] = None) -> Optional[int]:
         """分配端口"""
         if preferred_port:
@@ -396,11 +836,78 @@ class DeploymentService:
             else:
                 raise ValidationError(f"端口 {preferred_port} 已被占用")
 
-        # 自动分配端口
-        return self.system_service.find_available_port(8000, 9000)
+        # 自动分配端口：优先从预扫描端口池取，池为空时回退到全量扫描
+        port = self._take_pooled_port()
+        self._schedule_port_refill()
+        if port is None:
+            port = self._take_scanned_port()
+        return port
+
+    @classmethod
+    def _take_pooled_port(cls) -> Optional[int]:
+        """从端口池取出一个仍可绑定的端口"""
+        with cls._port_pool_lock:
+            while cls._port_pool:
+                port = cls._port_pool.popleft()
+                if cls._is_port_reserved(port) or not _port_is_bindable(port):
+                    continue
+                cls._reserved_ports[port] = time.monotonic()
+                return port
+        return None
+
+    @classmethod
+    def _take_scanned_port(cls) -> Optional[int]:
+        """全量扫描端口范围，跳过保留期内的端口，找到后在同一锁内保留"""
+        start_port, end_port = cls.PORT_RANGE
+        with cls._port_pool_lock:
+            for port in range(start_port, end_port + 1):
+                if cls._is_port_reserved(port) or not _port_is_bindable(port):
+                    continue
+                cls._reserved_ports[port] = time.monotonic()
+                return port
+        return None
+
+    @classmethod
+    def _is_port_reserved(cls, port: int) -> bool:
+        """端口是否在保留期内（已分配但部署进程可能还未监听），调用方需持有锁"""
+        reserved_at = cls._reserved_ports.get(port)
+        if reserved_at is None:
+            return False
+        if time.monotonic() - reserved_at > cls.PORT_RESERVE_SECONDS:
+            del cls._reserved_ports[port]
+            return False
+        return True
+
+    @classmethod
+    def _schedule_port_refill(cls):
+        """端口池不足时启动后台补充线程"""
+        with cls._port_pool_lock:
+            if len(cls._port_pool) >= cls._port_pool.maxlen // 2:
+                return
+            if cls._port_refill_thread and cls._port_refill_thread.is_alive():
+                return
+            cls._port_refill_thread = threading.Thread(
+                target=cls._refill_port_pool, name='DeploymentPortPool', daemon=True
+            )
+            cls._port_refill_thread.start()
+
+    @classmethod
+    def _refill_port_pool(cls):
+        """扫描端口范围，将可绑定的端口加入端口池"""
+        start_port, end_port = cls.PORT_RANGE
+        for port in range(start_port, end_port + 1):
+            with cls._port_pool_lock:
+                if len(cls._port_pool) >= cls._port_pool.maxlen:
+                    return
+                if port in cls._port_pool or cls._is_port_reserved(port):
+                    continue
+            if _port_is_bindable(port):
+                with cls._port_pool_lock:
+                    if len(cls._port_pool) < cls._port_pool.maxlen and port not in cls._port_pool:
+                        cls._port_pool.append(port)
 
-    def _start_huggingface_deployment(self, deployment: Deployment) -> Dict[str, Any]:
-        """启动HuggingFace模型部署（使用vLLM）"""
+    def _launch_vllm_process(self, deployment: Deployment) -> Dict[str, Any]:
+        """启动HuggingFace模型部署进程（使用vLLM），不等待服务就绪"""
         try:
             # 构建模型路径
             model_path = os.path.join(Config.DOWNLOADS_PATH, 'huggingface', deployment.model_id.replace('/', '_'))
@@ -414,44 +921,15 @@ class DeploymentService:
                 if not os.path.exists(os.path.join(model_path, file)):
                     return {"success": False, "error": f"模型文件不完整，缺少: {file}"}
 
-            # 构建vLLM启动命令
-            cmd = [
-                'python', '-m', 'vllm.entrypoints.openai.api_server',
-                '--model', model_path,
-                '--host', deployment.host,
-                '--port', str(deployment.port),
-                '--served-model-name', deployment.model_id
-            ]
-
-            # 添加GPU配置
-            if deployment.gpu_device is not None:
-                # 设置CUDA_VISIBLE_DEVICES环境变量
-                env = os.environ.copy()
-                env['CUDA_VISIBLE_DEVICES'] = str(deployment.gpu_device)
-            else:
-                env = os.environ.copy()
-
-            # 添加内存配置
-            if deployment.config.get('gpu_memory_utilization'):
-                cmd.extend(['--gpu-memory-utilization', str(deployment.config['gpu_memory_utilization'])])
-            else:
-                cmd.extend(['--gpu-memory-utilization', '0.8'])  # 默认使用80%的GPU内存
-
-            # 添加最大模型长度配置
-            if deployment.config.get('max_model_len'):
-                cmd.extend(['--max-model-len', str(deployment.config['max_model_len'])])
-
-            # 添加其他vLLM配置
-            if deployment.config.get('tensor_parallel_size'):
-                cmd.extend(['--tensor-parallel-size', str(deployment.config['tensor_parallel_size'])])
+            # 构建vLLM启动命令（相同模型和配置复用缓存的命令）
+            config = deployment.config or {}
+            cmd = list(_vllm_cmd_for(
+                model_path, deployment.host, deployment.port, deployment.model_id,
+                *(_cmd_arg(config.get(key)) for key in _VLLM_CONFIG_KEYS)
+            ))
 
-            if deployment.config.get('dtype'):
-                cmd.extend(['--dtype', deployment.config['dtype']])
-            else:
-                cmd.extend(['--dtype', 'auto'])  # 自动选择数据类型
-
-            # 启用OpenAI兼容API
-            cmd.extend(['--enable-lora', '--enable-prefix-caching'])
+            # 添加GPU配置（通过CUDA_VISIBLE_DEVICES环境变量）
+            env = _build_process_env(deployment.gpu_device)
 
             # 创建日志文件
             log_file = os.path.join(self.deployments_path, f"{deployment.id}_vllm.log")
@@ -465,17 +943,37 @@ class DeploymentService:
                     stdout=f,
                     stderr=subprocess.STDOUT,
                     env=env,
-                    cwd=self.deployments_path
+                    cwd=self.deployments_path,
+                    close_fds=True,
+                    start_new_session=True
                 )
 
-            # 等待服务启动并检查健康状态
+            return {
+                "success": True,
+                "container_id": str(process.pid),
+                "process": process,
+                "log_file": log_file
+            }
+
+        except Exception as e:
+            logger.error(f"Failed to start vLLM deployment: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def _wait_for_vllm_ready(self, deployment_id: str, port: int, endpoints: Dict[str, str],
+                             process: subprocess.Popen, log_file: str) -> Dict[str, Any]:
+        """等待vLLM服务启动并检查健康状态，不访问数据库"""
+        try:
             max_wait_time = 120  # 最多等待2分钟
-            wait_interval = 5  # 每5秒检查一次
-            waited_time = 0
+            deadline = time.monotonic() + max_wait_time
+
+            # 指数退避检查间隔: 0.2s, 0.3s, 0.45s ... 最长5秒
+            delays = itertools.accumulate(itertools.repeat(0.2), lambda delay, _: min(delay * 1.5, 5.0))
 
-            while waited_time < max_wait_time:
-                time.sleep(wait_interval)
-                waited_time += wait_interval
+            for delay in delays:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                time.sleep(min(delay, remaining))
 
                 # 检查进程是否还在运行
                 if process.poll() is not None:
@@ -490,15 +988,15 @@ class DeploymentService:
 
                 # 检查健康状态
                 try:
-                    health_url = f"http://{deployment.host}:{deployment.port}/health"
-                    response = requests.get(health_url, timeout=5)
+                    health_url = endpoints['health']
+                    response = self._health_session.get(health_url, timeout=5)
                     if response.status_code == 200:
-                        logger.info(f"vLLM service started successfully: {deployment.id}")
+                        logger.info(f"vLLM service started successfully: {deployment_id}")
                         return {
                             "success": True,
                             "container_id": str(process.pid),
-                            "port": deployment.port,
-                            "api_base": f"http://{deployment.host}:{deployment.port}/v1",
+                            "port": port,
+                            "api_base": endpoints['api_base'],
                             "health_url": health_url
                         }
                 except requests.RequestException:
@@ -513,7 +1011,8 @@ class DeploymentService:
             }
 
         except Exception as e:
-            logger.error(f"Failed to start vLLM deployment: {str(e)}")
+            logger.error(f"Failed while waiting for vLLM service: {str(e)}")
+            process.terminate()
             return {"success": False, "error": str(e)}
 
     def _start_ollama_deployment(self, deployment: Deployment) -> Dict[str, Any]:
@@ -529,12 +1028,15 @@ class DeploymentService:
             if deployment.gpu_device:
                 cmd.extend(['--gpu', deployment.gpu_device])
 
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=self.deployments_path
-            )
+            # 输出重定向到日志文件，避免管道写满后子进程阻塞
+            log_file = os.path.join(self.deployments_path, f"{deployment.id}_ollama.log")
+            with open(log_file, 'w') as f:
+                process = subprocess.Popen(
+                    cmd,
+                    stdout=f,
+                    stderr=subprocess.STDOUT,
+                    cwd=self.deployments_path
+                )
 
             # 等待服务启动
             time.sleep(3)
@@ -546,65 +1048,183 @@ class DeploymentService:
                     "port": deployment.port
                 }
             else:
-                stdout, stderr = process.communicate()
                 return {
                     "success": False,
-                    "error": f"Ollama服务启动失败: {stderr.decode()}"
+                    "error": f"Ollama服务启动失败: {''.join(_tail(log_file, 20))}"
                 }
 
         except Exception as e:
             logger.error(f"Failed to start Ollama deployment: {str(e)}")
             return {"success": False, "error": str(e)}
 
-    def _stop_container(self, container_id: str) -> bool:
-        """停止容器/进程"""
+    @property
+    def _docker(self):
+        """获取共享的Docker客户端（通过Unix socket复用连接）"""
+        if DeploymentService._docker_client is None:
+            with self._docker_client_lock:
+                if DeploymentService._docker_client is None:
+                    DeploymentService._docker_client = docker.from_env()
+        return DeploymentService._docker_client
+
+    def _stop_container(self, container_id: str, wait: bool = True) -> bool:
+        """停止容器/进程
+
+        wait为False时对进程发出终止信号后立即返回，等待进程退出在后台完成；
+        Docker容器的stop本身会等待容器退出
+        """
         try:
             # 如果是进程ID，直接终止进程
             if container_id.isdigit():
                 pid = int(container_id)
-                return self.system_service.kill_process(pid)
+                return self.system_service.kill_process(pid, wait=wait)
             else:
                 # 如果是Docker容器ID，停止容器
-                subprocess.run(['docker', 'stop', container_id], check=True)
+                self._docker.containers.get(container_id).stop(timeout=10)
                 return True
+        except NotFound:
+            return True  # 容器已经不存在
         except Exception as e:
             logger.error(f"Failed to stop container: {str(e)}")
             return False
 
     def _check_container_status(self, container_id: str) -> bool:
-        """检查容器/进程状态"""
+        """检查容器/进程状态（带短TTL缓存）"""
+        cached = self._get_cached_container_status(container_id)
+        if cached is not None:
+            return cached
+
+        alive = self._probe_container_status(container_id)
+        self._cache_container_status(container_id, alive)
+        return alive
+
+    def _check_container_statuses(self, container_ids: List[str]) -> Dict[str, bool]:
+        """批量检查容器/进程状态，Docker容器合并为一次查询"""
+        results = {}
+        docker_ids = []
+
+        for container_id in dict.fromkeys(container_ids):
+            cached = self._get_cached_container_status(container_id)
+            if cached is not None:
+                results[container_id] = cached
+            elif container_id.isdigit():
+                results[container_id] = self._probe_container_status(container_id)
+                self._cache_container_status(container_id, results[container_id])
+            else:
+                docker_ids.append(container_id)
+
+        if docker_ids:
+            running = self._inspect_docker_containers(docker_ids)
+            for container_id in docker_ids:
+                alive = running.get(container_id, False)
+                results[container_id] = alive
+                self._cache_container_status(container_id, alive)
+
+        return results
+
+    def _probe_container_status(self, container_id: str) -> bool:
+        """实际探测容器/进程状态"""
         try:
             if container_id.isdigit():
-                # 检查进程是否存在
-                pid = int(container_id)
-                return self.system_service.get_process_info(pid) is not None
+                # 检查进程是否存在（信号0只做存在性检查，不发送信号）
+                try:
+                    os.kill(int(container_id), 0)
+                    return True
+                except ProcessLookupError:
+                    return False
+                except PermissionError:
+                    return True  # 进程存在但属于其他用户
             else:
                 # 检查Docker容器状态
-                result = subprocess.run(
-                    ['docker', 'inspect', '--format={{.State.Running}}', container_id],
-                    capture_output=True, text=True
-                )
-                return result.stdout.strip() == 'true'
+                return self._docker.containers.get(container_id).status == 'running'
+        except NotFound:
+            return False
         except Exception:
             return False
 
+    def _inspect_docker_containers(self, container_ids: List[str]) -> Dict[str, bool]:
+        """一次请求获取多个容器的运行状态"""
+        try:
+            # 只列出运行中的容器，未出现在结果中的视为未运行
+            containers = self._docker.containers.list()
+        except Exception as e:
+            logger.warning(f"Failed to list containers: {str(e)}")
+            return {}
+
+        running = {}
+        for container in containers:
+            for container_id in container_ids:
+                if container.id.startswith(container_id) or container.name == container_id:
+                    running[container_id] = True
+        return running
+
+    def _get_cached_container_status(self, container_id: str) -> Optional[bool]:
+        """读取未过期的容器状态缓存"""
+        with self._status_cache_lock:
+            entry = self._status_cache.get(container_id)
+        if entry and time.monotonic() - entry[0] < Config.DEPLOYMENT_STATUS_CACHE_TTL:
+            return entry[1]
+        return None
+
+    def _cache_container_status(self, container_id: str, alive: bool):
+        """写入容器状态缓存"""
+        with self._status_cache_lock:
+            self._status_cache[container_id] = (time.monotonic(), alive)
+
+    def get_cached_health_json(self, deployment_id: str) -> Optional[bytes]:
+        """获取缓存的健康检查结果（已序列化为JSON），无缓存时返回None"""
+        entry = self._get_health_entry(deployment_id)
+        return entry[2] if entry else None
+
+    def _get_cached_health(self, deployment_id: str) -> Optional[Dict[str, Any]]:
+        """读取未过期的健康检查结果"""
+        entry = self._get_health_entry(deployment_id)
+        return entry[1] if entry else None
+
+    def _get_health_entry(self, deployment_id: str) -> Optional[Tuple[float, Dict[str, Any], bytes]]:
+        """读取未过期的健康检查缓存项"""
+        with self._health_cache_lock:
+            entry = self._health_cache.get(deployment_id)
+        if entry and time.monotonic() - entry[0] < Config.DEPLOYMENT_HEALTH_CACHE_TTL:
+            return entry
+        return None
+
+    def _cache_health(self, deployment_id: str, result: Dict[str, Any]):
+        """写入健康检查结果缓存，同时序列化一次供接口直接返回"""
+        body = dumps_bytes(result)
+        with self._health_cache_lock:
+            self._health_cache[deployment_id] = (time.monotonic(), result, body)
+
+    def _invalidate_health(self, deployment_id: str):
+        """部署状态变化时使健康检查缓存失效"""
+        with self._health_cache_lock:
+            self._health_cache.pop(deployment_id, None)
+
+    def _invalidate_container_status(self, container_id: Optional[str]):
+        """使容器状态缓存失效"""
+        if not container_id:
+            return
+        with self._status_cache_lock:
+            self._status_cache.pop(container_id, None)
+
     def _get_container_logs(self, container_id: str, lines: int = 100) -> List[str]:
         """获取容器日志"""
         try:
-            if container_id.isdigit():
-                # 进程日志（从日志文件读取）
-                log_file = os.path.join(self.deployments_path, f"{container_id}.log")
-                if os.path.exists(log_file):
-                    with open(log_file, 'r') as f:
-                        return f.readlines()[-lines:]
-                return []
-            else:
-                # Docker容器日志
-                result = subprocess.run(
-                    ['docker', 'logs', '--tail', str(lines), container_id],
-                    capture_output=True, text=True
-                )
-                return result.stdout.split('\n')
+            return list(self._iter_container_logs(container_id, lines))
+        except NotFound:
+            return []
         except Exception as e:
             logger.error(f"Failed to get container logs: {str(e)}")
             return []
+
+    def _iter_container_logs(self, container_id: str, lines: int = 100) -> Iterator[str]:
+        """逐行产出容器日志，内存占用与单行大小相关"""
+        if container_id.isdigit():
+            # 进程日志（从日志文件读取）
+            log_file = os.path.join(self.deployments_path, f"{container_id}.log")
+            if os.path.exists(log_file):
+                yield from _tail(log_file, lines)
+        else:
+            # Docker容器日志，使用SDK流式读取
+            container = self._docker.containers.get(container_id)
+            for line in container.logs(tail=lines, stream=True, follow=False):
+                yield line.decode(errors='replace').rstrip()
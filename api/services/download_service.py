@@ -1,8 +1,14 @@
 import logging
 import os
 import shutil
+import threading
+import time
 import uuid
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Dict, Any, Tuple
+
+import redis
 
 from ..config import Config
 from ..integrations.huggingface_client import HuggingFaceClient
@@ -15,23 +21,97 @@ from ..utils.exceptions import (
     DownloadError,
     StorageError
 )
+from ..utils.serialization import dumps_bytes, loads
 
-# 尝试导入Celery任务，如果失败则设为None
+# 尝试导入Celery应用（不导入任务模块），如果失败则设为None
 try:
-    from tasks.download_tasks import download_model_task
+    from tasks import celery as celery_app
 except ImportError:
-    download_model_task = None
+    celery_app = None
+
+# 下载任务按名称投递，API进程无需加载任务实现
+DOWNLOAD_MODEL_TASK = 'tasks.download_tasks.download_model_task'
+DOWNLOAD_QUEUE = 'downloads'
+
+# 暂停/取消时写入Redis的停止标记，下载任务的进度回调据此停止，无需逐块查询数据库
+STOP_FLAG_PREFIX = 'dl:stop:'
 
 logger = logging.getLogger(__name__)
 
 
+# 模型ID转目录名时替换的字符
+_PATH_TRANS = str.maketrans({'/': '_', ':': '_'})
+
+# 后台删除下载文件的线程池
+_CLEANUP_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix='DownloadCleanup')
+
+
+def _remove_path(path: str):
+    """删除下载文件或目录，路径已不存在时忽略"""
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+        logger.info(f"Deleted download file/directory: {path}")
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        logger.warning(f"Failed to delete file: {e}")
+
+
+# 磁盘使用情况缓存的时间粒度（秒）
+DISK_USAGE_CACHE_SECONDS = 5
+
+
+@lru_cache(maxsize=4)
+def _disk_usage_in_window(path: str, window: int):
+    """按时间窗口缓存的磁盘使用情况，window变化时重新获取"""
+    return shutil.disk_usage(path)
+
+
+def _disk_usage(path: str):
+    """获取磁盘使用情况，同一路径在DISK_USAGE_CACHE_SECONDS内复用结果"""
+    return _disk_usage_in_window(path, int(time.monotonic() / DISK_USAGE_CACHE_SECONDS))
+
+
+def _dir_size(path: str) -> int:
+    """统计目录下所有文件大小，使用os.scandir复用目录项类型信息，不跟随符号链接"""
+    total = 0
+    stack = [path]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                        elif entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                    except OSError:
+                        pass
+        except OSError:
+            pass
+    return total
+
+
 class DownloadService:
     """下载服务"""
 
+    # 下载列表缓存键前缀
+    LIST_CACHE_PREFIX = 'dl:list:'
+    # 下载目录大小缓存键前缀
+    STORAGE_CACHE_PREFIX = 'dl:storage_size:'
+
+    # Redis客户端，首次使用时创建并在所有服务实例间共享
+    _cache_client = None
+    _cache_client_lock = threading.Lock()
+
     def __init__(self):
         self.hf_client = HuggingFaceClient()
         self.ollama_client = OllamaClient()
         self.storage_path = Config.DOWNLOADS_PATH
+        self._abs_storage = os.path.abspath(self.storage_path)
 
         # 确保存储目录存在
         os.makedirs(self.storage_path, exist_ok=True)
@@ -78,6 +158,7 @@ class DownloadService:
 
             db.session.add(task)
             db.session.commit()
+            self._invalidate_list_cache()
 
             logger.info(f"Created download task: {task_id} for {model_id}, download path: {download_path}")
             return task
@@ -89,149 +170,117 @@ class DownloadService:
 
     def start_download(self, task_id: str) -> Dict[str, Any]:
         """开始下载"""
-        task = DownloadTask.query.get(task_id)
-        if not task:
-            raise NotFoundError(f"download task {task_id} does not exist")
-
-        if task.status not in ['pending', 'paused']:
-            raise ValidationError(f"task status {task.status} cannot start download")
-
-        try:
-            task.start_download()
-            db.session.commit()
-
-            # 这里会触发Celery异步任务
-            if download_model_task:
-                try:
-                    result = download_model_task.delay(task_id)
-                    logger.info(f"Celery task submitted: {result.id}")
-                except Exception as e:
-                    logger.error(f"Failed to submit Celery task: {e}")
-                    # 不抛出异常，允许任务创建但记录错误
-            else:
-                logger.warning("Celery task system unavailable, download task will be created but not auto-started")
-
-            logger.info(f"Starting download task: {task_id}")
-            return {"message": "download has started", "task_id": task_id}
-
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Failed to start download: {str(e)}")
-            raise DownloadError(f"Failed to start download: {str(e)}")
+        self._transition(task_id, ('pending', 'paused'), 'start_download',
+                         'start download', 'start download')
+        self._clear_stop_flag(task_id)
+
+        # 这里会触发Celery异步任务
+        if celery_app:
+            try:
+                result = self._submit_download_task(task_id)
+                logger.info(f"Celery task submitted: {result.id}")
+            except Exception as e:
+                logger.error(f"Failed to submit Celery task: {e}")
+                # 不抛出异常，允许任务创建但记录错误
+        else:
+            logger.warning("Celery task system unavailable, download task will be created but not auto-started")
+
+        logger.info(f"Starting download task: {task_id}")
+        return {"message": "download has started", "task_id": task_id}
 
     def pause_download(self, task_id: str) -> Dict[str, Any]:
         """暂停下载"""
-        task = DownloadTask.query.get(task_id)
-        if not task:
-            raise NotFoundError(f"download task {task_id} does not exist")
+        self._transition(task_id, ('downloading',), 'pause_download', 'pause', 'pause download')
 
-        if task.status != 'downloading':
-            raise ValidationError(f"task status {task.status} cannot pause")
-
-        try:
-            task.pause_download()
-            db.session.commit()
-
-            # 这里可以发送信号给Celery任务暂停
-            logger.info(f"Pausing download task: {task_id}")
-            return {"message": "download has paused", "task_id": task_id}
-
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Failed to pause download: {str(e)}")
-            raise DownloadError(f"Failed to pause download: {str(e)}")
+        # 通知正在运行的Celery任务停止
+        self._set_stop_flag(task_id)
+        logger.info(f"Pausing download task: {task_id}")
+        return {"message": "download has paused", "task_id": task_id}
 
     def resume_download(self, task_id: str) -> Dict[str, Any]:
         """继续下载"""
-        task = DownloadTask.query.get(task_id)
-        if not task:
-            raise NotFoundError(f"download task {task_id} does not exist")
-
         # 允许暂停和失败的任务继续
-        if task.status not in ['paused', 'failed']:
-            raise ValidationError(f"task status {task.status} cannot continue")
+        self._transition(task_id, ('paused', 'failed'), 'resume_download', 'continue', 'resume download')
+        self._clear_stop_flag(task_id)
+
+        # 重新启动Celery任务
+        if celery_app:
+            try:
+                result = self._submit_download_task(task_id)
+                logger.info(f"Celery task resubmitted: {result.id}")
+            except Exception as e:
+                logger.error(f"Failed to resubmit Celery task: {e}")
+        else:
+            logger.warning("Celery task system unavailable, cannot continue download task")
+
+        logger.info(f"Resuming download task: {task_id}")
+        return {"message": "download has continued", "task_id": task_id}
 
-        try:
-            task.resume_download()
-            db.session.commit()
+    def cancel_download(self, task_id: str) -> Dict[str, Any]:
+        """取消下载"""
+        task = self._transition(task_id, ('pending', 'downloading', 'paused', 'failed'),
+                                'cancel_download', 'cancel', 'cancel download')
+        self._set_stop_flag(task_id)
 
-            # 重新启动Celery任务
-            if download_model_task:
-                try:
-                    result = download_model_task.delay(task_id)
-                    logger.info(f"Celery task resubmitted: {result.id}")
-                except Exception as e:
-                    logger.error(f"Failed to resubmit Celery task: {e}")
-            else:
-                logger.warning("Celery task system unavailable, cannot continue download task")
-            
-            logger.info(f"Resuming download task: {task_id}")
-            return {"message": "download has continued", "task_id": task_id}
+        # 后台删除部分下载的文件，不阻塞请求
+        self._schedule_remove(task.file_path)
 
-        except Exception as e:
-            db.session.rollback()
-            logger.error(f"Failed to resume download: {str(e)}")
-            raise DownloadError(f"Failed to resume download: {str(e)}")
+        logger.info(f"Cancelled download task: {task_id}")
+        return {"message": "download has been cancelled", "task_id": task_id}
 
-    def cancel_download(self, task_id: str) -> Dict[str, Any]:
-        """取消下载"""
-        task = DownloadTask.query.get(task_id)
+    def _submit_download_task(self, task_id: str):
+        """按任务名称投递下载任务到下载队列"""
+        return celery_app.send_task(DOWNLOAD_MODEL_TASK, args=[task_id], queue=DOWNLOAD_QUEUE)
+
+    def _get_task(self, task_id: str) -> DownloadTask:
+        """获取下载任务，会话中已加载时直接从identity map返回"""
+        task = db.session.get(DownloadTask, task_id)
         if not task:
             raise NotFoundError(f"download task {task_id} does not exist")
+        return task
 
-        if task.status in ['completed', 'cancelled']:
-            raise ValidationError(f"task status {task.status} cannot cancel")
-
-        try:
-            task.cancel_download()
-            db.session.commit()
+    def _transition(self, task_id: str, allowed: Tuple[str, ...], action: str,
+                    verb: str, operation: str) -> DownloadTask:
+        """加载任务、校验当前状态、执行状态变更方法并提交
 
-            # 删除部分下载的文件
-            if task.file_path and os.path.exists(task.file_path):
-                try:
-                    if os.path.isfile(task.file_path):
-                        os.remove(task.file_path)
-                    elif os.path.isdir(task.file_path):
-                        shutil.rmtree(task.file_path)
-                    logger.info(f"Deleted download file/directory: {task.file_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete file: {e}")
+        Args:
+            allowed: 允许执行该操作的任务状态
+            action: DownloadTask上的状态变更方法名
+            verb: 状态不允许时的错误描述
+            operation: 失败时的错误描述
+        """
+        task = self._get_task(task_id)
 
-            logger.info(f"Cancelled download task: {task_id}")
-            return {"message": "download has been cancelled", "task_id": task_id}
+        if task.status not in allowed:
+            raise ValidationError(f"task status {task.status} cannot {verb}")
 
+        try:
+            getattr(task, action)()
+            db.session.commit()
         except Exception as e:
             db.session.rollback()
-            logger.error(f"Failed to cancel download: {str(e)}")
-            raise DownloadError(f"Failed to cancel download: {str(e)}")
+            logger.error(f"Failed to {operation}: {str(e)}")
+            raise DownloadError(f"Failed to {operation}: {str(e)}")
+
+        self._invalidate_list_cache()
+        return task
 
     def delete_download(self, task_id: str) -> Dict[str, Any]:
         """删除下载任务"""
-        task = DownloadTask.query.get(task_id)
-        if not task:
-            raise NotFoundError(f"download task {task_id} does not exist")
+        task = self._get_task(task_id)
 
         try:
-            # 如果任务正在进行，先取消
+            # 如果任务正在进行，先取消（同一会话中的任务对象已更新），取消时已提交文件删除
             if task.status in ['pending', 'downloading']:
                 self.cancel_download(task_id)
-                # 重新获取任务状态
-                task = DownloadTask.query.get(task_id)
-
-            # 删除文件
-            if task.file_path and os.path.exists(task.file_path):
-                try:
-                    if os.path.isfile(task.file_path):
-                        os.remove(task.file_path)
-                    elif os.path.isdir(task.file_path):
-                        shutil.rmtree(task.file_path)
-                    logger.info(f"Deleted download file/directory: {task.file_path}")
-                except Exception as e:
-                    logger.warning(f"Failed to delete file: {e}")
+            else:
+                # 后台删除文件
+                self._schedule_remove(task.file_path)
 
             # 删除任务记录
             db.session.delete(task)
             db.session.commit()
+            self._invalidate_list_cache()
 
             logger.info(f"Deleted download task: {task_id}")
             return {"message": "download task has been deleted", "task_id": task_id}
@@ -243,29 +292,27 @@ class DownloadService:
 
     def get_download_status(self, task_id: str) -> Dict[str, Any]:
         """获取下载状态"""
-        task = DownloadTask.query.get(task_id)
-        if not task:
-            raise NotFoundError(f"download task {task_id} does not exist")
-
-        return task.to_dict()
+        return self._get_task(task_id).to_dict()
 
     def list_downloads(self, status: Optional[str] = None, page: int = 1, page_size: int = 20) -> Dict[str, Any]:
-        """获取下载任务列表"""
-        query = DownloadTask.query
-
-        if status:
-            query = query.filter(DownloadTask.status == status)
+        """获取下载任务列表，结果在Redis中短暂缓存以合并客户端轮询"""
+        cache_key = f"{self.LIST_CACHE_PREFIX}{status or ''}:{page}:{page_size}"
+        cached = self._cache_get(cache_key)
+        if cached is not None:
+            return cached
 
-        # 按创建时间倒序
-        query = query.order_by(DownloadTask.created_at.desc())
+        filters = [DownloadTask.status == status] if status else []
 
-        # 分页
+        # 分页，总数由窗口函数在同一次查询中返回，按创建时间倒序
         offset = (page - 1) * page_size
-        tasks = query.offset(offset).limit(page_size).all()
-        total = query.count()
+        tasks, total = DownloadTask.list_as_dicts(filters, offset, page_size)
 
-        return {
-            "tasks": [task.to_dict() for task in tasks],
+        if total is None:
+            # 页码越界时窗口函数没有返回行，单独统计总数
+            total = DownloadTask.query.filter(*filters).count() if offset else 0
+
+        result = {
+            "tasks": tasks,
             "pagination": {
                 "page": page,
                 "page_size": page_size,
@@ -273,26 +320,113 @@ class DownloadService:
                 "total_pages": (total + page_size - 1) // page_size
             }
         }
+        self._cache_set(cache_key, result, Config.DOWNLOAD_LIST_CACHE_TTL)
+        return result
 
     def get_download_queue(self) -> Dict[str, Any]:
         """获取下载队列状态"""
-        active_tasks = DownloadTask.get_active_tasks()
+        # 各状态数量由数据库聚合，不在Python中遍历任务列表
+        counts = DownloadTask.count_active_by_status()
+        active_tasks = DownloadTask.active_as_dicts()
 
         queue_info = {
-            "total_active": len(active_tasks),
-            "downloading": len([t for t in active_tasks if t.status == 'downloading']),
-            "pending": len([t for t in active_tasks if t.status == 'pending']),
-            "paused": len([t for t in active_tasks if t.status == 'paused']),
-            "tasks": [task.to_dict() for task in active_tasks]
+            "total_active": sum(counts.values()),
+            "downloading": counts.get('downloading', 0),
+            "pending": counts.get('pending', 0),
+            "paused": counts.get('paused', 0),
+            "tasks": active_tasks
         }
 
         return queue_info
 
+    @property
+    def cache(self) -> Optional[redis.Redis]:
+        """获取共享的Redis客户端，创建失败时返回None（缓存禁用）"""
+        if DownloadService._cache_client is None:
+            with self._cache_client_lock:
+                if DownloadService._cache_client is None:
+                    try:
+                        DownloadService._cache_client = redis.from_url(
+                            Config.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5
+                        )
+                    except Exception as e:
+                        logger.warning(f"Redis connection failed, caching will be disabled: {e}")
+                        return None
+        return DownloadService._cache_client
+
+    def _cache_get(self, key: str) -> Optional[Dict[str, Any]]:
+        """读取缓存，Redis不可用时返回None"""
+        if self.cache is None:
+            return None
+        try:
+            cached = self.cache.get(key)
+            return loads(cached) if cached else None
+        except Exception as e:
+            logger.debug(f"Failed to read download cache {key}: {e}")
+            return None
+
+    def _cache_set(self, key: str, value: Dict[str, Any], ttl: int):
+        """写入缓存，Redis不可用时忽略"""
+        if self.cache is None or ttl <= 0:
+            return
+        try:
+            self.cache.set(key, dumps_bytes(value), ex=ttl)
+        except Exception as e:
+            logger.debug(f"Failed to write download cache {key}: {e}")
+
+    def _invalidate_list_cache(self):
+        """任务增删或状态变化时清除所有下载列表缓存"""
+        if self.cache is None:
+            return
+        try:
+            keys = list(self.cache.scan_iter(match=f"{self.LIST_CACHE_PREFIX}*"))
+            if keys:
+                self.cache.delete(*keys)
+        except Exception as e:
+            logger.debug(f"Failed to invalidate download list cache: {e}")
+
+    def _set_stop_flag(self, task_id: str):
+        """写入停止标记，Redis不可用时由下载任务定期查询数据库兜底"""
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(f"{STOP_FLAG_PREFIX}{task_id}", 1, ex=Config.DOWNLOAD_STOP_FLAG_TTL)
+        except Exception as e:
+            logger.debug(f"Failed to set download stop flag {task_id}: {e}")
+
+    def _clear_stop_flag(self, task_id: str):
+        """清除停止标记，任务重新开始或继续时调用"""
+        if self.cache is None:
+            return
+        try:
+            self.cache.delete(f"{STOP_FLAG_PREFIX}{task_id}")
+        except Exception as e:
+            logger.debug(f"Failed to clear download stop flag {task_id}: {e}")
+
+    def _schedule_remove(self, path: Optional[str]):
+        """将文件/目录删除提交到后台线程，大模型目录的rmtree可能耗时数秒
+
+        下载路径由模型ID确定，先同步重命名为唯一的待删除路径再在后台删除，
+        避免后台删除误删同一模型新下载的文件
+        """
+        if not path:
+            return
+        tombstone = f"{path}.deleting-{uuid.uuid4().hex}"
+        try:
+            os.rename(path, tombstone)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            # 无法重命名时同步删除
+            logger.warning(f"Failed to rename {path} for deletion, deleting synchronously: {e}")
+            _remove_path(path)
+            return
+        _CLEANUP_POOL.submit(_remove_path, tombstone)
+
     def _check_storage_space(self, required_space: int = 1024 * 1024 * 1024):  # 1GB默认
         """检查存储空间"""
         try:
-            stat = shutil.disk_usage(self.storage_path)
-            free_space = stat.free
+            free_space = _disk_usage(self.storage_path).free
 
             if free_space < required_space:
                 raise StorageError(
@@ -306,18 +440,19 @@ class DownloadService:
         """获取存储空间信息"""
         try:
             # 获取磁盘使用情况
-            total, used, free = shutil.disk_usage(self.storage_path)
+            total, used, free = _disk_usage(self.storage_path)
 
-            # 获取下载目录大小
+            # 获取下载目录大小（按目录mtime缓存，仪表盘轮询时不必每次遍历）
             downloads_size = 0
             if os.path.exists(self.storage_path):
-                for dirpath, dirnames, filenames in os.walk(self.storage_path):
-                    for filename in filenames:
-                        filepath = os.path.join(dirpath, filename)
-                        try:
-                            downloads_size += os.path.getsize(filepath)
-                        except OSError:
-                            pass
+                cache_key = f"{self.STORAGE_CACHE_PREFIX}{os.stat(self.storage_path).st_mtime_ns}"
+                cached = self._cache_get(cache_key)
+                if cached is not None:
+                    downloads_size = cached['downloads_size']
+                else:
+                    downloads_size = _dir_size(self.storage_path)
+                    self._cache_set(cache_key, {'downloads_size': downloads_size},
+                                    Config.STORAGE_SIZE_CACHE_TTL)
 
             return {
                 "total_space": total,
@@ -334,40 +469,28 @@ class DownloadService:
     def _resolve_download_path(self, model_id: str, source: str) -> str:
         """解析下载路径"""
         # 使用默认路径
-        model_dir_name = model_id.replace('/', '_').replace(':', '_')
-        download_path = os.path.join(self.storage_path, source, model_dir_name)
-
-        return os.path.abspath(download_path)
+        return os.path.join(self._abs_storage, source, model_id.translate(_PATH_TRANS))
 
     def _validate_download_path(self, download_path: str) -> None:
         """验证下载路径"""
         try:
-            # 检查路径是否安全（防止路径遍历攻击）
-            normalized_path = os.path.normpath(download_path)
-            if '..' in normalized_path or normalized_path.startswith('/'):
-                # 对于绝对路径，进行额外的安全检查
-                if not os.path.commonpath([normalized_path, '/']) == '/':
-                    raise ValidationError("download path contains unsafe characters")
-
-            # 确保父目录存在
-            parent_dir = os.path.dirname(download_path)
-            if not os.path.exists(parent_dir):
-                try:
-                    os.makedirs(parent_dir, exist_ok=True)
-                    logger.info(f"Created download directory: {parent_dir}")
-                except OSError as e:
-                    raise ValidationError(f"Failed to create download directory: {str(e)}")
-
-            # 检查目录是否可写
+            # 检查路径是否安全（防止路径遍历攻击）：必须位于存储目录内
+            normalized_path = os.path.abspath(download_path)
+            if normalized_path == self._abs_storage or \
+                    os.path.commonpath([normalized_path, self._abs_storage]) != self._abs_storage:
+                raise ValidationError("download path contains unsafe characters")
+
+            # 确保父目录存在（已存在时makedirs不做任何事）
+            parent_dir = os.path.dirname(normalized_path)
+            try:
+                os.makedirs(parent_dir, exist_ok=True)
+            except OSError as e:
+                raise ValidationError(f"Failed to create download directory: {str(e)}")
+
+            # 检查目录是否可写（磁盘空间由 _check_storage_space 统一检查）
             if not os.access(parent_dir, os.W_OK):
                 raise ValidationError(f"download directory not writable: {parent_dir}")
 
-            # 检查是否有足够的磁盘空间（至少1GB）
-            _, _, free_space = shutil.disk_usage(parent_dir)
-            min_space = 1024 * 1024 * 1024  # 1GB
-            if free_space < min_space:
-                raise ValidationError(f"Disk space insufficient, at least need {min_space // (1024 ** 3)}GB")
-
         except ValidationError:
             raise
         except Exception as e:
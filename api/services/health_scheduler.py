@@ -0,0 +1,90 @@
+"""部署健康检查调度器 - 后台定期刷新所有运行中部署的健康状态"""
+import logging
+import threading
+from typing import Any, Dict
+
+from ..config import Config
+from .deployment_service import DeploymentService
+
+logger = logging.getLogger(__name__)
+
+
+class HealthCheckScheduler:
+    """进程级健康检查调度器，接口请求直接读取缓存结果"""
+
+    def __init__(self, interval: float = None):
+        self.interval = interval or Config.DEPLOYMENT_HEALTH_CHECK_INTERVAL
+        self.scheduler_thread = None
+        self._stop_event = threading.Event()
+        self._app = None
+        self.cycle_count = 0
+
+    def refresh_all_health(self):
+        """刷新一次所有运行中部署的健康状态"""
+        with self._app.app_context():
+            results = DeploymentService().check_all_health()
+        self.cycle_count += 1
+        logger.debug(f"Deployment health refreshed: {len(results)} deployments")
+
+    def scheduler_worker(self):
+        """健康检查工作线程"""
+        logger.info("Deployment health scheduler started")
+
+        while not self._stop_event.is_set():
+            try:
+                self.refresh_all_health()
+            except Exception as e:
+                logger.error(f"Error in deployment health scheduler: {e}")
+
+            self._stop_event.wait(self.interval)
+
+        logger.info("Deployment health scheduler stopped")
+
+    def start(self, app):
+        """启动健康检查调度"""
+        if self.is_running():
+            logger.warning("Deployment health scheduler is already running")
+            return
+
+        self._app = app
+        self._stop_event.clear()
+        self.scheduler_thread = threading.Thread(
+            target=self.scheduler_worker,
+            daemon=True,
+            name="DeploymentHealthScheduler"
+        )
+        self.scheduler_thread.start()
+
+    def stop(self):
+        """停止健康检查调度"""
+        if not self.is_running():
+            return
+
+        self._stop_event.set()
+        self.scheduler_thread.join(timeout=5)
+
+    def is_running(self) -> bool:
+        """检查调度器是否正在运行"""
+        return bool(self.scheduler_thread and self.scheduler_thread.is_alive())
+
+    def get_status(self) -> Dict[str, Any]:
+        """获取调度器状态"""
+        return {
+            'running': self.is_running(),
+            'interval': self.interval,
+            'cycle_count': self.cycle_count
+        }
+
+
+# 全局健康检查调度器实例
+health_scheduler = HealthCheckScheduler()
+
+
+def start_health_scheduler(app):
+    """启动健康检查调度"""
+    health_scheduler.start(app)
+
+
+def stop_health_scheduler():
+    """停止健康检查调度"""
+    health_scheduler.stop()
@@ -1,9 +1,15 @@
 """模型管理服务"""
+import heapq
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional, Any
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
 
 import redis
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 from ..integrations.huggingface_client import HuggingFaceClient
 from ..integrations.ollama_client import OllamaClient
@@ -14,10 +20,36 @@ from ..utils.helpers import (
     paginate_results, extract_model_stats,
     build_search_filters, build_sort_options, calculate_offset
 )
+from ..utils.serialization import dumps_bytes, loads
 from ..utils.validators import validate_search_params, validate_model_id
 
 logger = logging.getLogger(__name__)
 
+# 并发请求外部模型源（均为I/O密集的HTTP调用）的线程池
+_IO_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='ModelSourceIO')
+
+# 同步时可被外部源覆盖的列（外部值为空时保留原值）
+SYNC_UPDATE_COLUMNS = ('name', 'description', 'model_type', 'size_gb', 'parameters', 'tags', 'model_metadata')
+
+# 支持 INSERT ... ON CONFLICT DO UPDATE 的数据库方言
+UPSERT_DIALECTS = {
+    'postgresql': pg_insert,
+    'sqlite': sqlite_insert,
+}
+
+# 同步时每条upsert语句写入的模型数量
+SYNC_BATCH_SIZE = 100
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """将可迭代对象按固定大小切分为列表"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
 
 class ModelService:
     """模型管理服务"""
@@ -43,6 +75,9 @@ class ModelService:
             except Exception as e:
                 logger.warning(f"Redis connection failed, caching will be disabled: {e}")
 
+        # 外部源分类和热门模型的缓存时间
+        self.catalog_cache_ttl = self.config.get('MODEL_CATALOG_CACHE_TTL', 300)
+
     def search_models(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """搜索模型"""
         try:
@@ -82,9 +117,7 @@ class ModelService:
             model_id = validate_model_id(model_id, source)
 
             logger.info(f"Get model info: {model_id}, source: {source}")
-
-            # 首先尝试从数据库获取
-            cached_model = self._get_model_from_db(model_id, source)
+            requested_source = source
 
             # 根据来源获取最新信息
             if source == 'huggingface' or (not source and '/' in model_id):
@@ -94,29 +127,26 @@ class ModelService:
                 external_info = self.ollama_client.get_model_info(model_id)
                 source = 'ollama'
             else:
-                # 尝试自动检测来源
+                # 无法从ID判断来源：使用上次成功识别的来源，默认按Ollama查询
+                source = self._get_known_source(model_id) or 'ollama'
+                client = self.hf_client if source == 'huggingface' else self.ollama_client
                 try:
-                    if '/' in model_id:
-                        external_info = self.hf_client.get_model_info(model_id)
-                        source = 'huggingface'
-                    else:
-                        external_info = self.ollama_client.get_model_info(model_id)
-                        source = 'ollama'
-                except:
+                    external_info = client.get_model_info(model_id)
+                except (ModelNotFoundError, ExternalServiceError):
                     raise ModelNotFoundError(f"模型不存在: {model_id}")
+                self._remember_source(model_id, source)
+
+            # 原子地增加查看次数并取回数据库记录（一条 UPDATE ... RETURNING）
+            cached_model = self._increment_view_count(model_id, requested_source)
 
             # 合并信息
             if cached_model:
-                # 增加查看次数
-                cached_model.increment_view_count()
-                db.session.commit()
-
-                # 合并最新的外部信息
-                model_info = merge_model_info(cached_model.to_dict(), external_info)
+                # 合并最新的外部信息，to_dict返回的是新字典，可直接原地合并
+                model_info = merge_model_info(cached_model.to_dict(), external_info, inplace=True)
             else:
-                # 创建新的模型记录
+                # 创建新的模型记录（并发创建时由 ON CONFLICT 合并）
                 model_info = external_info
-                self._save_model_to_db(model_info)
+                self._upsert_models([{**model_info, 'source': model_info.get('source') or source}])
 
             # 标准化信息
             normalized_info = normalize_model_info(model_info)
@@ -133,13 +163,15 @@ class ModelService:
         """获取模型分类列表"""
         try:
             if source == 'huggingface':
-                return self.hf_client.get_model_categories()
+                return self._get_hf_categories()
             elif source == 'ollama':
-                return self.ollama_client.get_model_categories()
+                return self._get_ollama_categories()
             else:
-                # 合并所有来源的分类
-                hf_categories = self.hf_client.get_model_categories()
-                ollama_categories = self.ollama_client.get_model_categories()
+                # 并发获取并合并所有来源的分类
+                hf_future = _IO_POOL.submit(self._get_hf_categories)
+                ollama_future = _IO_POOL.submit(self._get_ollama_categories)
+                hf_categories = hf_future.result()
+                ollama_categories = ollama_future.result()
 
                 # 去重合并
                 all_categories = list(set(hf_categories + ollama_categories))
@@ -159,16 +191,19 @@ class ModelService:
             results = []
 
             if source == 'huggingface':
-                results = self.hf_client.get_trending_models(limit)
+                results = self._get_hf_trending(limit)
             elif source == 'ollama':
-                results = self.ollama_client.get_trending_models(limit)
+                results = self._get_ollama_trending(limit)
             else:
                 # 从多个来源获取
                 hf_limit = limit // 2
                 ollama_limit = limit - hf_limit
 
-                hf_models = self.hf_client.get_trending_models(hf_limit)
-                ollama_models = self.ollama_client.get_trending_models(ollama_limit)
+                # 并发获取两个来源
+                hf_future = _IO_POOL.submit(self._get_hf_trending, hf_limit)
+                ollama_future = _IO_POOL.submit(self._get_ollama_trending, ollama_limit)
+                hf_models = hf_future.result()
+                ollama_models = ollama_future.result()
 
                 results = hf_models + ollama_models
 
@@ -193,15 +228,8 @@ class ModelService:
         try:
             logger.info(f"Get model stats: source={source}")
 
-            # 从数据库获取统计信息
-            query = Model.query
-            if source:
-                query = query.filter(Model.source == source)
-
-            models = query.all()
-            model_dicts = [model.to_dict() for model in models]
-
-            stats = extract_model_stats(model_dicts)
+            # 在数据库中按来源和类型聚合，不加载模型对象
+            stats = self._aggregate_model_stats(source)
 
             # 添加额外统计信息
             stats['last_updated'] = datetime.utcnow().isoformat() + 'Z'
@@ -212,6 +240,43 @@ class ModelService:
             logger.error(f"Failed to get model stats: {e}")
             return {}
 
+    def _aggregate_model_stats(self, source: Optional[str] = None) -> Dict[str, Any]:
+        """按(来源, 类型)分组聚合模型数量和大小，结果与extract_model_stats一致"""
+        # 与extract_model_stats相同，大小为空或0的模型不参与大小统计
+        sized = func.nullif(Model.size_gb, 0)
+        stmt = select(
+            Model.source, Model.model_type, func.count(), func.sum(sized), func.count(sized)
+        ).group_by(Model.source, Model.model_type)
+        if source:
+            stmt = stmt.where(Model.source == source)
+
+        rows = db.session.execute(stmt).all()
+        if not rows:
+            return extract_model_stats([])
+
+        stats = {
+            "total_models": 0,
+            "by_source": {},
+            "by_type": {},
+            "total_downloads": 0,
+            "total_likes": 0,
+            "total_size_gb": 0,
+            "models_with_size": 0
+        }
+        for model_source, model_type, count, size_sum, size_count in rows:
+            stats["total_models"] += count
+            stats["by_source"][model_source] = stats["by_source"].get(model_source, 0) + count
+            stats["by_type"][model_type] = stats["by_type"].get(model_type, 0) + count
+            stats["total_size_gb"] += float(size_sum or 0)
+            stats["models_with_size"] += size_count
+
+        if stats["models_with_size"] > 0:
+            stats["average_size_gb"] = round(stats["total_size_gb"] / stats["models_with_size"], 2)
+        else:
+            stats["average_size_gb"] = 0
+
+        return stats
+
     def favorite_model(self, model_id: str, user_id: Optional[str] = None) -> bool:
         """收藏模型"""
         try:
@@ -249,27 +314,19 @@ class ModelService:
         try:
             logger.info(f"Start syncing models: source={source}, limit={limit}")
 
-            synced_count = 0
-
             if source == 'huggingface':
-                # 获取热门模型进行同步
-                models = self.hf_client.get_trending_models(limit)
-                for model_info in models:
-                    try:
-                        self._save_model_to_db(model_info)
-                        synced_count += 1
-                    except Exception as e:
-                        logger.warning(f"Failed to sync model: {model_info.get('id')}, error: {e}")
-
+                # 获取热门模型进行同步，边拉取边写入
+                models = self.hf_client.iter_trending_models(limit)
             elif source == 'ollama':
                 # 获取本地模型进行同步
                 models = self.ollama_client.get_local_models()
-                for model_info in models:
-                    try:
-                        self._save_model_to_db(model_info)
-                        synced_count += 1
-                    except Exception as e:
-                        logger.warning(f"Failed to sync model: {model_info.get('id')}, error: {e}")
+            else:
+                models = []
+
+            # 按批次写入，内存和单条SQL的参数数量都只与批次大小相关
+            synced_count = 0
+            for batch in _batched(models, SYNC_BATCH_SIZE):
+                synced_count += self._upsert_models(batch)
 
             logger.info(f"Sync completed: source={source}, synced={synced_count}")
             return synced_count
@@ -303,11 +360,13 @@ class ModelService:
             normalized = normalize_model_info(model)
             normalized_models.append(normalized)
 
+        # 客户端已按offset/limit取回当前页
         return paginate_results(
             normalized_models,
             page,
             page_size,
-            result.get('total', len(normalized_models))
+            result.get('total', len(normalized_models)),
+            pre_sliced=True
         )
 
     def _search_ollama_models(self, filters: Dict[str, Any],
@@ -329,11 +388,13 @@ class ModelService:
             normalized = normalize_model_info(model)
             normalized_models.append(normalized)
 
+        # 客户端已按offset/limit取回当前页
         return paginate_results(
             normalized_models,
             page,
             page_size,
-            result.get('total', len(normalized_models))
+            result.get('total', len(normalized_models)),
+            pre_sliced=True
         )
 
     def _search_multi_source_models(self, filters: Dict[str, Any],
@@ -345,34 +406,124 @@ class ModelService:
         # 分配每个来源的查询数量
         per_source_limit = page_size
 
+        # 并发搜索HuggingFace和Ollama，结果按来源顺序合并
+        hf_future = _IO_POOL.submit(self._search_huggingface_models, filters, sort_options, 1, per_source_limit)
+        ollama_future = _IO_POOL.submit(self._search_ollama_models, filters, sort_options, 1, per_source_limit)
+
         try:
-            # 搜索HuggingFace
-            hf_result = self._search_huggingface_models(filters, sort_options, 1, per_source_limit)
-            all_models.extend(hf_result['items'])
+            all_models.extend(hf_future.result()['items'])
         except Exception as e:
             logger.warning(f"HuggingFace search failed: {e}")
 
         try:
-            # 搜索Ollama
-            ollama_result = self._search_ollama_models(filters, sort_options, 1, per_source_limit)
-            all_models.extend(ollama_result['items'])
+            all_models.extend(ollama_future.result()['items'])
         except Exception as e:
             logger.warning(f"Ollama search failed: {e}")
 
-        # 按指定字段排序
+        # 按指定字段排序，只选出到当前页为止需要的前N项（等价于稳定排序后截取）
         sort_key = sort_options['sort_by']
         reverse = sort_options['order_desc']
+        total = len(all_models)
 
         try:
-            all_models.sort(
-                key=lambda x: x.get(sort_key, 0) if isinstance(x.get(sort_key), (int, float)) else 0,
-                reverse=reverse
+            select_top = heapq.nlargest if reverse else heapq.nsmallest
+            all_models = select_top(
+                page * page_size,
+                all_models,
+                key=lambda x: x.get(sort_key, 0) if isinstance(x.get(sort_key), (int, float)) else 0
             )
         except Exception as e:
             logger.warning(f"Sorting failed: {e}")
 
         # 分页
-        return paginate_results(all_models, page, page_size)
+        return paginate_results(all_models, page, page_size, total)
+
+    def _get_hf_categories(self) -> List[str]:
+        """获取HuggingFace分类（缓存）"""
+        return self._cached('models:categories:huggingface', self.catalog_cache_ttl,
+                            self.hf_client.get_model_categories)
+
+    def _get_ollama_categories(self) -> List[str]:
+        """获取Ollama分类（缓存）"""
+        return self._cached('models:categories:ollama', self.catalog_cache_ttl,
+                            self.ollama_client.get_model_categories)
+
+    def _get_hf_trending(self, limit: int) -> List[Dict[str, Any]]:
+        """获取HuggingFace热门模型（缓存）"""
+        return self._cached(f'models:trending:huggingface:{limit}', self.catalog_cache_ttl,
+                            lambda: self.hf_client.get_trending_models(limit))
+
+    def _get_ollama_trending(self, limit: int) -> List[Dict[str, Any]]:
+        """获取Ollama热门模型（缓存）"""
+        return self._cached(f'models:trending:ollama:{limit}', self.catalog_cache_ttl,
+                            lambda: self.ollama_client.get_trending_models(limit))
+
+    def _cached(self, key: str, ttl: int, loader: Callable[[], Any]) -> Any:
+        """读取Redis缓存，未命中时加锁只让一个请求调用loader回源，避免缓存失效时的并发击穿
+
+        Redis不可用时直接调用loader
+        """
+        if self.cache is None:
+            return loader()
+
+        try:
+            cached = self.cache.get(key)
+            if cached:
+                return loads(cached)
+
+            with self.cache.lock(f"{key}:lk", timeout=10, blocking_timeout=2):
+                # 等待锁期间其他请求可能已写入缓存
+                cached = self.cache.get(key)
+                if cached:
+                    return loads(cached)
+
+                value = loader()
+                if value:
+                    self.cache.set(key, dumps_bytes(value), ex=ttl)
+                return value
+
+        except redis.RedisError as e:
+            logger.warning(f"Redis cache unavailable for {key}: {e}")
+            return loader()
+
+    def _get_known_source(self, model_id: str) -> Optional[str]:
+        """读取缓存的模型来源"""
+        if self.cache is None:
+            return None
+        try:
+            source = self.cache.get(f'model:src:{model_id}')
+            return source.decode() if source else None
+        except redis.RedisError:
+            return None
+
+    def _remember_source(self, model_id: str, source: str):
+        """缓存模型来源一天，后续查询跳过来源检测"""
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(f'model:src:{model_id}', source, ex=86400)
+        except redis.RedisError:
+            pass
+
+    def _increment_view_count(self, model_id: str, source: Optional[str] = None) -> Optional[Model]:
+        """查看次数加一并返回更新后的模型，模型不存在时返回None"""
+        conditions = [Model.id == model_id]
+        if source:
+            conditions.append(Model.source == source)
+
+        try:
+            model = db.session.execute(
+                update(Model)
+                .where(*conditions)
+                .values(view_count=func.coalesce(Model.view_count, 0) + 1, updated_at=datetime.utcnow())
+                .returning(Model)
+            ).scalars().first()
+            db.session.commit()
+            return model
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Failed to increment view count for {model_id}: {e}")
+            return self._get_model_from_db(model_id, source)
 
     def _get_model_from_db(self, model_id: str, source: Optional[str] = None) -> Optional[Model]:
         """从数据库获取模型"""
@@ -381,6 +532,70 @@ class ModelService:
         else:
             return Model.query.filter(Model.id == model_id).first()
 
+    def _upsert_models(self, models: List[Dict[str, Any]]) -> int:
+        """批量写入模型信息：一条 INSERT ... ON CONFLICT DO UPDATE 语句和一次提交"""
+        models = [m for m in models if m.get('id') and m.get('source')]
+        if not models:
+            return 0
+
+        insert = UPSERT_DIALECTS.get(db.engine.dialect.name)
+        if insert is None:
+            # 其他数据库逐条保存
+            synced_count = 0
+            for model_info in models:
+                try:
+                    self._save_model_to_db(model_info)
+                    synced_count += 1
+                except Exception as e:
+                    logger.warning(f"Failed to sync model: {model_info.get('id')}, error: {e}")
+            return synced_count
+
+        now = datetime.utcnow()
+        # 同一批次中重复的模型ID只保留最后一条
+        rows = list({
+            model_info['id']: {
+                'id': model_info['id'],
+                'source': model_info['source'],
+                'name': model_info.get('name') or '',
+                'description': model_info.get('description'),
+                'model_type': model_info.get('model_type'),
+                'size_gb': model_info.get('size_gb'),
+                'parameters': model_info.get('parameters'),
+                'tags': model_info.get('tags'),
+                'model_metadata': model_info.get('metadata'),
+                'download_count': 0,
+                'view_count': 0,
+                'favorite_count': 0,
+                'status': 'active',
+                'is_featured': False,
+                'created_at': now,
+                'updated_at': now,
+                'last_sync_at': now,
+            }
+            for model_info in models
+        }.values())
+
+        table = Model.__table__
+        stmt = insert(table).values(rows)
+        update_columns = {
+            column: func.coalesce(stmt.excluded[column], table.c[column])
+            for column in SYNC_UPDATE_COLUMNS
+        }
+        update_columns['name'] = func.coalesce(func.nullif(stmt.excluded.name, ''), table.c.name)
+        update_columns['updated_at'] = stmt.excluded.updated_at
+        update_columns['last_sync_at'] = stmt.excluded.last_sync_at
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c.id], set_=update_columns)
+
+        try:
+            result = db.session.execute(stmt.returning(table.c.id))
+            synced_count = len(result.all())
+            db.session.commit()
+            return synced_count
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Failed to upsert models: {e}")
+            return 0
+
     def _save_model_to_db(self, model_info: Dict[str, Any]) -> Model:
         """保存模型信息到数据库"""
         try:
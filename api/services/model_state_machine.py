@@ -4,15 +4,20 @@
 """
 
 import logging
+import threading
+import time
 from enum import Enum
-from typing import Dict, Optional, List, Tuple
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, List, Tuple
 from datetime import datetime
 from contextlib import contextmanager
 
-from sqlalchemy import and_
+from sqlalchemy import and_, or_, update
 from sqlalchemy.exc import IntegrityError
 
 from ..models.model import Model, db
+from ..utils.event_queue import push_model_status
+from ..utils.helpers import utc_now_iso
 
 logger = logging.getLogger(__name__)
 
@@ -42,11 +47,49 @@ class ModelEvent(Enum):
     MANUAL_RESET = 'manual_reset'
 
 
+# 状态/事件取值到枚举成员的映射，避免Enum按值构造时的遍历和异常开销
+_STATUS_TO_STATE: Mapping[str, ModelState] = MappingProxyType({state.value: state for state in ModelState})
+_NAME_TO_EVENT: Mapping[str, ModelEvent] = MappingProxyType({event.value: event for event in ModelEvent})
+
+# 状态变化通知中各状态的显示文本，未列出的状态显示"刚刚"
+_STATUS_LABELS: Mapping[str, str] = MappingProxyType({
+    'downloading': "正在下载",
+    'deploying': "部署中",
+    'training': "训练中",
+})
+
+
+def _index_valid_events(transitions: Mapping[Tuple[ModelState, ModelEvent], ModelState]
+                        ) -> Dict[ModelState, Tuple[ModelEvent, ...]]:
+    """按源状态汇总转换表中的有效事件"""
+    index: Dict[ModelState, List[ModelEvent]] = {}
+    for state, event in transitions:
+        index.setdefault(state, []).append(event)
+    return {state: tuple(events) for state, events in index.items()}
+
+
+def _format_valid_events(valid_events: Mapping[ModelState, Tuple[ModelEvent, ...]]) -> Dict[ModelState, str]:
+    """预先生成各状态有效事件列表的文本"""
+    return {
+        state: str([event.value for event in valid_events.get(state, ())])
+        for state in ModelState
+    }
+
+
+def _index_single_source_transitions(transitions: Mapping[Tuple[ModelState, ModelEvent], ModelState]
+                                     ) -> Dict[ModelEvent, Tuple[ModelState, ModelState]]:
+    """找出只有一个合法源状态的事件，返回 事件 -> (源状态, 目标状态)"""
+    index: Dict[ModelEvent, List[Tuple[ModelState, ModelState]]] = {}
+    for (state, event), next_state in transitions.items():
+        index.setdefault(event, []).append((state, next_state))
+    return {event: pairs[0] for event, pairs in index.items() if len(pairs) == 1}
+
+
 class ModelStateMachine:
     """模型状态机"""
     
-    # 状态转换映射表
-    TRANSITIONS: Dict[Tuple[ModelState, ModelEvent], ModelState] = {
+    # 状态转换映射表（只读）
+    TRANSITIONS: Mapping[Tuple[ModelState, ModelEvent], ModelState] = MappingProxyType({
         # 从 inactive 开始的转换
         (ModelState.INACTIVE, ModelEvent.DOWNLOAD_STARTED): ModelState.DOWNLOADING,
         (ModelState.INACTIVE, ModelEvent.DEPLOY_STARTED): ModelState.DEPLOYING,
@@ -81,12 +124,36 @@ class ModelStateMachine:
         (ModelState.DEPLOYING, ModelEvent.MANUAL_ERROR_SET): ModelState.ERROR,
         (ModelState.ACTIVE, ModelEvent.MANUAL_ERROR_SET): ModelState.ERROR,
         (ModelState.TRAINING, ModelEvent.MANUAL_ERROR_SET): ModelState.ERROR,
-    }
+    })
+
+    # 各状态下的有效事件，导入时由转换表一次性生成
+    _VALID_EVENTS: Mapping[ModelState, Tuple[ModelEvent, ...]] = MappingProxyType(_index_valid_events(TRANSITIONS))
+    # 非法转换错误信息中各状态的有效事件列表文本
+    _VALID_EVENT_NAMES: Mapping[ModelState, str] = MappingProxyType(_format_valid_events(_VALID_EVENTS))
+
+    # 只有一个合法源状态的事件（下载/部署完成、失败等），可用一条条件UPDATE完成转换
+    _SINGLE_SOURCE_TRANSITIONS: Mapping[ModelEvent, Tuple[ModelState, ModelState]] = \
+        MappingProxyType(_index_single_source_transitions(TRANSITIONS))
+
+    # 可跳过被锁定行的事件：重复触发无副作用，行被其他转换锁定时直接返回而不排队等待
+    SKIP_LOCKED_EVENTS = frozenset({ModelEvent.MANUAL_RESET, ModelEvent.HEALTH_CHECK_FAILED})
+
+    # get_model_state 的短时缓存：(模型ID, 来源) -> (写入时间, 状态)
+    STATE_CACHE_TTL = 5
+    STATE_CACHE_SIZE = 1024
+    _state_cache: Dict[Tuple[str, str], Tuple[float, ModelState]] = {}
+    _state_cache_lock = threading.Lock()
+
+    # 状态变化通知的合并窗口（秒），窗口内同一模型只推送最后一次状态
+    NOTIFY_COALESCE_SECONDS = 0.05
+    _pending_notifications: Dict[str, Dict] = {}
+    _notify_lock = threading.Lock()
+    _notify_timer: Optional[threading.Timer] = None
     
     @classmethod
-    def get_valid_transitions(cls, current_state: ModelState) -> List[ModelEvent]:
+    def get_valid_transitions(cls, current_state: ModelState) -> Tuple[ModelEvent, ...]:
         """获取当前状态下的有效转换事件"""
-        return [event for (state, event) in cls.TRANSITIONS.keys() if state == current_state]
+        return cls._VALID_EVENTS.get(current_state, ())
     
     @classmethod
     def can_transition(cls, current_state: ModelState, event: ModelEvent) -> bool:
@@ -121,30 +188,42 @@ class ModelStateMachine:
         """
         try:
             with cls._atomic_transaction():
-                # 使用行锁获取模型
+                # 快速路径：UPDATE ... WHERE status = 源状态，一次往返完成校验和转换，无需行锁
+                single_source = cls._SINGLE_SOURCE_TRANSITIONS.get(event)
+                if single_source and cls._update_status_from(model_id, model_source, *single_source):
+                    from_state, new_state = single_source
+                    cls._on_state_changed(model_id, model_source, from_state.value, new_state.value,
+                                          event, event_data, auto_notify)
+                    return True, None
+                
+                # 慢路径：未命中时加锁读取当前状态，给出准确的错误信息
+                # 只修改非键列，PostgreSQL下使用 FOR NO KEY UPDATE，不阻塞外键检查的 KEY SHARE 锁
+                skip_locked = event in cls.SKIP_LOCKED_EVENTS
                 model = Model.query.filter(
                     and_(
                         Model.id == model_id,
                         Model.source == model_source
                     )
-                ).with_for_update().first()
+                ).with_for_update(of=Model, key_share=True, skip_locked=skip_locked).first()
                 
                 if not model:
+                    # 跳过锁定行时查询为空，需区分模型不存在和正在进行其他转换
+                    if skip_locked and db.session.query(Model.id).filter(
+                        Model.id == model_id, Model.source == model_source
+                    ).first():
+                        return False, "Transition in progress"
                     return False, f"Model not found: {model_id} ({model_source})"
                 
                 # 获取当前状态
-                try:
-                    current_state = ModelState(model.status) if model.status else ModelState.INACTIVE
-                except ValueError:
+                current_state = _STATUS_TO_STATE.get(model.status or 'inactive')
+                if current_state is None:
                     current_state = ModelState.INACTIVE
-                    logger.warning(f"Invalid current state '{model.status}' for model {model_id}, resetting to inactive")
-                
-                # 检查转换是否合法
-                if not cls.can_transition(current_state, event):
-                    valid_events = cls.get_valid_transitions(current_state)
-                    return False, f"Invalid transition: {current_state.value} -> {event.value}. Valid events: {[e.value for e in valid_events]}"
+                    logger.warning("Invalid current state '%s' for model %s, resetting to inactive", model.status, model_id)
                 
+                # 检查转换是否合法（一次查表同时得到目标状态）
                 new_state = cls.get_next_state(current_state, event)
+                if new_state is None:
+                    return False, f"Invalid transition: {current_state.value} -> {event.value}. Valid events: {cls._VALID_EVENT_NAMES[current_state]}"
                 
                 # 执行状态转换
                 if current_state != new_state:
@@ -152,35 +231,68 @@ class ModelStateMachine:
                     model.status = new_state.value
                     model.updated_at = datetime.utcnow()
                     
-                    logger.info(f"Model state transition: {model_id} {old_status} -> {new_state.value} (event: {event.value})")
-                    
-                    # 记录状态变化历史
-                    cls._record_state_change(model_id, model_source, old_status, new_state.value, event, event_data)
-                    
-                    # 自动通知状态变化
-                    if auto_notify:
-                        cls._notify_state_change(model_id, model_source, old_status, new_state.value)
-                    
+                    cls._on_state_changed(model_id, model_source, old_status, new_state.value,
+                                          event, event_data, auto_notify)
                     return True, None
                 else:
-                    logger.debug(f"Model {model_id} already in target state {new_state.value}")
+                    logger.debug("Model %s already in target state %s", model_id, new_state.value)
                     return True, "Already in target state"
                 
         except IntegrityError as e:
-            logger.error(f"Database integrity error during state transition: {e}")
+            logger.error("Database integrity error during state transition: %s", e)
             return False, f"Database integrity error: {str(e)}"
         except Exception as e:
-            logger.error(f"Failed to transition model state: {e}")
+            logger.error("Failed to transition model state: %s", e)
             return False, f"State transition failed: {str(e)}"
     
+    @classmethod
+    def _update_status_from(cls, model_id: str, model_source: str,
+                            from_state: ModelState, new_state: ModelState) -> bool:
+        """模型当前处于from_state时将其更新为new_state，返回是否更新成功"""
+        status_matches = Model.status == from_state.value
+        if from_state == ModelState.INACTIVE:
+            status_matches = or_(status_matches, Model.status.is_(None))
+        
+        result = db.session.execute(
+            update(Model)
+            .where(Model.id == model_id, Model.source == model_source, status_matches)
+            .values(status=new_state.value, updated_at=datetime.utcnow())
+            .returning(Model.id)
+        )
+        return result.first() is not None
+    
+    @classmethod
+    def _invalidate_state(cls, model_id: str, model_source: str):
+        """清除模型状态缓存"""
+        with cls._state_cache_lock:
+            cls._state_cache.pop((model_id, model_source), None)
+    
+    @classmethod
+    def _on_state_changed(cls, model_id: str, model_source: str,
+                          old_status: Optional[str], new_status: str,
+                          event: ModelEvent, event_data: Optional[Dict], auto_notify: bool):
+        """状态变化后清除状态缓存、记录历史并通知"""
+        cls._invalidate_state(model_id, model_source)
+        logger.info("Model state transition: %s %s -> %s (event: %s)", model_id, old_status, new_status, event.value)
+        
+        # 记录状态变化历史
+        cls._record_state_change(model_id, model_source, old_status, new_status, event, event_data)
+        
+        # 自动通知状态变化
+        if auto_notify:
+            cls._notify_state_change(model_id, model_source, old_status, new_status)
+    
     @classmethod
     def _record_state_change(cls, model_id: str, model_source: str, 
                            old_status: Optional[str], new_status: str, 
                            event: ModelEvent, event_data: Optional[Dict]):
         """记录状态变化历史"""
+        # 这里可以记录到单独的状态变化历史表
+        # 目前先记录到日志，日志级别高于INFO时不构造记录
+        if not logger.isEnabledFor(logging.INFO):
+            return
+        
         try:
-            # 这里可以记录到单独的状态变化历史表
-            # 目前先记录到日志
             change_info = {
                 'model_id': model_id,
                 'model_source': model_source,
@@ -188,74 +300,93 @@ class ModelStateMachine:
                 'new_status': new_status,
                 'event': event.value,
                 'event_data': event_data,
-                'timestamp': datetime.utcnow().isoformat()
+                'timestamp': utc_now_iso()
             }
-            logger.info(f"State change recorded: {change_info}")
+            logger.info("State change recorded: %s", change_info)
             
         except Exception as e:
-            logger.error(f"Failed to record state change: {e}")
+            logger.error("Failed to record state change: %s", e)
     
     @classmethod
     def _notify_state_change(cls, model_id: str, model_source: str, 
                            old_status: Optional[str], new_status: str):
         """通知状态变化"""
         try:
-            from ..utils.event_queue import push_model_status
-            
             # 构造模型状态
-            model_name = model_id.split('/')[-1] if '/' in model_id else model_id
-            
-            # 根据状态设置显示文本
-            if new_status == 'downloading':
-                last_updated = "正在下载"
-            elif new_status == 'deploying':
-                last_updated = "部署中"
-            elif new_status == 'training':
-                last_updated = "训练中"
-            else:
-                last_updated = "刚刚"
-            
             model_status = {
                 "id": model_id,
-                "name": model_name,
+                "name": model_id.rpartition('/')[2],
                 "status": new_status,
-                "lastUpdated": last_updated
+                "lastUpdated": _STATUS_LABELS.get(new_status, "刚刚")
             }
             
-            # 立即推送状态变化
+            # 暂存状态变化，合并窗口结束后统一推送
+            with cls._notify_lock:
+                cls._pending_notifications[model_id] = model_status
+                if cls._notify_timer is None:
+                    cls._notify_timer = threading.Timer(cls.NOTIFY_COALESCE_SECONDS, cls._flush_notifications)
+                    cls._notify_timer.daemon = True
+                    cls._notify_timer.start()
+            
+            logger.debug("State change notification queued: %s %s -> %s", model_id, old_status, new_status)
+            
+        except Exception as e:
+            logger.error("Failed to notify state change: %s", e)
+    
+    @classmethod
+    def _flush_notifications(cls):
+        """将合并窗口内的状态变化作为一条多模型事件推送"""
+        with cls._notify_lock:
+            models = list(cls._pending_notifications.values())
+            cls._pending_notifications.clear()
+            cls._notify_timer = None
+        
+        if not models:
+            return
+        
+        try:
             push_model_status(
-                models=[model_status],
-                timestamp=datetime.utcnow().isoformat(),
+                models=models,
+                timestamp=utc_now_iso(),
                 interval=0  # 立即推送
             )
-            
-            logger.debug(f"State change notification sent: {model_id} {old_status} -> {new_status}")
+            logger.debug("State change notifications sent: %d models", len(models))
             
         except Exception as e:
-            logger.error(f"Failed to notify state change: {e}")
+            logger.error("Failed to flush state change notifications: %s", e)
     
     @classmethod
     def get_model_state(cls, model_id: str, model_source: str) -> Optional[ModelState]:
-        """获取模型当前状态"""
+        """获取模型当前状态（短时缓存，状态转换成功后失效）"""
+        key = (model_id, model_source)
+        with cls._state_cache_lock:
+            entry = cls._state_cache.get(key)
+        if entry and time.monotonic() - entry[0] < cls.STATE_CACHE_TTL:
+            return entry[1]
+        
         try:
-            model = Model.query.filter(
-                and_(
-                    Model.id == model_id,
-                    Model.source == model_source
-                )
+            # id为主键，按主键查找并只读取状态列
+            row = db.session.query(Model.status).filter(
+                Model.id == model_id,
+                Model.source == model_source
             ).first()
             
-            if not model:
+            if not row:
                 return None
             
-            try:
-                return ModelState(model.status) if model.status else ModelState.INACTIVE
-            except ValueError:
-                logger.warning(f"Invalid status '{model.status}' for model {model_id}")
-                return ModelState.INACTIVE
+            state = _STATUS_TO_STATE.get(row.status or 'inactive')
+            if state is None:
+                logger.warning("Invalid status '%s' for model %s", row.status, model_id)
+                state = ModelState.INACTIVE
+            
+            with cls._state_cache_lock:
+                if len(cls._state_cache) >= cls.STATE_CACHE_SIZE:
+                    cls._state_cache.clear()
+                cls._state_cache[key] = (time.monotonic(), state)
+            return state
                 
         except Exception as e:
-            logger.error(f"Failed to get model state: {e}")
+            logger.error("Failed to get model state: %s", e)
             return None
     
     @classmethod
@@ -269,7 +400,7 @@ class ModelStateMachine:
                         Model.id == model_id,
                         Model.source == model_source
                     )
-                ).with_for_update().first()
+                ).with_for_update(of=Model, key_share=True).first()
                 
                 if not model:
                     return False, f"Model not found: {model_id} ({model_source})"
@@ -278,7 +409,8 @@ class ModelStateMachine:
                 model.status = target_state.value
                 model.updated_at = datetime.utcnow()
                 
-                logger.warning(f"Model state force set: {model_id} {old_status} -> {target_state.value}")
+                logger.warning("Model state force set: %s %s -> %s", model_id, old_status, target_state.value)
+                cls._invalidate_state(model_id, model_source)
                 
                 # 记录强制状态变化
                 cls._record_state_change(
@@ -292,7 +424,7 @@ class ModelStateMachine:
                 return True, None
                 
         except Exception as e:
-            logger.error(f"Failed to force model state: {e}")
+            logger.error("Failed to force model state: %s", e)
             return False, f"Force state failed: {str(e)}"
 
 
@@ -300,12 +432,11 @@ class ModelStateMachine:
 def trigger_model_event(model_id: str, model_source: str, event_name: str, 
                        event_data: Optional[Dict] = None) -> Tuple[bool, Optional[str]]:
     """触发模型事件的便捷函数"""
-    try:
-        event = ModelEvent(event_name)
-        return ModelStateMachine.transition(model_id, model_source, event, event_data)
-    except ValueError:
-        logger.error(f"Unknown event: {event_name}")
+    event = _NAME_TO_EVENT.get(event_name)
+    if event is None:
+        logger.error("Unknown event: %s", event_name)
         return False, f"Unknown event: {event_name}"
+    return ModelStateMachine.transition(model_id, model_source, event, event_data)
 
 
 def get_model_state(model_id: str, model_source: str) -> Optional[str]:
@@ -316,8 +447,7 @@ def get_model_state(model_id: str, model_source: str) -> Optional[str]:
 
 def force_model_state(model_id: str, model_source: str, target_state: str) -> Tuple[bool, Optional[str]]:
     """强制设置模型状态的便捷函数"""
-    try:
-        state = ModelState(target_state)
-        return ModelStateMachine.force_state(model_id, model_source, state)
-    except ValueError:
-        return False, f"Invalid state: {target_state}" 
\ No newline at end of file
+    state = _STATUS_TO_STATE.get(target_state)
+    if state is None:
+        return False, f"Invalid state: {target_state}"
+    return ModelStateMachine.force_state(model_id, model_source, state) 
\ No newline at end of file
@@ -5,25 +5,26 @@
 
 import logging
 import threading
-import time
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from datetime import datetime
+from types import MappingProxyType
+from typing import List, Dict, Any, Mapping, NamedTuple, Optional, Tuple
 
-from ..models.model import Model
+from sqlalchemy import select
+
+from ..models.model import Model, db
 from ..utils.event_queue import push_model_status, push_system_metrics
 from .system_service import SystemService
 
 logger = logging.getLogger(__name__)
 
 
-class ModelStatus:
+class ModelStatus(NamedTuple):
     """模型状态数据结构"""
     
-    def __init__(self, id: str, name: str, status: str, last_updated: datetime):
-        self.id = id
-        self.name = name
-        self.status = status  # "active" | "inactive" | "training" | "error" | "downloading" | "deploying"
-        self.last_updated = last_updated
+    id: str
+    name: str
+    status: str  # "active" | "inactive" | "training" | "error" | "downloading" | "deploying"
+    last_updated: datetime
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -34,14 +35,13 @@ class ModelStatus:
         }
 
 
-class SystemMetric:
+class SystemMetric(NamedTuple):
     """系统指标数据结构"""
     
-    def __init__(self, name: str, value: float, unit: str, status: str):
-        self.name = name
-        self.value = value
-        self.unit = unit
-        self.status = status  # "good" | "warning" | "critical"
+    name: str
+    value: float
+    unit: str
+    status: str  # "good" | "warning" | "critical"
     
     def to_dict(self) -> Dict[str, Any]:
         return {
@@ -55,66 +55,64 @@ class SystemMetric:
 class MonitorService:
     """统一监控服务 - 整合模型状态和系统资源监控"""
     
+    # 推送的系统指标：(指标名, 资源类别, 取值字段, 阈值配置名)
+    SYSTEM_METRIC_SPECS = (
+        ('cpu_usage', 'cpu', 'usage_percent', 'cpu'),
+        ('memory_usage', 'memory', 'percent', 'memory'),
+        ('disk_usage', 'disk', 'percent', 'disk'),
+        ('gpu_usage', 'gpu', 'usage_percent', 'gpu_usage'),
+    )
+    
+    # 系统监控阈值配置（只读）
+    system_thresholds: Mapping[str, Mapping[str, float]] = MappingProxyType({
+        'cpu': MappingProxyType({'warning': 70, 'critical': 85}),
+        'memory': MappingProxyType({'warning': 80, 'critical': 90}),
+        'disk': MappingProxyType({'warning': 80, 'critical': 90}),
+        'gpu_usage': MappingProxyType({'warning': 85, 'critical': 95})
+    })
+    
     def __init__(self):
         self.system_service = SystemService()
         self.monitoring = False
         self.monitor_thread = None
+        self._stop_event = threading.Event()
         self.monitor_interval = 5  # 统一5秒间隔
         self._app = None  # Flask应用实例
         
-        # 系统监控阈值配置
-        self.system_thresholds = {
-            'cpu': {'warning': 70, 'critical': 85},
-            'memory': {'warning': 80, 'critical': 90},
-            'disk': {'warning': 80, 'critical': 90},
-            'gpu_usage': {'warning': 85, 'critical': 95}
-        }
-        
-        # 计数器用于控制不同类型监控的频率
+        # 监控次数计数，用于控制全量推送的频率
         self.tick_count = 0
-        self.model_check_interval = 1  # 每次都检查模型状态
-        self.system_check_interval = 1  # 每次都检查系统状态
+        self.full_push_interval = 12  # 每12次（约1分钟）无论是否变化都推送一次全量数据作为心跳
+        
+        # 上次推送的模型状态快照：模型ID -> ((名称, 状态, 最后更新时间), 序列化后的字典)
+        self._last_snapshot: Dict[str, Tuple[tuple, Dict[str, Any]]] = {}
+        self._last_model_statuses: List[Dict[str, Any]] = []
+        
+        # 上次推送的系统指标（取整后的数值）
+        self._last_metrics: Optional[tuple] = None
+        self._last_system_metrics: List[Dict[str, Any]] = []
 
-    def _get_last_updated(self, model: Model) -> datetime:
-        """获取最后更新时间"""
-        return model.updated_at or model.created_at or datetime.utcnow()
-    
-    def collect_model_status(self) -> List[ModelStatus]:
-        """收集模型状态信息"""
+    def collect_model_status(self, now: Optional[datetime] = None) -> List[ModelStatus]:
+        """收集模型状态信息，now为缺少时间戳的模型使用的更新时间"""
+        now = now or datetime.utcnow()
+        
         def _process_models_in_context():
             """在应用上下文中处理模型数据"""
             model_statuses = []
             
             try:
-                # 获取所有模型
-                models = Model.query.all()
+                # 只查询推送所需的列，按批次流式读取，避免整表ORM对象加载
+                stmt = select(
+                    Model.id, Model.name, Model.status, Model.updated_at, Model.created_at
+                ).execution_options(yield_per=200)
                 
-                for model in models:
-                    try:
-                        # 直接使用模型的状态（已通过状态机同步）
-                        status = model.status or 'inactive'
-
-                        last_updated_time = self._get_last_updated(model)
-
-                        model_status = ModelStatus(
-                            id=model.id,
-                            name=model.name,
-                            status=status,
-                            last_updated=last_updated_time
-                        )
-                        
-                        model_statuses.append(model_status)
-                        
-                    except Exception as e:
-                        logger.error(f"Failed to process model {model.id}: {e}")
-                        # 添加错误状态的模型
-                        model_status = ModelStatus(
-                            id=model.id,
-                            name=model.name,
-                            status='error',
-                            last_updated=datetime.utcnow()
-                        )
-                        model_statuses.append(model_status)
+                for model_id, name, status, updated_at, created_at in db.session.execute(stmt):
+                    # 直接使用模型的状态（已通过状态机同步）
+                    model_statuses.append(ModelStatus(
+                        id=model_id,
+                        name=name,
+                        status=status or 'inactive',
+                        last_updated=updated_at or created_at or now
+                    ))
                 
                 return model_statuses
                 
@@ -139,6 +137,35 @@ class MonitorService:
             logger.error(f"Failed to collect model status: {e}")
             return []
     
+    def _diff_model_statuses(self, model_statuses: List[ModelStatus]) -> List[Dict[str, Any]]:
+        """与上次快照比较，返回发生变化的模型的序列化结果，并刷新快照
+        
+        未变化的模型直接复用上次序列化的字典，不再重复调用to_dict
+        """
+        snapshot = {}
+        changed = []
+        for status in model_statuses:
+            key = (status.name, status.status, status.last_updated)
+            cached = self._last_snapshot.get(status.id)
+            if cached and cached[0] == key:
+                snapshot[status.id] = cached
+            else:
+                snapshot[status.id] = (key, status.to_dict())
+                changed.append(snapshot[status.id][1])
+        
+        # 重建快照，已删除的模型随之移除
+        self._last_snapshot = snapshot
+        self._last_model_statuses = [payload for _, payload in snapshot.values()]
+        return changed
+    
+    def get_model_status_snapshot(self) -> List[Dict[str, Any]]:
+        """获取最近一次采集的全量模型状态（不查询数据库）"""
+        return self._last_model_statuses
+    
+    def get_system_metrics_snapshot(self) -> List[Dict[str, Any]]:
+        """获取最近一次推送的系统指标（不重新采集）"""
+        return self._last_system_metrics
+    
     def _get_system_status(self, metric_name: str, value: float) -> str:
         """根据阈值获取系统状态"""
         thresholds = self.system_thresholds.get(metric_name, {})
@@ -156,47 +183,22 @@ class MonitorService:
             metrics = []
             system_data = self.system_service.get_system_resources()
             
-            # CPU使用率
-            cpu_info = system_data.get('cpu', {})
-            cpu_usage = cpu_info.get('usage_percent', 0)
-            metrics.append(SystemMetric(
-                name='cpu_usage',
-                value=round(cpu_usage, 1),
-                unit='%',
-                status=self._get_system_status('cpu', cpu_usage)
-            ))
-            
-            # 内存使用率
-            memory_info = system_data.get('memory', {})
-            memory_usage = memory_info.get('percent', 0)
-            metrics.append(SystemMetric(
-                name='memory_usage',
-                value=round(memory_usage, 1),
-                unit='%',
-                status=self._get_system_status('memory', memory_usage)
-            ))
-            
-            # 磁盘使用率
-            disk_info = system_data.get('disk', {})
-            disk_usage = disk_info.get('percent', 0)
-            metrics.append(SystemMetric(
-                name='disk_usage',
-                value=round(disk_usage, 1),
-                unit='%',
-                status=self._get_system_status('disk', disk_usage)
-            ))
-            
-            # GPU使用率
-            gpu_info = system_data.get('gpu', {})
-            gpu_usage = gpu_info.get('usage_percent', 0)
-            gpu_available = gpu_info.get('available', False)
-            
-            metrics.append(SystemMetric(
-                name='gpu_usage',
-                value=round(gpu_usage, 1),
-                unit='%',
-                status=self._get_system_status('gpu_usage', gpu_usage) if gpu_available else 'good'
-            ))
+            for metric_name, category, field, threshold_key in self.SYSTEM_METRIC_SPECS:
+                info = system_data.get(category, {})
+                value = info.get(field, 0)
+                
+                # GPU不可用时不按阈值告警
+                if category == 'gpu' and not info.get('available', False):
+                    status = 'good'
+                else:
+                    status = self._get_system_status(threshold_key, value)
+                
+                metrics.append(SystemMetric(
+                    name=metric_name,
+                    value=round(value, 1),
+                    unit='%',
+                    status=status
+                ))
             
             return metrics
             
@@ -208,41 +210,54 @@ class MonitorService:
         """统一监控工作线程"""
         logger.info("Unified monitor service started")
         
-        while self.monitoring:
+        while not self._stop_event.is_set():
             try:
-                timestamp = datetime.utcnow().isoformat()
+                # 每次监控只取一次当前时间
+                now = datetime.utcnow()
+                timestamp = now.isoformat()
                 self.tick_count += 1
                 
-                # 收集模型状态（每次都执行）
-                if self.tick_count % self.model_check_interval == 0:
-                    model_statuses = self.collect_model_status()
-                    
-                    if model_statuses:
-                        push_model_status(
-                            models=[status.to_dict() for status in model_statuses],
-                            timestamp=timestamp,
-                            interval=self.monitor_interval
-                        )
-                        logger.debug(f"Model status pushed: {len(model_statuses)} models")
+                # 收集模型状态
+                model_statuses = self.collect_model_status(now)
+                changed = self._diff_model_statuses(model_statuses)
+                
+                # 稳定状态下只推送变化的模型，定期推送全量作为心跳
+                if self.tick_count % self.full_push_interval == 0:
+                    changed = self._last_model_statuses
                 
-                # 收集系统指标（每次都执行）
-                if self.tick_count % self.system_check_interval == 0:
-                    system_metrics = self.collect_system_metrics()
-                    
-                    if system_metrics:
-                        push_system_metrics(
-                            metrics=[metric.to_dict() for metric in system_metrics],
-                            timestamp=timestamp,
-                            interval=self.monitor_interval
-                        )
-                        logger.debug(f"System metrics pushed: {len(system_metrics)} metrics")
+                if changed:
+                    push_model_status(
+                        models=changed,
+                        timestamp=timestamp,
+                        interval=self.monitor_interval
+                    )
+                    logger.debug(f"Model status pushed: {len(changed)} models")
                 
-                # 等待下一次监控
-                time.sleep(self.monitor_interval)
+                # 收集系统指标
+                system_metrics = self.collect_system_metrics()
+                
+                # 指标值（已取整）与上次推送相同时跳过，定期推送作为心跳
+                metric_values = tuple(metric.value for metric in system_metrics)
+                unchanged = (metric_values == self._last_metrics
+                             and self.tick_count % self.full_push_interval != 0)
+                
+                if system_metrics and unchanged:
+                    logger.debug("System metrics unchanged, skip push")
+                elif system_metrics:
+                    self._last_metrics = metric_values
+                    self._last_system_metrics = [metric.to_dict() for metric in system_metrics]
+                    push_system_metrics(
+                        metrics=self._last_system_metrics,
+                        timestamp=timestamp,
+                        interval=self.monitor_interval
+                    )
+                    logger.debug(f"System metrics pushed: {len(system_metrics)} metrics")
                 
             except Exception as e:
                 logger.error(f"Error in unified monitor worker: {e}")
-                time.sleep(self.monitor_interval)
+            
+            # 等待下一次监控，停止时立即返回
+            self._stop_event.wait(self.monitor_interval)
         
         logger.info("Unified monitor service stopped")
     
@@ -257,7 +272,10 @@ class MonitorService:
             self._app = app
         
         self.monitoring = True
+        self._stop_event.clear()
         self.tick_count = 0
+        self._last_snapshot = {}
+        self._last_metrics = None
         self.monitor_thread = threading.Thread(
             target=self.monitor_worker,
             daemon=True,
@@ -273,6 +291,7 @@ class MonitorService:
             return
         
         self.monitoring = False
+        self._stop_event.set()
         
         if self.monitor_thread and self.monitor_thread.is_alive():
             self.monitor_thread.join(timeout=5)
@@ -298,7 +317,7 @@ class MonitorService:
         return {
             'monitoring': self.is_monitoring(),
             'interval': self.monitor_interval,
-            'system_thresholds': self.system_thresholds,
+            'system_thresholds': {name: dict(levels) for name, levels in self.system_thresholds.items()},
             'tick_count': self.tick_count,
             'thread_name': self.monitor_thread.name if self.monitor_thread else None
         }
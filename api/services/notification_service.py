@@ -3,13 +3,23 @@
 用于向客户端发送各种系统通知，包括下载完成、部署失败、内存告警等
 """
 
+import heapq
+import itertools
 import logging
-import uuid
+import os
+import threading
+import time
+from collections import Counter, deque
 from datetime import datetime
 from enum import Enum
-from typing import Optional, Dict, Any
+from operator import itemgetter
+from typing import Optional, Dict, Any, List, Set, Tuple
 
-from ..utils.event_queue import push_notification
+from sqlalchemy import and_, delete, insert, or_, select
+
+from ..models import NotificationOutbox
+from ..models.model import db
+from ..utils.event_queue import push_notifications
 
 logger = logging.getLogger(__name__)
 
@@ -30,33 +40,262 @@ class NotificationStatus(Enum):
     ERROR = "error"
 
 
+# 枚举成员到字符串值的映射，避免每条通知访问Enum的value属性
+_TYPE_VALUES: Dict[NotificationType, str] = {member: member.value for member in NotificationType}
+_STATUS_VALUES: Dict[NotificationStatus, str] = {member: member.value for member in NotificationStatus}
+
+# 缓冲区满时按严重程度淘汰，级别低的先被丢弃
+_SEVERITY: Dict[NotificationStatus, int] = {
+    NotificationStatus.INFO: 1,
+    NotificationStatus.WARNING: 2,
+    NotificationStatus.ERROR: 3,
+}
+
+
 class NotificationService:
     """通知服务类"""
     
+    # 待推送通知的缓冲容量、单次推送的最大条数和等待间隔（秒）
+    BUFFER_SIZE = 1024
+    BATCH_SIZE = 100
+    FLUSH_INTERVAL = 0.05
+    
+    # 相同类型和内容的通知在该时间窗口（秒）内只发送一次
+    DEDUP_WINDOW = 5.0
+    # 单代去重记录的最大条数，超出时提前轮换
+    DEDUP_CAPACITY = 10000
+    
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        
+        # 通知先写入缓冲区，由后台线程批量推送到事件队列
+        # 缓冲区是按(严重程度, 序号)排序的最小堆，写满后淘汰堆顶即级别最低、最早写入的通知，
+        # 故障风暴中ERROR通知不会被大量INFO通知挤掉
+        self._buffer: List[Tuple[int, int, Dict[str, Any]]] = []
+        self._buffer_lock = threading.Lock()
+        self._seq = itertools.count()
+        self.evicted_counts: Counter = Counter()
+        self._wakeup = threading.Event()
+        self._drain_thread = None
+        self._drain_thread_lock = threading.Lock()
+        self._dedup_lock = threading.Lock()
+        
+        # 最近发送的通知的哈希值，分当前和上一代两个集合，每个去重窗口轮换一次
+        # 只保存整数哈希，不持有消息字符串，内存占用由DEDUP_CAPACITY限定
+        self._recent_current: Set[int] = set()
+        self._recent_previous: Set[int] = set()
+        self._rotated_at = time.monotonic()
+        self.suppressed_count = 0
+        
+        # 通知ID：进程号和启动时间作为前缀，加进程内自增序号
+        self._id_prefix = f"{os.getpid():x}-{int(time.time()):x}-"
+        self._id_counter = itertools.count()
+        
+        # 启用发件箱时由start_outbox设置，推送线程在该应用上下文中读写发件箱表
+        self._app = None
+        # 已广播到客户端、待从发件箱删除的通知ID，由推送线程批量删除
+        self._pending_acks = deque()
+        
         self.logger.info("Notification service initialized")
     
+    def start_outbox(self, app) -> int:
+        """按配置启用通知发件箱并重新推送上次进程退出前未广播的通知，返回重放条数
+
+        发件箱表在进程间共享，只能由负责WebSocket广播的API服务进程启用：
+        其他进程（如Celery worker）重放会重复推送仍在广播中的通知，写入的记录也无人确认
+        """
+        if not app.config.get('NOTIFICATION_OUTBOX_ENABLED', False):
+            return 0
+        self._app = app
+        return self.replay_outbox()
+    
+    def _persist_batch(self, batch: list, created_at: datetime) -> bool:
+        """将一批通知写入发件箱表，整批一条INSERT、一次提交"""
+        try:
+            db.session.execute(
+                insert(NotificationOutbox),
+                [{'id': n['id'], 'payload': n, 'created_at': created_at} for n in batch]
+            )
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"Failed to persist notifications to outbox: {e}")
+            return False
+    
+    def ack_notifications(self, ids: list):
+        """通知已广播到客户端后调用，由推送线程从发件箱表删除，不阻塞广播"""
+        if self._app is None or not ids:
+            return
+        self._pending_acks.extend(ids)
+        self._ensure_drain_thread()
+        self._wakeup.set()
+    
+    def _flush_acks(self):
+        """删除已确认的通知；删除失败的记录留在发件箱，下次启动时重放"""
+        ids = []
+        try:
+            while True:
+                ids.append(self._pending_acks.popleft())
+        except IndexError:
+            pass
+        for start in range(0, len(ids), self.BATCH_SIZE):
+            self._ack_batch(ids[start:start + self.BATCH_SIZE])
+    
+    def _ack_batch(self, ids: list) -> bool:
+        """从发件箱表删除已广播的通知"""
+        try:
+            db.session.execute(delete(NotificationOutbox).where(NotificationOutbox.id.in_(ids)))
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            self.logger.error(f"Failed to ack notifications in outbox: {e}")
+            return False
+    
+    def _publish_batch(self, batch: list, timestamp: str) -> bool:
+        """推送一批通知到事件队列；发件箱中的记录由广播回调在发送给客户端后确认删除"""
+        try:
+            push_notifications(batch, timestamp)
+            return True
+        except Exception as e:
+            self.logger.error(f"Failed to push notifications: {e}")
+            return False
+    
+    def replay_outbox(self) -> int:
+        """重新推送发件箱中残留的通知（上次进程退出前未广播完成），返回推送条数"""
+        if self._app is None:
+            return 0
+        
+        replayed = 0
+        with self._app.app_context():
+            # 记录在广播后才删除，按(created_at, id)游标分页读取，不依赖已读记录被删除
+            last = None
+            while True:
+                query = select(NotificationOutbox.id, NotificationOutbox.created_at, NotificationOutbox.payload)
+                if last is not None:
+                    query = query.where(or_(
+                        NotificationOutbox.created_at > last[1],
+                        and_(NotificationOutbox.created_at == last[1], NotificationOutbox.id > last[0])
+                    ))
+                rows = db.session.execute(
+                    query.order_by(NotificationOutbox.created_at, NotificationOutbox.id).limit(self.BATCH_SIZE)
+                ).all()
+                if not rows:
+                    break
+                # 推送失败时停止重放，剩余记录留待下次启动
+                if not self._publish_batch([row.payload for row in rows], datetime.utcnow().isoformat()):
+                    break
+                replayed += len(rows)
+                last = (rows[-1].id, rows[-1].created_at)
+            db.session.remove()
+        
+        if replayed:
+            self.logger.info("Replayed %d notifications from outbox", replayed)
+        return replayed
+    
+    def _ensure_drain_thread(self):
+        """首次发送通知时启动推送线程"""
+        if self._drain_thread and self._drain_thread.is_alive():
+            return
+        with self._drain_thread_lock:
+            if self._drain_thread and self._drain_thread.is_alive():
+                return
+            self._drain_thread = threading.Thread(
+                target=self._drain_loop,
+                daemon=True,
+                name="NotificationDrain"
+            )
+            self._drain_thread.start()
+    
+    def _enqueue(self, notification: Dict[str, Any], status: NotificationStatus):
+        """写入缓冲区，已满时淘汰级别最低、最早写入的通知"""
+        entry = (_SEVERITY[status], next(self._seq), notification)
+        with self._buffer_lock:
+            if len(self._buffer) < self.BUFFER_SIZE:
+                heapq.heappush(self._buffer, entry)
+                return
+            if entry > self._buffer[0]:
+                entry = heapq.heapreplace(self._buffer, entry)
+            # 被淘汰的可能是新通知本身（级别低于缓冲区中所有通知时）
+            self.evicted_counts[entry[2]['type']] += 1
+    
+    def _drain_buffer(self):
+        """取空缓冲区，按写入顺序逐批写入发件箱（如已启用）后推送"""
+        with self._buffer_lock:
+            pending, self._buffer = self._buffer, []
+        pending.sort(key=itemgetter(1))
+        
+        for start in range(0, len(pending), self.BATCH_SIZE):
+            batch = [entry[2] for entry in pending[start:start + self.BATCH_SIZE]]
+            
+            # 同一批次的通知使用同一个时间戳
+            now = datetime.utcnow()
+            timestamp = now.isoformat()
+            for notification in batch:
+                if notification['timestamp'] is None:
+                    notification['timestamp'] = timestamp
+            
+            if self._app is not None:
+                self._persist_batch(batch, now)
+            self._publish_batch(batch, timestamp)
+    
+    def _drain_loop(self):
+        """从缓冲区批量取出通知并推送到事件队列"""
+        while True:
+            self._wakeup.wait(timeout=self.FLUSH_INTERVAL)
+            # 先清除唤醒标志再取数据，取数据期间写入的通知会再次触发唤醒
+            self._wakeup.clear()
+            
+            if self._buffer or self._pending_acks:
+                if self._app is not None:
+                    with self._app.app_context():
+                        self._drain_buffer()
+                        self._flush_acks()
+                else:
+                    self._drain_buffer()
+    
     def _create_notification(self, 
                            notification_type: NotificationType,
                            message: str,
                            status: NotificationStatus = NotificationStatus.INFO,
-                           extra_data: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-        """创建通知数据结构"""
-        
-        notification = {
-            'id': str(uuid.uuid4()),
-            'type': notification_type.value,
+                           extra_data: Optional[Dict[str, Any]] = None,
+                           timestamp: Optional[str] = None) -> Dict[str, Any]:
+        """创建通知数据结构，timestamp为空时由推送线程按批次补齐"""
+        
+        # 额外数据与基础字段在同一个字典字面量中构造，避免update引起的扩容
+        return {
+            'id': self._id_prefix + format(next(self._id_counter), 'x'),
+            'type': _TYPE_VALUES[notification_type],
             'message': message,
-            'timestamp': datetime.utcnow().isoformat(),
-            'status': status.value
+            'timestamp': timestamp,
+            'status': _STATUS_VALUES[status],
+            **(extra_data or {})
         }
-        
-        # 添加额外数据
-        if extra_data:
-            notification.update(extra_data)
-        
-        return notification
+    
+    def _is_duplicate(self, notification_type: NotificationType, message: str) -> bool:
+        """去重窗口内已发送过相同通知时返回True，否则记录本次发送（调用方持有锁）
+
+        记录保留一到两个去重窗口：当前代写满DEDUP_WINDOW秒或DEDUP_CAPACITY条后降为上一代，
+        原上一代整体丢弃，无需逐条检查过期时间；距上次轮换已超过两个窗口时两代均已过期，全部清空
+        """
+        now = time.monotonic()
+        elapsed = now - self._rotated_at
+        if elapsed >= 2 * self.DEDUP_WINDOW:
+            self._recent_previous = set()
+            self._recent_current = set()
+            self._rotated_at = now
+        elif elapsed >= self.DEDUP_WINDOW or len(self._recent_current) >= self.DEDUP_CAPACITY:
+            self._recent_previous = self._recent_current
+            self._recent_current = set()
+            self._rotated_at = now
+        
+        key = hash((notification_type, message))
+        if key in self._recent_current or key in self._recent_previous:
+            self.suppressed_count += 1
+            return True
+        self._recent_current.add(key)
+        return False
     
     def send_notification(self,
                          notification_type: NotificationType,
@@ -65,6 +304,12 @@ class NotificationService:
                          extra_data: Optional[Dict[str, Any]] = None):
         """发送通知到事件队列"""
         try:
+            with self._dedup_lock:
+                duplicate = self._is_duplicate(notification_type, message)
+            if duplicate:
+                self.logger.debug("Duplicate notification suppressed: %s - %s", _TYPE_VALUES[notification_type], message)
+                return
+            
             notification = self._create_notification(
                 notification_type=notification_type,
                 message=message,
@@ -72,14 +317,28 @@ class NotificationService:
                 extra_data=extra_data
             )
             
-            # 推送到事件队列
-            push_notification(notification)
+            # 写入缓冲区，由推送线程批量推送到事件队列
+            self._ensure_drain_thread()
+            self._enqueue(notification, status)
+            if not self._wakeup.is_set():
+                self._wakeup.set()
             
-            self.logger.info(f"Notification sent: {notification_type.value} - {message}")
+            self.logger.debug("Notification sent: %s - %s", _TYPE_VALUES[notification_type], message)
             
         except Exception as e:
             self.logger.error(f"Failed to send notification: {e}")
     
+    async def send_notification_async(self,
+                                      notification_type: NotificationType,
+                                      message: str,
+                                      status: NotificationStatus = NotificationStatus.INFO,
+                                      extra_data: Optional[Dict[str, Any]] = None):
+        """在协程中发送通知
+        
+        发送路径只写入内存缓冲区，推送由后台线程完成，不会阻塞事件循环
+        """
+        self.send_notification(notification_type, message, status, extra_data)
+    
     # ==================== 模型相关通知 ====================
     
     def notify_model_download_started(self, model_name: str, model_id: str = None):
@@ -108,9 +367,7 @@ class NotificationService:
     
     def notify_model_download_failed(self, model_name: str, error: str = None, model_id: str = None):
         """通知模型下载失败"""
-        message = f"模型下载失败: {model_name}"
-        if error:
-            message += f" - {error}"
+        message = f"模型下载失败: {model_name} - {error}" if error else f"模型下载失败: {model_name}"
         
         extra_data = {'model_id': model_id, 'error': error} if model_id or error else None
         
@@ -149,9 +406,7 @@ class NotificationService:
     
     def notify_deployment_completed(self, model_name: str, endpoint: str = None, deployment_id: str = None):
         """通知部署完成"""
-        message = f"模型部署成功: {model_name}"
-        if endpoint:
-            message += f" (端点: {endpoint})"
+        message = f"模型部署成功: {model_name} (端点: {endpoint})" if endpoint else f"模型部署成功: {model_name}"
         
         extra_data = {
             'deployment_id': deployment_id,
@@ -167,9 +422,7 @@ class NotificationService:
     
     def notify_deployment_failed(self, model_name: str, error: str = None, deployment_id: str = None):
         """通知部署失败"""
-        message = f"模型部署失败: {model_name}"
-        if error:
-            message += f" - {error}"
+        message = f"模型部署失败: {model_name} - {error}" if error else f"模型部署失败: {model_name}"
         
         extra_data = {
             'deployment_id': deployment_id,
@@ -199,9 +452,8 @@ class NotificationService:
     
     def notify_system_memory_warning(self, usage_percent: float, available_gb: float = None):
         """通知系统内存告警"""
-        message = f"系统内存使用率过高: {usage_percent:.1f}%"
-        if available_gb:
-            message += f"，可用内存: {available_gb:.1f}GB"
+        message = (f"系统内存使用率过高: {usage_percent:.1f}%，可用内存: {available_gb:.1f}GB" if available_gb
+                   else f"系统内存使用率过高: {usage_percent:.1f}%")
         
         extra_data = {
             'usage_percent': usage_percent,
@@ -217,9 +469,8 @@ class NotificationService:
     
     def notify_system_disk_warning(self, usage_percent: float, available_gb: float = None):
         """通知系统磁盘告警"""
-        message = f"系统磁盘使用率过高: {usage_percent:.1f}%"
-        if available_gb:
-            message += f"，可用空间: {available_gb:.1f}GB"
+        message = (f"系统磁盘使用率过高: {usage_percent:.1f}%，可用空间: {available_gb:.1f}GB" if available_gb
+                   else f"系统磁盘使用率过高: {usage_percent:.1f}%")
         
         extra_data = {
             'usage_percent': usage_percent,
@@ -235,9 +486,7 @@ class NotificationService:
     
     def notify_system_error(self, error_message: str, component: str = None):
         """通知系统错误"""
-        message = f"系统错误: {error_message}"
-        if component:
-            message = f"系统错误 ({component}): {error_message}"
+        message = f"系统错误 ({component}): {error_message}" if component else f"系统错误: {error_message}"
         
         extra_data = {'component': component, 'error': error_message} if component else {'error': error_message}
         
@@ -250,9 +499,7 @@ class NotificationService:
     
     def notify_system_restart(self, component: str = None):
         """通知系统重启"""
-        message = "系统重启完成"
-        if component:
-            message = f"系统组件重启完成: {component}"
+        message = f"系统组件重启完成: {component}" if component else "系统重启完成"
         
         extra_data = {'component': component} if component else None
         
@@ -267,9 +514,7 @@ class NotificationService:
     
     def notify_download_started(self, filename: str, size_mb: float = None):
         """通知下载开始"""
-        message = f"开始下载: {filename}"
-        if size_mb:
-            message += f" ({size_mb:.1f}MB)"
+        message = f"开始下载: {filename} ({size_mb:.1f}MB)" if size_mb else f"开始下载: {filename}"
         
         extra_data = {'filename': filename, 'size_mb': size_mb} if size_mb else {'filename': filename}
         
@@ -282,11 +527,9 @@ class NotificationService:
     
     def notify_download_completed(self, filename: str, size_mb: float = None, duration_seconds: int = None):
         """通知下载完成"""
-        message = f"下载完成: {filename}"
-        if size_mb:
-            message += f" ({size_mb:.1f}MB)"
-        if duration_seconds:
-            message += f"，耗时: {duration_seconds}秒"
+        size_part = f" ({size_mb:.1f}MB)" if size_mb else ""
+        duration_part = f"，耗时: {duration_seconds}秒" if duration_seconds else ""
+        message = f"下载完成: {filename}{size_part}{duration_part}"
         
         extra_data = {
             'filename': filename,
@@ -305,9 +548,7 @@ class NotificationService:
     
     def notify_download_failed(self, filename: str, error: str = None):
         """通知下载失败"""
-        message = f"下载失败: {filename}"
-        if error:
-            message += f" - {error}"
+        message = f"下载失败: {filename} - {error}" if error else f"下载失败: {filename}"
         
         extra_data = {'filename': filename, 'error': error} if error else {'filename': filename}
         
@@ -334,9 +575,7 @@ class NotificationService:
     
     def notify_data_backup_completed(self, backup_name: str, size_mb: float = None):
         """通知数据备份完成"""
-        message = f"数据备份完成: {backup_name}"
-        if size_mb:
-            message += f" ({size_mb:.1f}MB)"
+        message = f"数据备份完成: {backup_name} ({size_mb:.1f}MB)" if size_mb else f"数据备份完成: {backup_name}"
         
         extra_data = {'backup_name': backup_name, 'size_mb': size_mb} if size_mb else {'backup_name': backup_name}
         
@@ -349,9 +588,7 @@ class NotificationService:
     
     def notify_data_import_completed(self, dataset_name: str, records_count: int = None):
         """通知数据导入完成"""
-        message = f"数据导入完成: {dataset_name}"
-        if records_count:
-            message += f" ({records_count:,} 条记录)"
+        message = f"数据导入完成: {dataset_name} ({records_count:,} 条记录)" if records_count else f"数据导入完成: {dataset_name}"
         
         extra_data = {
             'dataset_name': dataset_name,
@@ -367,9 +604,7 @@ class NotificationService:
     
     def notify_data_processing_error(self, dataset_name: str, error: str = None):
         """通知数据处理错误"""
-        message = f"数据处理出错: {dataset_name}"
-        if error:
-            message += f" - {error}"
+        message = f"数据处理出错: {dataset_name} - {error}" if error else f"数据处理出错: {dataset_name}"
         
         extra_data = {'dataset_name': dataset_name, 'error': error} if error else {'dataset_name': dataset_name}
         
@@ -386,57 +621,43 @@ notification_service = NotificationService()
 
 
 # ==================== 便捷函数 ====================
+# 直接绑定全局实例的方法，调用时不再经过一层包装函数
 
-def send_notification(notification_type: NotificationType, 
-                     message: str, 
-                     status: NotificationStatus = NotificationStatus.INFO,
-                     extra_data: Optional[Dict[str, Any]] = None):
-    """发送通知的便捷函数"""
-    notification_service.send_notification(notification_type, message, status, extra_data)
-
+send_notification = notification_service.send_notification
+send_notification_async = notification_service.send_notification_async
 
 # 模型相关便捷函数
-def notify_model_download_started(model_name: str, model_id: str = None):
-    notification_service.notify_model_download_started(model_name, model_id)
-
-def notify_model_download_completed(model_name: str, model_id: str = None):
-    notification_service.notify_model_download_completed(model_name, model_id)
-
-def notify_model_download_failed(model_name: str, error: str = None, model_id: str = None):
-    notification_service.notify_model_download_failed(model_name, error, model_id)
-
-def notify_model_deleted(model_name: str, model_id: str = None):
-    notification_service.notify_model_deleted(model_name, model_id)
-
+notify_model_download_started = notification_service.notify_model_download_started
+notify_model_download_completed = notification_service.notify_model_download_completed
+notify_model_download_failed = notification_service.notify_model_download_failed
+notify_model_deleted = notification_service.notify_model_deleted
 
 # 部署相关便捷函数
-def notify_deployment_started(model_name: str, deployment_id: str = None):
-    notification_service.notify_deployment_started(model_name, deployment_id)
-
-def notify_deployment_completed(model_name: str, endpoint: str = None, deployment_id: str = None):
-    notification_service.notify_deployment_completed(model_name, endpoint, deployment_id)
-
-def notify_deployment_failed(model_name: str, error: str = None, deployment_id: str = None):
-    notification_service.notify_deployment_failed(model_name, error, deployment_id)
-
-def notify_deployment_stopped(model_name: str, deployment_id: str = None):
-    notification_service.notify_deployment_stopped(model_name, deployment_id)
-
+notify_deployment_started = notification_service.notify_deployment_started
+notify_deployment_completed = notification_service.notify_deployment_completed
+notify_deployment_failed = notification_service.notify_deployment_failed
+notify_deployment_stopped = notification_service.notify_deployment_stopped
 
 # 系统相关便捷函数
-def notify_system_memory_warning(usage_percent: float, available_gb: float = None):
-    notification_service.notify_system_memory_warning(usage_percent, available_gb)
+notify_system_memory_warning = notification_service.notify_system_memory_warning
+notify_system_disk_warning = notification_service.notify_system_disk_warning
+notify_system_error = notification_service.notify_system_error
 
-def notify_system_disk_warning(usage_percent: float, available_gb: float = None):
-    notification_service.notify_system_disk_warning(usage_percent, available_gb)
-
-def notify_system_error(error_message: str, component: str = None):
-    notification_service.notify_system_error(error_message, component)
+# 下载相关便捷函数
+notify_download_completed = notification_service.notify_download_completed
+notify_download_failed = notification_service.notify_download_failed
 
+# 事件名到通知方法的映射，如 notify('deployment_failed', model_name=..., error=...)
+_DISPATCH = {
+    name[len('notify_'):]: getattr(notification_service, name)
+    for name in dir(NotificationService)
+    if name.startswith('notify_')
+}
 
-# 下载相关便捷函数
-def notify_download_completed(filename: str, size_mb: float = None, duration_seconds: int = None):
-    notification_service.notify_download_completed(filename, size_mb, duration_seconds)
 
-def notify_download_failed(filename: str, error: str = None):
-    notification_service.notify_download_failed(filename, error) 
\ No newline at end of file
+def notify(event: str, *args, **kwargs):
+    """按事件名发送通知"""
+    handler = _DISPATCH.get(event)
+    if handler is None:
+        raise ValueError(f"Unknown notification event: {event}")
+    handler(*args, **kwargs)
@@ -1,11 +1,16 @@
 import logging
 import os
+import socket
+import select
+import signal
 import time
-import subprocess
+import threading
 import platform
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, Optional
-from ctypes import CDLL, c_uint, byref, create_string_buffer, cast, POINTER, c_int32, c_int64
+from typing import Dict, Any, List, Optional, Tuple
+from ctypes import (CDLL, byref, create_string_buffer, cast, POINTER, c_char_p, c_int, c_int32,
+                    c_int64, c_size_t, c_void_p)
 from ctypes.util import find_library
 
 import psutil
@@ -17,37 +22,152 @@ try:
 except ImportError:
     GPU_AVAILABLE = False
 
+try:
+    import pynvml
+
+    pynvml.nvmlInit()
+    # 设备句柄在进程内保持有效，初始化时获取一次
+    _NVML_HANDLES = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+    NVML_AVAILABLE = bool(_NVML_HANDLES)
+except Exception:
+    _NVML_HANDLES = []
+    NVML_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# CPU核心数在进程生命周期内不变，导入时获取一次
+_CPU_COUNT_PHYSICAL = psutil.cpu_count(logical=False)
+_CPU_COUNT_LOGICAL = psutil.cpu_count(logical=True)
+
+# SO_REUSEADDR的语义因平台而异，仅在Linux下用于端口可用性检测
+_IS_LINUX = platform.system() == 'Linux'
+
+# 监控循环中频繁调用的psutil函数，绑定为模块级名称省去每次的属性查找
+_cpu_percent = psutil.cpu_percent
+_virtual_memory = psutil.virtual_memory
+_disk_usage = psutil.disk_usage
+_disk_io_counters = psutil.disk_io_counters
+_net_io_counters = psutil.net_io_counters
+_pids = psutil.pids
+
+
+def _load_sysctlbyname():
+    """加载libc中的sysctlbyname（macOS/BSD），并声明参数类型；不可用时返回None"""
+    try:
+        sysctlbyname = CDLL(find_library('c')).sysctlbyname
+    except Exception:
+        return None
+    sysctlbyname.argtypes = (c_char_p, c_void_p, POINTER(c_size_t), c_void_p, c_size_t)
+    sysctlbyname.restype = c_int
+    return sysctlbyname
+
+
+_SYSCTLBYNAME = _load_sysctlbyname()
+
+
+def _sample_cpu() -> Tuple[float, List[float]]:
+    """非阻塞采样CPU使用率，返回(总体使用率, 各核心使用率)
+    
+    interval=None 时psutil返回距上次采样以来的使用率，无需在调用方阻塞等待
+    """
+    per_core = _cpu_percent(interval=None, percpu=True)
+    total = round(sum(per_core) / len(per_core), 1) if per_core else 0.0
+    return total, per_core
+
+
+# 导入时先采样一次，作为第一次调用的基准
+_sample_cpu()
+
+
+# 外部命令使用固定的最小环境变量，输出不受用户locale影响
+_SPAWN_ENV = {'PATH': '/usr/bin:/bin:/usr/sbin:/sbin', 'LANG': 'C', 'LC_ALL': 'C'}
+
+
+def _spawn_output(path: str, args: List[str], timeout: float) -> Optional[str]:
+    """通过posix_spawn执行外部命令并读取标准输出，失败或超时返回None
+
+    posix_spawn不复制父进程的地址空间，避免在内存占用较大的API进程中fork
+    """
+    read_fd, write_fd = os.pipe()
+    try:
+        pid = os.posix_spawn(path, [path, *args], _SPAWN_ENV, file_actions=[
+            (os.POSIX_SPAWN_DUP2, write_fd, 1),
+            (os.POSIX_SPAWN_OPEN, 2, os.devnull, os.O_WRONLY, 0),
+            (os.POSIX_SPAWN_CLOSE, read_fd),
+        ])
+    except Exception:
+        os.close(read_fd)
+        os.close(write_fd)
+        return None
+    os.close(write_fd)
+
+    chunks = []
+    deadline = time.monotonic() + timeout
+    timed_out = False
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([read_fd], [], [], remaining)[0]:
+                timed_out = True
+                break
+            chunk = os.read(read_fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        os.close(read_fd)
+        if timed_out:
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        _, status = os.waitpid(pid, 0)
+
+    if timed_out or os.waitstatus_to_exitcode(status) != 0:
+        return None
+    return b''.join(chunks).decode('utf-8', errors='replace')
+
+
+# 等待进程退出的后台线程池，终止信号发出后API线程无需阻塞等待
+_KILL_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix='ProcessKiller')
+
+
+# 静态GPU信息尚未检测的标记（检测结果可能为None）
+_NOT_DETECTED = object()
+
 
 class SystemService:
     """系统监控服务 - 专注于CPU、内存、磁盘、GPU使用率"""
 
+    # Apple Silicon等静态GPU信息，进程内只检测一次
+    _static_gpu_info = _NOT_DETECTED
+
+    # CPU/内存/磁盘使用率快照，短时间内的多次查询共用一次采样
+    SNAPSHOT_TTL = 0.5
+    _snapshot: Optional[Tuple[float, Dict[str, float]]] = None
+    _snapshot_lock = threading.Lock()
+
+    # 后台等待中的进程终止任务：PID -> Future
+    _kill_jobs: Dict[int, Future] = {}
+    _kill_jobs_lock = threading.Lock()
+
     def __init__(self):
         self.start_time = time.time()
-        self._libc = None
-        self._init_sysctl()
-
-    def _init_sysctl(self):
-        """初始化sysctl接口"""
-        try:
-            self._libc = CDLL(find_library('c'))
-        except Exception:
-            self._libc = None
 
     def _sysctl(self, name: str, output_type=str):
         """通过sysctl获取系统信息"""
-        if not self._libc:
+        if _SYSCTLBYNAME is None:
             return None
         
         try:
-            size = c_uint(0)
+            encoded_name = name.encode()
+            size = c_size_t(0)
             # 找出缓冲区大小
-            self._libc.sysctlbyname(name.encode(), None, byref(size), None, 0)
+            _SYSCTLBYNAME(encoded_name, None, byref(size), None, 0)
             # 创建缓冲区
             buf = create_string_buffer(size.value)
             # 重新运行，提供缓冲区
-            self._libc.sysctlbyname(name.encode(), buf, byref(size), None, 0)
+            _SYSCTLBYNAME(encoded_name, buf, byref(size), None, 0)
             
             if output_type in (str, 'str'):
                 return buf.value.decode() if buf.value else None
@@ -64,15 +184,8 @@ class SystemService:
     def _get_cpu_usage_info(self) -> Dict[str, Any]:
         """获取CPU使用率信息"""
         try:
-            # 获取总体CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=1)
-            
-            # 获取每个核心的使用率
-            cpu_percent_per_core = psutil.cpu_percent(interval=0.1, percpu=True)
-            
-            # 获取CPU基本信息
-            cpu_count_physical = psutil.cpu_count(logical=False)
-            cpu_count_logical = psutil.cpu_count(logical=True)
+            # 获取总体和每个核心的CPU使用率（一次采样）
+            cpu_percent, cpu_percent_per_core = _sample_cpu()
             
             # 获取负载平均值（如果可用）
             load_avg = None
@@ -82,8 +195,8 @@ class SystemService:
             return {
                 'usage_percent': cpu_percent,
                 'usage_per_core': cpu_percent_per_core,
-                'count_physical': cpu_count_physical,
-                'count_logical': cpu_count_logical,
+                'count_physical': _CPU_COUNT_PHYSICAL,
+                'count_logical': _CPU_COUNT_LOGICAL,
                 'load_average': load_avg,
                 'status': 'available'
             }
@@ -94,25 +207,42 @@ class SystemService:
                 'error': str(e)
             }
 
+    def _get_snapshot(self) -> Dict[str, float]:
+        """获取CPU、内存、磁盘使用率快照（SNAPSHOT_TTL内复用）"""
+        with SystemService._snapshot_lock:
+            cached = SystemService._snapshot
+            now = time.monotonic()
+            if cached and now - cached[0] < self.SNAPSHOT_TTL:
+                return cached[1]
+
+            cpu_percent, _ = _sample_cpu()
+            disk = _disk_usage('/')
+            snapshot = {
+                'cpu_percent': cpu_percent,
+                'memory_percent': _virtual_memory().percent,
+                'disk_percent': round((disk.used / disk.total) * 100, 2)
+            }
+            SystemService._snapshot = (now, snapshot)
+            return snapshot
+
     def get_system_resources(self) -> Dict[str, Any]:
         """获取系统资源使用率信息"""
         try:
+            snapshot = self._get_snapshot()
+
             # CPU使用率
-            cpu_percent = psutil.cpu_percent(interval=1)
             cpu_info = {
-                'usage_percent': cpu_percent
+                'usage_percent': snapshot['cpu_percent']
             }
 
             # 内存使用率
-            memory = psutil.virtual_memory()
             memory_info = {
-                'percent': memory.percent
+                'percent': snapshot['memory_percent']
             }
 
             # 磁盘使用率
-            disk = psutil.disk_usage('/')
             disk_info = {
-                'percent': round((disk.used / disk.total) * 100, 2)
+                'percent': snapshot['disk_percent']
             }
 
             # GPU使用率
@@ -133,7 +263,14 @@ class SystemService:
     def _get_gpu_usage_info(self) -> Dict[str, Any]:
         """获取GPU使用率信息"""
         
-        # 方法1: 使用GPUtil获取独立显卡信息（NVIDIA/AMD等）
+        # 方法1: 通过NVML直接读取NVIDIA显卡使用率（进程内调用，无需启动子进程）
+        if NVML_AVAILABLE:
+            try:
+                return self._get_nvml_usage_info()
+            except Exception as e:
+                logger.debug(f"NVML failed: {str(e)}")
+        
+        # 方法2: 使用GPUtil获取独立显卡信息（NVIDIA/AMD等）
         if GPU_AVAILABLE:
             try:
                 gpus = GPUtil.getGPUs()
@@ -157,7 +294,46 @@ class SystemService:
             except Exception as e:
                 logger.debug(f"GPUtil failed: {str(e)}")
         
-        # 方法2: 检测Apple Silicon或其他集成GPU
+        # 方法3: Apple Silicon等无法获取使用率的GPU，检测结果不会变化，只检测一次
+        static_info = self._get_static_gpu_info()
+        if static_info:
+            return dict(static_info)
+        
+        # 如果所有方法都失败
+        return {
+            'usage_percent': 0, 
+            'available': False,
+            'note': '未检测到GPU或GPU不支持'
+        }
+
+    def _get_nvml_usage_info(self) -> Dict[str, Any]:
+        """通过NVML获取NVIDIA显卡使用率，字段与GPUtil方式一致"""
+        usages = [pynvml.nvmlDeviceGetUtilizationRates(handle).gpu for handle in _NVML_HANDLES]
+        
+        # 获取第一个GPU的详细信息作为代表
+        main_gpu = _NVML_HANDLES[0]
+        memory = pynvml.nvmlDeviceGetMemoryInfo(main_gpu)
+        name = pynvml.nvmlDeviceGetName(main_gpu)
+        mib = 1024 * 1024
+        return {
+            'usage_percent': round(sum(usages) / len(usages), 2),
+            'available': True,
+            'type': 'discrete',
+            'name': name.decode() if isinstance(name, bytes) else name,
+            'memory_used': memory.used / mib,
+            'memory_total': memory.total / mib,
+            'memory_percent': round(memory.used / memory.total * 100, 2),
+            'temperature': pynvml.nvmlDeviceGetTemperature(main_gpu, pynvml.NVML_TEMPERATURE_GPU)
+        }
+
+    def _get_static_gpu_info(self) -> Optional[Dict[str, Any]]:
+        """获取只需检测一次的GPU信息（进程内缓存）"""
+        if SystemService._static_gpu_info is _NOT_DETECTED:
+            SystemService._static_gpu_info = self._detect_static_gpu()
+        return SystemService._static_gpu_info
+
+    def _detect_static_gpu(self) -> Optional[Dict[str, Any]]:
+        """检测Apple Silicon集成GPU或系统报告的GPU"""
         try:
             cpu_brand = self._sysctl('machdep.cpu.brand_string')
             if cpu_brand and any(chip in cpu_brand for chip in ['Apple M1', 'Apple M2', 'Apple M3']):
@@ -172,13 +348,11 @@ class SystemService:
         except Exception:
             pass
         
-        # 方法3: 通过系统信息检测其他GPU
+        # 通过系统信息检测其他GPU
         try:
             if platform.system() == 'Darwin':  # macOS
-                result = subprocess.run(['system_profiler', 'SPDisplaysDataType'], 
-                                      capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    output = result.stdout
+                output = _spawn_output('/usr/sbin/system_profiler', ['SPDisplaysDataType'], timeout=5)
+                if output is not None:
                     if 'Metal' in output or 'GPU' in output:
                         return {
                             'usage_percent': 0,
@@ -186,30 +360,10 @@ class SystemService:
                             'type': 'system_detected',
                             'note': '系统检测到GPU但无法获取详细信息'
                         }
-            elif platform.system() == 'Linux':
-                # Linux系统可以尝试其他GPU检测方法
-                try:
-                    result = subprocess.run(['nvidia-smi', '--query-gpu=utilization.gpu', '--format=csv,noheader,nounits'], 
-                                          capture_output=True, text=True, timeout=3)
-                    if result.returncode == 0:
-                        usage = float(result.stdout.strip())
-                        return {
-                            'usage_percent': usage,
-                            'available': True,
-                            'type': 'nvidia_smi',
-                            'note': '通过nvidia-smi获取'
-                        }
-                except (subprocess.CalledProcessError, ValueError, FileNotFoundError):
-                    pass
         except Exception:
             pass
         
-        # 如果所有方法都失败
-        return {
-            'usage_percent': 0, 
-            'available': False,
-            'note': '未检测到GPU或GPU不支持'
-        }
+        return None
 
     def get_process_info(self, pid: int) -> Optional[Dict[str, Any]]:
         """获取进程信息"""
@@ -254,16 +408,18 @@ class SystemService:
             return None
 
     def check_port_availability(self, port: int) -> bool:
-        """检查端口是否可用"""
-        try:
-            connections = psutil.net_connections()
-            for conn in connections:
-                if conn.laddr.port == port and conn.status == psutil.CONN_LISTEN:
-                    return False
-            return True
-        except Exception as e:
-            logger.error(f"Failed to check port availability: {str(e)}")
-            return False
+        """检查端口是否可用：尝试绑定，由内核判断端口是否已被监听"""
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            # Linux下允许绑定处于TIME_WAIT的端口，与服务进程实际监听时的行为一致；
+            # macOS/BSD下SO_REUSEADDR允许通配地址与仅监听回环地址的端口共存，会误判为可用
+            if _IS_LINUX:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                sock.bind(('', port))
+                return True
+            except (OSError, OverflowError):
+                # 端口超出范围时bind抛出OverflowError
+                return False
 
     def find_available_port(self, start_port: int = 8000, end_port: int = 9000) -> Optional[int]:
         """找到可用端口"""
@@ -272,8 +428,12 @@ class SystemService:
                 return port
         return None
 
-    def kill_process(self, pid: int, force: bool = False) -> bool:
-        """终止进程"""
+    def kill_process(self, pid: int, force: bool = False, wait: bool = True) -> bool:
+        """终止进程
+
+        wait为False时发出终止信号后立即返回，等待退出及超时强制终止在后台线程中完成，
+        可通过get_kill_status查询结果
+        """
         try:
             process = psutil.Process(pid)
 
@@ -282,7 +442,26 @@ class SystemService:
             else:
                 process.terminate()
 
-            # 等待进程结束
+            if not wait:
+                future = _KILL_POOL.submit(self._wait_for_exit, process, force)
+                with SystemService._kill_jobs_lock:
+                    # 清理已完成的任务，避免记录无限增长
+                    for done_pid in [p for p, f in SystemService._kill_jobs.items() if f.done()]:
+                        del SystemService._kill_jobs[done_pid]
+                    SystemService._kill_jobs[pid] = future
+                return True
+
+            return self._wait_for_exit(process, force)
+
+        except psutil.NoSuchProcess:
+            return True  # 进程已经不存在
+        except Exception as e:
+            logger.error(f"Failed to terminate process PID {pid}: {str(e)}")
+            return False
+
+    def _wait_for_exit(self, process: psutil.Process, force: bool) -> bool:
+        """等待进程结束，优雅关闭超时后强制终止"""
+        try:
             try:
                 process.wait(timeout=10)
             except psutil.TimeoutExpired:
@@ -290,33 +469,46 @@ class SystemService:
                     # 如果优雅关闭失败，强制终止
                     process.kill()
                     process.wait(timeout=5)
-
             return True
-
         except psutil.NoSuchProcess:
-            return True  # 进程已经不存在
+            return True
         except Exception as e:
-            logger.error(f"Failed to terminate process PID {pid}: {str(e)}")
+            logger.error(f"Failed to terminate process PID {process.pid}: {str(e)}")
             return False
 
+    def get_kill_status(self, pid: int) -> Dict[str, Any]:
+        """查询后台进程终止任务的状态"""
+        with SystemService._kill_jobs_lock:
+            future = SystemService._kill_jobs.get(pid)
+
+        if future is None:
+            status = 'unknown'
+        elif not future.done():
+            status = 'pending'
+        else:
+            status = 'terminated' if future.result() else 'failed'
+
+        return {'pid': pid, 'status': status}
+
     def get_system_load(self) -> Dict[str, Any]:
         """获取系统负载信息"""
         try:
+            snapshot = self._get_snapshot()
+
             # CPU负载
-            cpu_percent = psutil.cpu_percent(interval=1)
+            cpu_percent = snapshot['cpu_percent']
 
             # 内存负载
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
+            memory_percent = snapshot['memory_percent']
 
             # 磁盘I/O
-            disk_io = psutil.disk_io_counters()
+            disk_io = _disk_io_counters()
 
             # 网络I/O
-            network_io = psutil.net_io_counters()
+            network_io = _net_io_counters()
 
             # 进程数量
-            process_count = len(psutil.pids())
+            process_count = len(_pids())
 
             # 负载等级评估
             load_level = self._calculate_load_level(cpu_percent, memory_percent)
@@ -364,8 +556,10 @@ class SystemService:
             health_checks = []
             overall_status = 'healthy'
 
+            snapshot = self._get_snapshot()
+
             # CPU检查
-            cpu_percent = psutil.cpu_percent(interval=1)
+            cpu_percent = snapshot['cpu_percent']
             cpu_status = 'healthy' if cpu_percent < 80 else 'warning' if cpu_percent < 95 else 'critical'
             health_checks.append({
                 'component': 'cpu',
@@ -375,18 +569,17 @@ class SystemService:
             })
 
             # 内存检查
-            memory = psutil.virtual_memory()
-            memory_status = 'healthy' if memory.percent < 80 else 'warning' if memory.percent < 95 else 'critical'
+            memory_percent = snapshot['memory_percent']
+            memory_status = 'healthy' if memory_percent < 80 else 'warning' if memory_percent < 95 else 'critical'
             health_checks.append({
                 'component': 'memory',
                 'status': memory_status,
-                'value': memory.percent,
-                'message': f'内存使用率: {memory.percent}%'
+                'value': memory_percent,
+                'message': f'内存使用率: {memory_percent}%'
             })
 
             # 磁盘检查
-            disk = psutil.disk_usage('/')
-            disk_percent = (disk.used / disk.total) * 100
+            disk_percent = snapshot['disk_percent']
             disk_status = 'healthy' if disk_percent < 80 else 'warning' if disk_percent < 95 else 'critical'
             health_checks.append({
                 'component': 'disk',
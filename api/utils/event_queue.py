@@ -7,12 +7,17 @@ import logging
 import queue
 import threading
 import time
-from datetime import datetime
-from typing import Dict, Any, Optional
+from collections import deque
+from typing import Callable, Dict, Any, Iterable, Optional
 from enum import Enum
 
+from .helpers import utc_now_iso
+
 logger = logging.getLogger(__name__)
 
+# 监听器每次唤醒后最多连续取出的事件数
+LISTENER_BATCH_SIZE = 64
+
 
 class EventType(Enum):
     """事件类型枚举"""
@@ -21,29 +26,158 @@ class EventType(Enum):
     NOTIFICATION = "notification"
 
 
+class EventBuffer:
+    """多生产者、单消费者的事件缓冲区
+
+    基于deque实现：append/popleft在CPython中是原子操作，写入和读取都不需要加锁；
+    设置容量上限时写满自动丢弃最旧的事件。生产者只在消费者等待时才通过Event唤醒它
+    """
+    
+    def __init__(self, maxlen: Optional[int] = None):
+        self._items = deque(maxlen=maxlen)
+        self._ready = threading.Event()
+    
+    def put(self, item):
+        """写入事件"""
+        self._items.append(item)
+        if not self._ready.is_set():
+            self._ready.set()
+    
+    def get(self, timeout: Optional[float] = None):
+        """取出最早的事件，超时仍为空时抛出queue.Empty"""
+        while True:
+            try:
+                return self._items.popleft()
+            except IndexError:
+                pass
+            # 先清除唤醒标志再检查一次，避免漏掉清除前刚写入的事件
+            self._ready.clear()
+            if self._items:
+                continue
+            if not self._ready.wait(timeout):
+                raise queue.Empty
+    
+    def drain(self, max_items: int) -> list:
+        """不等待地取出最多max_items个事件"""
+        items = []
+        try:
+            while len(items) < max_items:
+                items.append(self._items.popleft())
+        except IndexError:
+            pass
+        return items
+    
+    def qsize(self) -> int:
+        """当前缓冲的事件数"""
+        return len(self._items)
+    
+    def clear(self):
+        """丢弃所有缓冲的事件"""
+        self._items.clear()
+
+
+class LatestEventSlot:
+    """只保留最新事件的单槽缓冲区
+
+    新事件覆盖（或通过merge合并进）尚未被取走的事件，广播跟不上时不会积压过期快照；
+    接口与EventBuffer一致，监听器无需区分
+    """
+    
+    def __init__(self, merge: Optional[Callable[[dict, dict], dict]] = None):
+        self._merge = merge
+        self._pending = None
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+    
+    def put(self, item):
+        """写入事件，None为停止信号"""
+        with self._lock:
+            if item is None:
+                self._stopped = True
+            elif self._pending is None or self._merge is None:
+                self._pending = item
+            else:
+                self._pending = self._merge(self._pending, item)
+            self._ready.set()
+    
+    def _take(self) -> list:
+        """取出待处理的事件和停止信号（调用方持有锁）"""
+        items = []
+        if self._pending is not None:
+            items.append(self._pending)
+            self._pending = None
+        if self._stopped:
+            items.append(None)
+            self._stopped = False
+        return items
+    
+    def get(self, timeout: Optional[float] = None):
+        """取出最新事件，超时仍为空时抛出queue.Empty"""
+        while True:
+            with self._lock:
+                if self._pending is not None:
+                    item, self._pending = self._pending, None
+                    return item
+                if self._stopped:
+                    self._stopped = False
+                    return None
+                self._ready.clear()
+            if not self._ready.wait(timeout):
+                raise queue.Empty
+    
+    def drain(self, max_items: int) -> list:
+        """不等待地取出待处理的事件"""
+        with self._lock:
+            return self._take()[:max_items]
+    
+    def qsize(self) -> int:
+        """当前待处理的事件数（0或1）"""
+        return int(self._pending is not None)
+    
+    def clear(self):
+        """丢弃待处理的事件"""
+        with self._lock:
+            self._pending = None
+
+
+def _merge_model_status(pending: dict, latest: dict) -> dict:
+    """合并两次模型状态推送：推送的是变化的模型，按模型ID合并，同一模型以新状态为准"""
+    models = {model['id']: model for model in pending['models']}
+    models.update((model['id'], model) for model in latest['models'])
+    return {**latest, 'models': list(models.values())}
+
+
 class EventQueue:
     """事件队列管理器"""
     
     def __init__(self):
-        # 为每种事件类型创建独立的队列
+        # 为每种事件类型创建独立的缓冲区
+        # 监控类事件只保留最新的一份：系统指标直接覆盖，模型状态按模型合并；通知不能丢弃，按顺序排队
         self.queues = {
-            EventType.SYSTEM_METRICS: queue.Queue(),
-            EventType.MODEL_STATUS: queue.Queue(),
-            EventType.NOTIFICATION: queue.Queue()
+            EventType.SYSTEM_METRICS: LatestEventSlot(),
+            EventType.MODEL_STATUS: LatestEventSlot(merge=_merge_model_status),
+            EventType.NOTIFICATION: EventBuffer()
         }
         
         # 队列监听器线程
         self.listeners = {}
         self.running = False
         
-        # WebSocket广播回调函数
+        # WebSocket广播回调函数：事件类型 -> (回调函数, 是否按批调用)
         self.broadcast_callbacks = {}
+        # 回调注册表版本号，监听器据此判断本地缓存的回调是否需要刷新
+        self._callbacks_version = 0
         
         logger.info("Event queue manager initialized")
     
-    def register_broadcast_callback(self, event_type: EventType, callback):
-        """注册WebSocket广播回调函数"""
-        self.broadcast_callbacks[event_type] = callback
+    def register_broadcast_callback(self, event_type: EventType, callback, batch: bool = False):
+        """注册WebSocket广播回调函数
+
+        batch为True时回调函数接收一次唤醒取出的全部事件列表，否则逐个事件调用
+        """
+        self.broadcast_callbacks[event_type] = (callback, batch)
+        self._callbacks_version += 1
         logger.info(f"Registered broadcast callback for {event_type.value}")
     
     def push_system_metrics(self, metrics: list, timestamp: str = None, interval: int = None):
@@ -51,52 +185,74 @@ class EventQueue:
         event_data = {
             'type': 'system_metrics',
             'metrics': metrics,
-            'timestamp': timestamp or datetime.utcnow().isoformat(),
+            'timestamp': timestamp or utc_now_iso(),
             'interval': interval
         }
         
         self.queues[EventType.SYSTEM_METRICS].put(event_data)
-        logger.debug(f"System metrics pushed to queue: {len(metrics)} metrics")
+        logger.debug("System metrics pushed to queue: %d metrics", len(metrics))
     
     def push_model_status(self, models: list, timestamp: str = None, interval: int = None):
         """推送模型状态事件到队列"""
         event_data = {
             'type': 'model_status',
             'models': models,
-            'timestamp': timestamp or datetime.utcnow().isoformat(),
+            'timestamp': timestamp or utc_now_iso(),
             'interval': interval
         }
         
         self.queues[EventType.MODEL_STATUS].put(event_data)
-        logger.debug(f"Model status pushed to queue: {len(models)} models")
+        logger.debug("Model status pushed to queue: %d models", len(models))
     
     def push_notification(self, notification: dict, timestamp: str = None):
         """推送通知事件到队列"""
         event_data = {
             'type': 'notification',
             'notification': notification,
-            'timestamp': timestamp or datetime.utcnow().isoformat()
+            'timestamp': timestamp or utc_now_iso()
         }
         
         self.queues[EventType.NOTIFICATION].put(event_data)
-        logger.debug(f"Notification pushed to queue: {notification.get('type')} - {notification.get('message')}")
+        logger.debug("Notification pushed to queue: %s - %s", notification.get('type'), notification.get('message'))
+    
+    def push_notifications(self, notifications: list, timestamp: str = None):
+        """批量推送通知事件，整批只占用一个队列元素"""
+        timestamp = timestamp or utc_now_iso()
+        events = [
+            {
+                'type': 'notification',
+                'notification': notification,
+                'timestamp': timestamp
+            }
+            for notification in notifications
+        ]
+        
+        self.queues[EventType.NOTIFICATION].put(events)
+        logger.debug("Notifications pushed to queue: %d notifications", len(events))
     
-    def start_listeners(self):
-        """启动队列监听器"""
+    def start_listeners(self, spawn: Optional[Callable] = None):
+        """启动队列监听器
+
+        spawn为后台任务启动函数（如socketio.start_background_task），监听器与Socket.IO服务器
+        使用相同的并发模型（线程或eventlet/gevent协程）；未提供时使用守护线程
+        """
         if self.running:
             return
         
         self.running = True
         
         for event_type in EventType:
-            listener_thread = threading.Thread(
-                target=self._queue_listener,
-                args=(event_type,),
-                daemon=True,
-                name=f"EventQueue-{event_type.value}"
-            )
-            listener_thread.start()
-            self.listeners[event_type] = listener_thread
+            if spawn is not None:
+                listener = spawn(self._queue_listener, event_type)
+            else:
+                listener = threading.Thread(
+                    target=self._queue_listener,
+                    args=(event_type,),
+                    daemon=True,
+                    name=f"EventQueue-{event_type.value}"
+                )
+                listener.start()
+            self.listeners[event_type] = listener
             
         logger.info("Event queue listeners started")
     
@@ -108,10 +264,11 @@ class EventQueue:
         for event_type in EventType:
             self.queues[event_type].put(None)  # 停止信号
         
-        # 等待所有监听器线程结束
-        for event_type, thread in self.listeners.items():
-            if thread.is_alive():
-                thread.join(timeout=5)
+        # 等待所有监听器结束（eventlet的协程没有join，不等待）
+        for listener in self.listeners.values():
+            join = getattr(listener, 'join', None)
+            if join is not None:
+                join(timeout=5)
         
         self.listeners.clear()
         logger.info("Event queue listeners stopped")
@@ -120,38 +277,68 @@ class EventQueue:
         """队列监听器工作线程"""
         logger.info(f"Started listener for {event_type.value} events")
         
+        buffer = self.queues[event_type]
+        buffer_get = buffer.get
+        buffer_drain = buffer.drain
+        # 回调在启动后基本不变，缓存在本地，每批只比较一次版本号
+        registered = None
+        version = -1
         while self.running:
             try:
-                # 从队列获取事件，设置超时避免阻塞
-                event_data = self.queues[event_type].get(timeout=1)
+                # 阻塞等待第一个事件（停止时由停止信号唤醒）；之后不等待地取出已积压的事件一并处理
+                items = [buffer_get()]
+                items.extend(buffer_drain(LISTENER_BATCH_SIZE - 1))
                 
-                # 检查停止信号
-                if event_data is None:
-                    break
+                # 检查停止信号，信号之前的事件照常广播
+                stopping = None in items
+                if stopping:
+                    items = items[:items.index(None)]
                 
-                # 调用对应的广播回调函数
-                callback = self.broadcast_callbacks.get(event_type)
-                if callback:
-                    try:
-                        callback(event_data)
-                        logger.debug(f"Broadcasted {event_type.value} event: {event_data.get('type')}")
-                    except Exception as e:
-                        logger.error(f"Failed to broadcast {event_type.value} event: {e}")
-                else:
-                    logger.warning(f"No broadcast callback registered for {event_type.value}")
+                # 批量推送的通知展开为单个事件
+                events = []
+                for item in items:
+                    if isinstance(item, list):
+                        events.extend(item)
+                    else:
+                        events.append(item)
                 
-                # 标记任务完成
-                self.queues[event_type].task_done()
+                if events:
+                    if version != self._callbacks_version:
+                        version = self._callbacks_version
+                        registered = self.broadcast_callbacks.get(event_type)
+                    self._broadcast(event_type, events, registered)
+                
+                if stopping:
+                    break
                 
-            except queue.Empty:
-                # 超时，继续循环
-                continue
             except Exception as e:
                 logger.error(f"Error in {event_type.value} queue listener: {e}")
                 time.sleep(1)  # 出错时稍作等待
         
         logger.info(f"Stopped listener for {event_type.value} events")
     
+    def _broadcast(self, event_type: EventType, events: list, registered: Optional[tuple]):
+        """调用监听器缓存的广播回调函数"""
+        if not registered:
+            logger.warning(f"No broadcast callback registered for {event_type.value}")
+            return
+        
+        callback, batch = registered
+        if batch:
+            try:
+                callback(events)
+                logger.debug("Broadcasted %d %s events", len(events), event_type.value)
+            except Exception as e:
+                logger.error(f"Failed to broadcast {event_type.value} events: {e}")
+            return
+        
+        for event in events:
+            try:
+                callback(event)
+                logger.debug("Broadcasted %s event: %s", event_type.value, event.get('type'))
+            except Exception as e:
+                logger.error(f"Failed to broadcast {event_type.value} event: {e}")
+    
     def get_queue_stats(self) -> Dict[str, int]:
         """获取队列统计信息"""
         stats = {}
@@ -162,12 +349,7 @@ class EventQueue:
     def clear_queues(self):
         """清空所有队列"""
         for event_type in EventType:
-            while not self.queues[event_type].empty():
-                try:
-                    self.queues[event_type].get_nowait()
-                    self.queues[event_type].task_done()
-                except queue.Empty:
-                    break
+            self.queues[event_type].clear()
         logger.info("All event queues cleared")
 
 
@@ -175,9 +357,9 @@ class EventQueue:
 event_queue = EventQueue()
 
 
-def init_event_queue():
-    """初始化事件队列"""
-    event_queue.start_listeners()
+def init_event_queue(spawn: Optional[Callable] = None):
+    """初始化事件队列，spawn为监听器使用的后台任务启动函数"""
+    event_queue.start_listeners(spawn)
     logger.info("Global event queue initialized")
 
 
@@ -215,7 +397,16 @@ def push_notification(notification: dict, timestamp: str = None):
     )
 
 
-def register_websocket_callbacks(callbacks: Dict[EventType, callable]):
-    """注册WebSocket广播回调函数"""
+def push_notifications(notifications: list, timestamp: str = None):
+    """批量推送通知"""
+    event_queue.push_notifications(
+        notifications=notifications,
+        timestamp=timestamp
+    )
+
+
+def register_websocket_callbacks(callbacks: Dict[EventType, callable], batch_types: Iterable[EventType] = ()):
+    """注册WebSocket广播回调函数，batch_types中的事件类型按批调用回调"""
+    batch_types = frozenset(batch_types)
     for event_type, callback in callbacks.items():
-        event_queue.register_broadcast_callback(event_type, callback) 
\ No newline at end of file
+        event_queue.register_broadcast_callback(event_type, callback, batch=event_type in batch_types) 
\ No newline at end of file
@@ -2,7 +2,12 @@
 
 
 class APIError(Exception):
-    """API基础异常类"""
+    """API基础异常类
+
+    各异常类的属性声明为__slots__，存放在实例的固定槽位中，不再占用__dict__
+    """
+
+    __slots__ = ('message', 'code', 'status_code')
 
     def __init__(self, message: str, code: str = None, status_code: int = 500):
         self.message = message
@@ -10,10 +15,21 @@ class APIError(Exception):
         self.status_code = status_code
         super().__init__(self.message)
 
+    def __reduce__(self):
+        """序列化时带上__slots__中的属性（BaseException默认只保存args和__dict__）"""
+        state = dict(self.__dict__)
+        for cls in type(self).__mro__:
+            for name in cls.__dict__.get('__slots__', ()):
+                if hasattr(self, name):
+                    state[name] = getattr(self, name)
+        return type(self), self.args, state
+
 
 class ValidationError(APIError):
     """参数验证错误"""
 
+    __slots__ = ('field',)
+
     def __init__(self, message: str, field: str = None):
         self.field = field
         super().__init__(message, code='VALIDATION_ERROR', status_code=400)
@@ -22,6 +38,8 @@ class ValidationError(APIError):
 class ExternalServiceError(APIError):
     """外部服务错误"""
 
+    __slots__ = ('service',)
+
     def __init__(self, message: str, service: str = None):
         self.service = service
         super().__init__(message, code='EXTERNAL_SERVICE_ERROR', status_code=503)
@@ -30,6 +48,8 @@ class ExternalServiceError(APIError):
 class ModelNotFoundError(APIError):
     """模型未找到错误"""
 
+    __slots__ = ('model_id',)
+
     def __init__(self, message: str, model_id: str = None):
         self.model_id = model_id
         super().__init__(message, code='MODEL_NOT_FOUND', status_code=404)
@@ -38,6 +58,8 @@ class ModelNotFoundError(APIError):
 class AuthenticationError(APIError):
     """认证错误"""
 
+    __slots__ = ()
+
     def __init__(self, message: str = "认证失败"):
         super().__init__(message, code='AUTHENTICATION_ERROR', status_code=401)
 
@@ -45,6 +67,8 @@ class AuthenticationError(APIError):
 class AuthorizationError(APIError):
     """授权错误"""
 
+    __slots__ = ()
+
     def __init__(self, message: str = "权限不足"):
         super().__init__(message, code='AUTHORIZATION_ERROR', status_code=403)
 
@@ -52,6 +76,8 @@ class AuthorizationError(APIError):
 class ResourceNotFoundError(APIError):
     """资源未找到错误"""
 
+    __slots__ = ('resource_type', 'resource_id')
+
     def __init__(self, message: str, resource_type: str = None, resource_id: str = None):
         self.resource_type = resource_type
         self.resource_id = resource_id
@@ -61,6 +87,8 @@ class ResourceNotFoundError(APIError):
 class ConflictError(APIError):
     """冲突错误"""
 
+    __slots__ = ()
+
     def __init__(self, message: str):
         super().__init__(message, code='CONFLICT_ERROR', status_code=409)
 
@@ -68,6 +96,8 @@ class ConflictError(APIError):
 class RateLimitError(APIError):
     """请求频率限制错误"""
 
+    __slots__ = ()
+
     def __init__(self, message: str = "请求过于频繁"):
         super().__init__(message, code='RATE_LIMIT_ERROR', status_code=429)
 
@@ -75,6 +105,8 @@ class RateLimitError(APIError):
 class DownloadError(APIError):
     """下载错误"""
 
+    __slots__ = ()
+
     def __init__(self, message: str):
         super().__init__(message, code='DOWNLOAD_ERROR', status_code=500)
 
@@ -82,6 +114,8 @@ class DownloadError(APIError):
 class StorageError(APIError):
     """存储错误"""
 
+    __slots__ = ()
+
     def __init__(self, message: str):
         super().__init__(message, code='STORAGE_ERROR', status_code=507)
 
@@ -89,5 +123,7 @@ class StorageError(APIError):
 class NotFoundError(APIError):
     """通用未找到错误"""
 
+    __slots__ = ()
+
     def __init__(self, message: str):
         super().__init__(message, code='NOT_FOUND', status_code=404)
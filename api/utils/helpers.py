@@ -1,7 +1,31 @@
 """辅助工具函数"""
+import json
 import math
-from datetime import datetime
-from typing import Any, Dict, List
+import time
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+from typing import Any, Dict, List, Tuple
+
+from .serialization import dumps_bytes
+
+# 最近一次格式化的整秒时间：(秒, 'YYYY-MM-DDTHH:MM:SS')，同一秒内只需拼接微秒
+_iso_second = (0, '')
+
+
+def utc_now_iso() -> str:
+    """当前UTC时间的ISO 8601字符串（固定带微秒，不带时区后缀）
+
+    秒级部分按秒缓存，避免每次构造datetime对象
+    """
+    global _iso_second
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _iso_second
+    if second != cached_second:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        _iso_second = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1e6):06d}"
 
 
 def format_response(data: Any, message: str = "操作成功", code: int = 200) -> Dict[str, Any]:
@@ -11,10 +35,21 @@ def format_response(data: Any, message: str = "操作成功", code: int = 200) -
         "message": message,
         "data": data,
         "code": code,
-        "timestamp": datetime.utcnow().isoformat() + "Z"
+        "timestamp": utc_now_iso() + "Z"
     }
 
 
+def format_response_bytes(data: Any, message: str = "操作成功", code: int = 200) -> bytes:
+    """格式化成功响应并直接序列化为JSON字节串，可作为Response的body返回"""
+    return dumps_bytes({
+        "success": True,
+        "message": message,
+        "data": data,
+        "code": code,
+        "timestamp": utc_now_iso() + "Z"
+    })
+
+
 def format_error_response(message: str, error_code: str = "ERROR",
                           details: Any = None, status_code: int = 500) -> Dict[str, Any]:
     """格式化错误响应"""
@@ -22,7 +57,7 @@ def format_error_response(message: str, error_code: str = "ERROR",
         "success": False,
         "message": message,
         "error": error_code,
-        "timestamp": datetime.utcnow().isoformat() + "Z"
+        "timestamp": utc_now_iso() + "Z"
     }
 
     if details:
@@ -31,8 +66,12 @@ def format_error_response(message: str, error_code: str = "ERROR",
     return response
 
 
-def paginate_results(items: List[Any], page: int, page_size: int, total: int = None) -> Dict[str, Any]:
-    """分页结果"""
+def paginate_results(items: List[Any], page: int, page_size: int, total: int = None,
+                     pre_sliced: bool = False) -> Dict[str, Any]:
+    """分页结果
+
+    pre_sliced为True时items已是当前页的数据（数据源已按LIMIT/OFFSET取数），不再切片
+    """
     if total is None:
         total = len(items)
 
@@ -45,7 +84,7 @@ def paginate_results(items: List[Any], page: int, page_size: int, total: int = N
     offset = (page - 1) * page_size
 
     # 获取当前页数据
-    if isinstance(items, list):
+    if not pre_sliced and isinstance(items, list):
         page_items = items[offset:offset + page_size]
     else:
         page_items = items
@@ -64,11 +103,9 @@ def paginate_results(items: List[Any], page: int, page_size: int, total: int = N
     }
 
 
-def convert_size_bytes(size_bytes: int) -> Dict[str, Any]:
-    """转换字节大小为可读格式"""
-    if size_bytes == 0:
-        return {"bytes": 0, "readable": "0 B", "unit": "B"}
-
+@lru_cache(maxsize=4096)
+def _size_info_cached(size_bytes: int) -> Tuple[str, str, float]:
+    """计算字节大小的可读格式，返回(可读字符串, 单位, 数值)；相同大小只计算一次"""
     units = ["B", "KB", "MB", "GB", "TB", "PB"]
     unit_index = 0
     size = float(size_bytes)
@@ -85,37 +122,56 @@ def convert_size_bytes(size_bytes: int) -> Dict[str, Any]:
     else:
         readable = f"{size:.2f} {units[unit_index]}"
 
+    return readable, units[unit_index], round(size, 2)
+
+
+def convert_size_bytes(size_bytes: int) -> Dict[str, Any]:
+    """转换字节大小为可读格式"""
+    if size_bytes == 0:
+        return {"bytes": 0, "readable": "0 B", "unit": "B"}
+
+    # 每次返回新字典，调用方可以自由修改
+    readable, unit, value = _size_info_cached(size_bytes)
     return {
         "bytes": size_bytes,
         "readable": readable,
-        "unit": units[unit_index],
-        "value": round(size, 2)
+        "unit": unit,
+        "value": value
     }
 
 
-def merge_model_info(base_info: Dict[str, Any], additional_info: Dict[str, Any]) -> Dict[str, Any]:
-    """合并模型信息"""
-    merged = base_info.copy()
+def merge_model_info(base_info: Dict[str, Any], additional_info: Dict[str, Any],
+                     inplace: bool = False) -> Dict[str, Any]:
+    """合并模型信息
+
+    inplace为True时直接修改并返回base_info（调用方持有该字典时使用），省去一次复制
+    """
+    merged = base_info if inplace else base_info.copy()
+
+    # 覆盖前先取出原有的标签和元数据
+    base_tags = merged.get('tags') or []
+    base_metadata = merged.get('metadata') or {}
 
     # 更新基本字段
     for key, value in additional_info.items():
         if value is not None:
             merged[key] = value
 
-    # 合并标签
-    base_tags = merged.get('tags', [])
-    additional_tags = additional_info.get('tags', [])
+    # 合并标签，保持顺序去重（标签通常只有几个，集合判重比构建dict更快）
+    additional_tags = additional_info.get('tags')
     if additional_tags:
-        # 去重合并
-        all_tags = base_tags + additional_tags
-        merged['tags'] = list(dict.fromkeys(all_tags))  # 保持顺序去重
-
-    # 合并元数据
-    base_metadata = merged.get('metadata', {})
-    additional_metadata = additional_info.get('metadata', {})
+        seen = set()
+        tags = []
+        for tag in chain(base_tags, additional_tags):
+            if tag not in seen:
+                seen.add(tag)
+                tags.append(tag)
+        merged['tags'] = tags
+
+    # 合并元数据，不修改base_info中原有的元数据字典
+    additional_metadata = additional_info.get('metadata')
     if additional_metadata:
-        base_metadata.update(additional_metadata)
-        merged['metadata'] = base_metadata
+        merged['metadata'] = {**base_metadata, **additional_metadata}
 
     return merged
 
@@ -172,99 +228,76 @@ def extract_model_stats(models: List[Dict[str, Any]]) -> Dict[str, Any]:
             "average_size_gb": 0
         }
 
-    stats = {
+    # 计数和求和都交给C实现的Counter/sum，避免逐个模型更新字典
+    sizes = [size_gb for size_gb in (model.get('size_gb') for model in models) if size_gb]
+    total_size_gb = sum(sizes)
+
+    return {
         "total_models": len(models),
-        "by_source": {},
-        "by_type": {},
-        "total_downloads": 0,
-        "total_likes": 0,
-        "total_size_gb": 0,
-        "models_with_size": 0
+        "by_source": dict(Counter(model.get('source', 'unknown') for model in models)),
+        "by_type": dict(Counter(model.get('model_type', 'unknown') for model in models)),
+        "total_downloads": sum(model.get('downloads', 0) for model in models),
+        "total_likes": sum(model.get('likes', 0) for model in models),
+        "total_size_gb": total_size_gb,
+        "models_with_size": len(sizes),
+        # 计算平均大小
+        "average_size_gb": round(total_size_gb / len(sizes), 2) if sizes else 0
     }
 
-    for model in models:
-        # 按来源统计
-        source = model.get('source', 'unknown')
-        stats["by_source"][source] = stats["by_source"].get(source, 0) + 1
-
-        # 按类型统计
-        model_type = model.get('model_type', 'unknown')
-        stats["by_type"][model_type] = stats["by_type"].get(model_type, 0) + 1
-
-        # 下载和点赞统计
-        stats["total_downloads"] += model.get('downloads', 0)
-        stats["total_likes"] += model.get('likes', 0)
-
-        # 大小统计
-        size_gb = model.get('size_gb')
-        if size_gb:
-            stats["total_size_gb"] += size_gb
-            stats["models_with_size"] += 1
-
-    # 计算平均大小
-    if stats["models_with_size"] > 0:
-        stats["average_size_gb"] = round(stats["total_size_gb"] / stats["models_with_size"], 2)
-    else:
-        stats["average_size_gb"] = 0
-
-    return stats
-
 
 def build_search_filters(params: Dict[str, Any]) -> Dict[str, Any]:
     """构建搜索过滤器"""
+    get = params.get
     filters = {}
 
     # 文本搜索 - 支持'q'和'query'两种参数名
-    query = params.get('q', params.get('query', '')).strip()
+    query = get('q', get('query', '')).strip()
     if query:
         filters['query'] = query
 
     # 来源过滤
-    source = params.get('source', '').strip()
+    source = get('source', '').strip()
     if source:
         filters['source'] = source
 
     # 模型类型过滤
-    model_type = params.get('model_type', '').strip()
+    model_type = get('model_type', '').strip()
     if model_type:
         filters['model_type'] = model_type
 
     # 标签过滤
-    tags = params.get('tags', [])
+    tags = get('tags')
     if tags:
         filters['tags'] = tags
 
     # 推荐过滤
-    is_featured = params.get('is_featured')
+    is_featured = get('is_featured')
     if is_featured is not None:
         filters['is_featured'] = is_featured
 
     # 状态过滤
-    status = params.get('status', 'active')
-    filters['status'] = status
+    filters['status'] = get('status', 'active')
 
     return filters
 
 
+# 映射到HuggingFace API支持的排序字段
+_SORT_FIELD_MAPPING = {
+    'created_at': 'lastModified',
+    'updated_at': 'lastModified',
+    'downloads': 'downloads',
+    'likes': 'likes',
+    'last_modified': 'lastModified'
+}
+
+
 def build_sort_options(params: Dict[str, Any]) -> Dict[str, Any]:
     """构建排序选项"""
-    sort_by = params.get('sort_by', 'downloads')  # 默认按下载量排序
     sort_order = params.get('sort_order', 'desc')
 
-    # 映射到HuggingFace API支持的排序字段
-    sort_field_mapping = {
-        'created_at': 'lastModified',
-        'updated_at': 'lastModified',
-        'downloads': 'downloads',
-        'likes': 'likes',
-        'last_modified': 'lastModified'
-    }
-
-    # 如果sort_by不在映射中，默认使用downloads
-    mapped_sort_by = sort_field_mapping.get(sort_by, 'downloads')
-
     return {
-        'sort_by': mapped_sort_by,
+        # 如果sort_by不在映射中，默认使用downloads
+        'sort_by': _SORT_FIELD_MAPPING.get(params.get('sort_by', 'downloads'), 'downloads'),
         'sort_order': sort_order,
         'order_desc': sort_order.lower() == 'desc'
     }
@@ -280,6 +313,17 @@ def success_response(data: Any = None, message: str = "操作成功", code: int
     return format_response(data, message, code)
 
 
+def success_response_json(data_json: bytes, message: str = "操作成功", code: int = 200) -> bytes:
+    """成功响应（data为已序列化的JSON），只拼接外层字段，不重新编码data"""
+    return b''.join((
+        b'{"success":true,"message":', json.dumps(message, ensure_ascii=False).encode('utf-8'),
+        b',"data":', data_json,
+        b',"code":', str(code).encode('ascii'),
+        b',"timestamp":"', utc_now_iso().encode('ascii'), b'Z"',
+        b'}'
+    ))
+
+
 def error_response(message: str, code: str = "ERROR", details: Any = None) -> Dict[str, Any]:
     """错误响应"""
     return format_error_response(message, code, details)
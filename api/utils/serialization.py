@@ -0,0 +1,101 @@
+"""JSON序列化工具 - 优先使用orjson，未安装时回退到标准库json"""
+import dataclasses
+import decimal
+import json
+import uuid
+from typing import Any
+
+from flask import current_app, make_response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+
+def _default(obj: Any) -> Any:
+    """序列化orjson/json不支持的类型，与Flask默认行为保持一致"""
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    """序列化为UTF-8编码的JSON字节串"""
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, default=_default).encode('utf-8')
+
+
+def packb(obj: Any) -> bytes:
+    """序列化为MessagePack字节串，调用前需确认MSGPACK_AVAILABLE"""
+    return msgpack.packb(obj, use_bin_type=True, default=_default)
+
+
+def loads(data: Any) -> Any:
+    """反序列化JSON字符串或字节串"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class SocketIOJSON:
+    """供Flask-SocketIO/python-socketio编码数据包的JSON模块（需提供dumps/loads）"""
+
+    @staticmethod
+    def dumps(obj: Any, **kwargs: Any) -> str:
+        if not ORJSON_AVAILABLE:
+            kwargs.setdefault('default', _default)
+            return json.dumps(obj, **kwargs)
+        # orjson输出即为紧凑格式，忽略separators等格式化参数
+        return dumps_bytes(obj).decode('utf-8')
+
+    @staticmethod
+    def loads(s: Any, **kwargs: Any) -> Any:
+        if not ORJSON_AVAILABLE:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """基于orjson的Flask JSON提供者，用于jsonify等Flask自身的JSON响应"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if not ORJSON_AVAILABLE:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys)).decode('utf-8')
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        if not ORJSON_AVAILABLE:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+def output_json(data: Any, code: int, headers: dict = None):
+    """Flask-RESTful的JSON表示函数，替换默认的标准库json序列化"""
+    settings = current_app.config.get('RESTFUL_JSON', {})
+    if not ORJSON_AVAILABLE or settings or current_app.debug:
+        # 需要缩进等格式化选项时使用标准库
+        from flask_restful.representations.json import output_json as restful_output_json
+        return restful_output_json(data, code, headers)
+
+    resp = make_response(dumps_bytes(data) + b'\n', code)
+    resp.headers.extend(headers or {})
+    return resp
@@ -1,13 +1,39 @@
 """参数验证工具"""
 import re
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 
 from .exceptions import ValidationError
 
+# 模型ID和邮箱格式，模块加载时编译一次
+# HuggingFace格式: username/model-name
+_HF_MODEL_ID_RE = re.compile(r'^[a-zA-Z0-9]([a-zA-Z0-9\-_]+)?/[a-zA-Z0-9]([a-zA-Z0-9\-_.]+)?$', re.ASCII)
+# Ollama格式: model-name 或 model-name:tag（标签中的\w保持Unicode语义）
+_OLLAMA_MODEL_ID_RE = re.compile(r'^[a-zA-Z0-9]([a-zA-Z0-9\-_]+)?(:[\w\-_.]+)?$')
+_EMAIL_RE = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', re.ASCII)
+
+# 搜索参数的可选值，元组用于错误提示中保持顺序，集合用于成员检查
+_VALID_MODEL_TYPES = (
+    'text-generation', 'text-classification', 'text-to-text-generation',
+    'question-answering', 'fill-mask', 'token-classification',
+    'text-embedding', 'image-classification', 'image-to-text',
+    'text-to-image', 'automatic-speech-recognition', 'text-to-speech',
+    'conversational', 'code-generation'
+)
+_VALID_MODEL_TYPE_SET = frozenset(_VALID_MODEL_TYPES)
+_VALID_SORT_FIELDS = ('created_at', 'updated_at', 'name', 'downloads', 'likes', 'size')
+_VALID_SORT_FIELD_SET = frozenset(_VALID_SORT_FIELDS)
+
+
+def _to_int(value: Any) -> int:
+    """转换为整数，已是int时直接返回；其他输入交给int()，失败时抛出ValueError/TypeError"""
+    if type(value) is int:
+        return value
+    return int(value)
+
 
 def validate_search_params(params: Dict[str, Any]) -> Dict[str, Any]:
     """验证搜索参数"""
-    validated = {}
+    validated: Dict[str, Any] = {}
 
     # 查询关键词
     query = params.get('query', '').strip()
@@ -17,20 +43,20 @@ def validate_search_params(params: Dict[str, Any]) -> Dict[str, Any]:
 
     # 分页参数
     try:
-        page = int(params.get('page', 1))
+        page = _to_int(params.get('page', 1))
         if page < 1:
             raise ValidationError("页码必须大于0", field='page')
         validated['page'] = page
     except ValueError:
-        raise ValidationError("页码必须是数字", field='page')
+        raise ValidationError("页码必须是数字", field='page') from None
 
     try:
-        page_size = int(params.get('page_size', 20))
+        page_size = _to_int(params.get('page_size', 20))
         if page_size < 1 or page_size > 100:
             raise ValidationError("每页数量必须在1-100之间", field='page_size')
         validated['page_size'] = page_size
     except ValueError:
-        raise ValidationError("每页数量必须是数字", field='page_size')
+        raise ValidationError("每页数量必须是数字", field='page_size') from None
 
     # 来源过滤
     source = params.get('source', '').strip()
@@ -40,20 +66,12 @@ def validate_search_params(params: Dict[str, Any]) -> Dict[str, Any]:
 
     # 模型类型过滤
     model_type = params.get('model_type', '').strip()
-    if model_type:
-        valid_types = [
-            'text-generation', 'text-classification', 'text-to-text-generation',
-            'question-answering', 'fill-mask', 'token-classification',
-            'text-embedding', 'image-classification', 'image-to-text',
-            'text-to-image', 'automatic-speech-recognition', 'text-to-speech',
-            'conversational', 'code-generation'
-        ]
-        if model_type not in valid_types:
-            raise ValidationError(f"模型类型必须是以下之一: {', '.join(valid_types)}", field='model_type')
+    if model_type and model_type not in _VALID_MODEL_TYPE_SET:
+        raise ValidationError(f"模型类型必须是以下之一: {', '.join(_VALID_MODEL_TYPES)}", field='model_type')
     validated['model_type'] = model_type
 
     # 标签过滤
-    tags = params.get('tags', [])
+    tags: Any = params.get('tags', [])
     if isinstance(tags, str):
         tags = [tag.strip() for tag in tags.split(',') if tag.strip()]
     elif not isinstance(tags, list):
@@ -70,9 +88,8 @@ def validate_search_params(params: Dict[str, Any]) -> Dict[str, Any]:
 
     # 排序参数
     sort_by = params.get('sort_by', 'created_at').strip()
-    valid_sort_fields = ['created_at', 'updated_at', 'name', 'downloads', 'likes', 'size']
-    if sort_by not in valid_sort_fields:
-        raise ValidationError(f"排序字段必须是以下之一: {', '.join(valid_sort_fields)}", field='sort_by')
+    if sort_by not in _VALID_SORT_FIELD_SET:
+        raise ValidationError(f"排序字段必须是以下之一: {', '.join(_VALID_SORT_FIELDS)}", field='sort_by')
     validated['sort_by'] = sort_by
 
     # 排序方向
@@ -82,7 +99,7 @@ def validate_search_params(params: Dict[str, Any]) -> Dict[str, Any]:
     validated['sort_order'] = sort_order
 
     # 是否仅显示推荐模型
-    is_featured = params.get('is_featured')
+    is_featured: Any = params.get('is_featured')
     if is_featured is not None:
         if isinstance(is_featured, str):
             is_featured = is_featured.lower() in ['true', '1', 'yes']
@@ -107,41 +124,37 @@ def validate_model_id(model_id: str, source: Optional[str] = None) -> str:
 
     # 根据来源验证格式
     if source == 'huggingface':
-        # HuggingFace格式: username/model-name
-        pattern = r'^[a-zA-Z0-9]([a-zA-Z0-9\-_]+)?/[a-zA-Z0-9]([a-zA-Z0-9\-_.]+)?$'
-        if not re.match(pattern, model_id):
+        if not _HF_MODEL_ID_RE.match(model_id):
             raise ValidationError("HuggingFace模型ID格式不正确，应为'username/model-name'", field='model_id')
     elif source == 'ollama':
-        # Ollama格式: model-name 或 model-name:tag
-        pattern = r'^[a-zA-Z0-9]([a-zA-Z0-9\-_]+)?(:[\w\-_.]+)?$'
-        if not re.match(pattern, model_id):
+        if not _OLLAMA_MODEL_ID_RE.match(model_id):
             raise ValidationError("Ollama模型ID格式不正确，应为'model-name'或'model-name:tag'", field='model_id')
 
     return model_id
 
 
-def validate_pagination_params(page: Any, page_size: Any) -> tuple[int, int]:
+def validate_pagination_params(page: Any, page_size: Any) -> Tuple[int, int]:
     """验证分页参数"""
     try:
-        page = int(page) if page is not None else 1
+        page = _to_int(page) if page is not None else 1
         if page < 1:
             raise ValidationError("页码必须大于0", field='page')
     except (ValueError, TypeError):
-        raise ValidationError("页码必须是数字", field='page')
+        raise ValidationError("页码必须是数字", field='page') from None
 
     try:
-        page_size = int(page_size) if page_size is not None else 20
+        page_size = _to_int(page_size) if page_size is not None else 20
         if page_size < 1 or page_size > 100:
             raise ValidationError("每页数量必须在1-100之间", field='page_size')
     except (ValueError, TypeError):
-        raise ValidationError("每页数量必须是数字", field='page_size')
+        raise ValidationError("每页数量必须是数字", field='page_size') from None
 
     return page, page_size
 
 
 def validate_favorite_params(params: Dict[str, Any]) -> Dict[str, Any]:
     """验证收藏参数"""
-    validated = {}
+    validated: Dict[str, Any] = {}
 
     # 模型ID
     model_id = params.get('model_id', '').strip()
@@ -171,7 +184,7 @@ def validate_json_field(data: Any, field_name: str, required: bool = False) -> A
 
 
 def validate_string_field(value: Any, field_name: str, required: bool = False,
-                          min_length: int = 0, max_length: int = None) -> Optional[str]:
+                          min_length: int = 0, max_length: Optional[int] = None) -> Optional[str]:
     """验证字符串字段"""
     if value is None or value == '':
         if required:
@@ -193,7 +206,7 @@ def validate_string_field(value: Any, field_name: str, required: bool = False,
 
 
 def validate_integer_field(value: Any, field_name: str, required: bool = False,
-                           min_value: int = None, max_value: int = None) -> Optional[int]:
+                           min_value: Optional[int] = None, max_value: Optional[int] = None) -> Optional[int]:
     """验证整数字段"""
     if value is None:
         if required:
@@ -201,20 +214,20 @@ def validate_integer_field(value: Any, field_name: str, required: bool = False,
         return None
 
     try:
-        value = int(value)
+        number = _to_int(value)
     except (ValueError, TypeError):
-        raise ValidationError(f"{field_name}必须是整数", field=field_name)
+        raise ValidationError(f"{field_name}必须是整数", field=field_name) from None
 
-    if min_value is not None and value < min_value:
+    if min_value is not None and number < min_value:
         raise ValidationError(f"{field_name}不能小于{min_value}", field=field_name)
 
-    if max_value is not None and value > max_value:
+    if max_value is not None and number > max_value:
         raise ValidationError(f"{field_name}不能大于{max_value}", field=field_name)
 
-    return value
+    return number
 
 
-def validate_json(request, required_fields=None):
+def validate_json(request: Any, required_fields: Optional[List[str]] = None) -> Dict[str, Any]:
     """验证JSON请求数据"""
     if not request.is_json:
         raise ValidationError("请求必须是JSON格式")
@@ -231,15 +244,16 @@ def validate_json(request, required_fields=None):
     return data
 
 
-def validate_params(params, schema):
+def validate_params(params: Dict[str, Any], schema: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
     """验证参数"""
-    validated = {}
+    validated: Dict[str, Any] = {}
 
     for field, rules in schema.items():
         value = params.get(field)
+        required: bool = rules.get('required', False)
 
         # 检查必需字段
-        if rules.get('required', False) and value is None:
+        if required and value is None:
             raise ValidationError(f"缺少必需字段: {field}", field=field)
 
         # 如果值为空且不是必需字段，跳过验证
@@ -252,14 +266,14 @@ def validate_params(params, schema):
         if field_type == 'string':
             validated[field] = validate_string_field(
                 value, field,
-                required=rules.get('required', False),
+                required=required,
                 min_length=rules.get('min_length', 0),
                 max_length=rules.get('max_length')
             )
         elif field_type == 'integer':
             validated[field] = validate_integer_field(
                 value, field,
-                required=rules.get('required', False),
+                required=required,
                 min_value=rules.get('min_value'),
                 max_value=rules.get('max_value')
             )
@@ -274,8 +288,7 @@ def validate_email(email: str) -> str:
     if not email:
         raise ValidationError("邮箱不能为空", field='email')
 
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    if not re.match(pattern, email):
+    if not _EMAIL_RE.match(email):
         raise ValidationError("邮箱格式不正确", field='email')
 
     return email.lower().strip()
@@ -1,4 +1,7 @@
 from flask_socketio import SocketIO
+from socketio import PubSubManager
+
+from ..utils.serialization import SocketIOJSON
 
 # 全局SocketIO实例
 socketio = None
@@ -6,11 +9,15 @@ socketio = None
 def init_socketio(app):
     """初始化SocketIO"""
     global socketio
+    # 数据包日志会为每个客户端的每一帧格式化一条日志，默认关闭，排查问题时通过配置开启
+    packet_logging = app.config.get('SOCKETIO_LOGGER', False)
     socketio = SocketIO(
         app,
         cors_allowed_origins="*",
-        logger=True,
-        engineio_logger=True
+        async_mode=app.config.get('SOCKETIO_ASYNC_MODE', 'threading'),
+        json=SocketIOJSON,
+        logger=packet_logging,
+        engineio_logger=packet_logging
     )
     
     # 导入WebSocket事件处理器
@@ -20,4 +27,15 @@ def init_socketio(app):
     # 注册监控事件
     register_monitor_events(socketio)
     
-    return socketio 
\ No newline at end of file
+    return socketio
+
+
+def room_has_clients(room: str, namespace: str = '/') -> bool:
+    """房间内是否有本进程的客户端，广播前据此跳过空房间，省去数据包编码
+
+    使用消息队列跨进程广播时其他进程的客户端不可见，总是返回True
+    """
+    manager = socketio.server.manager
+    if isinstance(manager, PubSubManager):
+        return True
+    return bool(manager.rooms.get(namespace, {}).get(room)) 
\ No newline at end of file
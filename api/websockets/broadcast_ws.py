@@ -1,8 +1,8 @@
 import logging
-from datetime import datetime
 
 from flask_socketio import emit, join_room, leave_room
 from ..utils.event_queue import register_websocket_callbacks, EventType
+from ..utils.helpers import utc_now_iso
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +25,16 @@ def register_monitor_events(socketio):
             'event_type': 'system_metrics',
             'message': 'System metrics subscription successful'
         })
+        # 指标未变化时监控线程不推送，新订阅者先收到最近一次的指标
+        from ..services.monitor_service import monitor
+        metrics = monitor.get_system_metrics_snapshot()
+        if metrics:
+            emit('system_metrics', {
+                'type': 'system_metrics',
+                'metrics': metrics,
+                'timestamp': utc_now_iso(),
+                'interval': monitor.monitor_interval
+            })
         logger.info("Client subscribed to system metrics")
     
     @socketio.on('unsubscribe_system_metrics')
@@ -42,6 +52,16 @@ def register_monitor_events(socketio):
             'event_type': 'model_status',
             'message': 'Model status subscription successful'
         })
+        # 监控线程只推送变化的模型，新订阅者先收到一份全量快照
+        from ..services.monitor_service import monitor
+        models = monitor.get_model_status_snapshot()
+        if models:
+            emit('model_status', {
+                'type': 'model_status',
+                'models': models,
+                'timestamp': utc_now_iso(),
+                'interval': monitor.monitor_interval
+            })
         logger.info("Client subscribed to model status")
     
     @socketio.on('unsubscribe_model_status')
@@ -74,10 +94,14 @@ def register_monitor_events(socketio):
         logger.info("Monitor client disconnected")
 
 
+# 以下广播均不带回调，python-socketio对整个房间只编码一次数据包
+
 def _broadcast_system_metrics_from_queue(event_data):
     """从队列广播系统指标到订阅的客户端"""
     try:
-        from . import socketio
+        from . import socketio, room_has_clients
+        if not room_has_clients('system_metrics'):
+            return
         socketio.emit('system_metrics', event_data, room='system_metrics')
         logger.debug("System metrics broadcasted from queue")
     except Exception as e:
@@ -87,21 +111,27 @@ def _broadcast_system_metrics_from_queue(event_data):
 def _broadcast_model_status_from_queue(event_data):
     """从队列广播模型状态到订阅的客户端"""
     try:
-        from . import socketio
+        from . import socketio, room_has_clients
+        if not room_has_clients('model_status'):
+            return
         socketio.emit('model_status', event_data, room='model_status')
         logger.debug("Model status broadcasted from queue")
     except Exception as e:
         logger.error(f"Failed to broadcast model status: {e}")
 
 
-def _broadcast_notification_from_queue(event_data):
-    """从队列广播通知到订阅的客户端"""
+def _broadcast_notifications_from_queue(events):
+    """从队列批量广播通知到订阅的客户端，发送完成（或无订阅者）后确认发件箱中的记录"""
     try:
-        from . import socketio
-        socketio.emit('notification', event_data, room='notifications')
-        logger.debug(f"Notification broadcasted from queue: {event_data.get('notification', {}).get('type')} - {event_data.get('notification', {}).get('message')}")
+        from . import socketio, room_has_clients
+        from ..services.notification_service import notification_service
+        if room_has_clients('notifications'):
+            for event_data in events:
+                socketio.emit('notification', event_data, room='notifications')
+            logger.debug("Notifications broadcasted from queue: %d notifications", len(events))
+        notification_service.ack_notifications([event_data['notification']['id'] for event_data in events])
     except Exception as e:
-        logger.error(f"Failed to broadcast notification: {e}")
+        logger.error(f"Failed to broadcast notifications: {e}")
 
 
 def init_websocket_event_system():
@@ -111,10 +141,15 @@ def init_websocket_event_system():
         callbacks = {
             EventType.SYSTEM_METRICS: _broadcast_system_metrics_from_queue,
             EventType.MODEL_STATUS: _broadcast_model_status_from_queue,
-            EventType.NOTIFICATION: _broadcast_notification_from_queue
+            EventType.NOTIFICATION: _broadcast_notifications_from_queue
         }
         
-        register_websocket_callbacks(callbacks)
+        # 通知按批广播，一次唤醒取出的通知只需一次回调
+        register_websocket_callbacks(callbacks, batch_types=(EventType.NOTIFICATION,))
+        
+        # 下载进度按时间窗口合并后推送
+        from .download_ws import start_progress_flusher
+        start_progress_flusher()
         logger.info("WebSocket event system initialized with queue callbacks")
         
     except Exception as e:
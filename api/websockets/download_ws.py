@@ -1,11 +1,29 @@
 import logging
-from datetime import datetime
+import threading
 from flask_socketio import emit, join_room, leave_room
-from . import socketio
+from . import socketio, room_has_clients
+from ..config import Config
 from ..models.download_task import DownloadTask
+from ..utils.helpers import utc_now_iso
+from ..utils.serialization import MSGPACK_AVAILABLE, packb
 
 logger = logging.getLogger(__name__)
 
+# 待推送的下载进度：任务ID -> 最新进度，合并窗口内只保留最后一次
+_pending_progress = {}
+_pending_lock = threading.Lock()
+_flusher_started = False
+
+
+def _task_rooms(task_id: str) -> list:
+    """任务的全部订阅房间：JSON进度订阅者与二进制进度订阅者分属两个房间"""
+    return [f'download_{task_id}', f'download_{task_id}_bin']
+
+
+def _subscribed_rooms(task_id: str) -> list:
+    """任务房间中有客户端的部分，为空时无需编码和推送"""
+    return [room for room in _task_rooms(task_id) if room_has_clients(room)]
+
 
 @socketio.on('connect')
 def on_connect():
@@ -35,8 +53,9 @@ def on_subscribe_download(data):
             emit('error', {'message': f'下载任务 {task_id} 不存在'})
             return
         
-        # 加入房间以接收该任务的进度更新
-        join_room(f'download_{task_id}')
+        # 加入房间以接收该任务的进度更新；binary为真且支持MessagePack时进度以二进制帧推送
+        binary = bool(data.get('binary')) and MSGPACK_AVAILABLE
+        join_room(f'download_{task_id}_bin' if binary else f'download_{task_id}')
         
         # 发送当前状态
         emit('download_status', {
@@ -45,7 +64,8 @@ def on_subscribe_download(data):
             'progress': float(task.progress) if task.progress else 0,
             'download_size': task.download_size or 0,
             'total_size': task.total_size,
-            'download_speed': float(task.download_speed) if task.download_speed else 0
+            'download_speed': float(task.download_speed) if task.download_speed else 0,
+            'binary': binary
         })
         
         logger.info(f"Client subscribed to download task: {task_id}")
@@ -65,7 +85,8 @@ def on_unsubscribe_download(data):
             return
         
         # 离开房间
-        leave_room(f'download_{task_id}')
+        for room in _task_rooms(task_id):
+            leave_room(room)
         emit('unsubscribed', {'task_id': task_id})
         
         logger.info(f"Client unsubscribed from download task: {task_id}")
@@ -75,27 +96,86 @@ def on_unsubscribe_download(data):
         emit('error', {'message': '取消订阅失败'})
 
 
-def broadcast_download_progress(task_id: str, progress_data: dict):
-    """广播下载进度"""
+def _emit_progress(task_id: str, progress_data: dict):
+    """推送单个任务的下载进度，JSON和二进制订阅者各编码一次"""
     try:
-        socketio.emit('download_progress', {
-            'task_id': task_id,
-            **progress_data
-        }, room=f'download_{task_id}')
+        payload = {'task_id': task_id, **progress_data}
+        room = f'download_{task_id}'
+        if room_has_clients(room):
+            socketio.emit('download_progress', payload, room=room)
+        
+        bin_room = f'download_{task_id}_bin'
+        if MSGPACK_AVAILABLE and room_has_clients(bin_room):
+            socketio.emit('download_progress_bin', packb(payload), room=bin_room)
         
     except Exception as e:
         logger.error(f"Failed to broadcast download progress: {str(e)}")
 
 
+def _flush_task_progress(task_id: str):
+    """立即推送任务尚未发出的进度，保证进度先于状态变更到达客户端"""
+    with _pending_lock:
+        progress_data = _pending_progress.pop(task_id, None)
+    if progress_data is not None:
+        _emit_progress(task_id, progress_data)
+
+
+def _progress_flusher(interval: float):
+    """后台任务：每个合并窗口结束时推送各任务的最新进度"""
+    global _pending_progress
+    logger.info("Download progress flusher started")
+    
+    while True:
+        socketio.sleep(interval)
+        with _pending_lock:
+            if not _pending_progress:
+                continue
+            pending, _pending_progress = _pending_progress, {}
+        
+        for task_id, progress_data in pending.items():
+            _emit_progress(task_id, progress_data)
+
+
+def start_progress_flusher():
+    """启动下载进度合并推送的后台任务（只启动一次）"""
+    global _flusher_started
+    with _pending_lock:
+        if _flusher_started:
+            return
+        _flusher_started = True
+    socketio.start_background_task(_progress_flusher, Config.DOWNLOAD_PROGRESS_FLUSH_INTERVAL)
+
+
+def broadcast_download_progress(task_id: str, progress_data: dict):
+    """广播下载进度
+
+    进度回调频率很高，这里只记录最新进度，由后台任务按合并窗口统一推送；
+    后台任务未启动时直接推送
+    """
+    if not _subscribed_rooms(task_id):
+        return
+
+    if not _flusher_started:
+        _emit_progress(task_id, progress_data)
+        return
+    
+    with _pending_lock:
+        _pending_progress[task_id] = progress_data
+
+
 def broadcast_download_status(task_id: str, status: str, message: str = None):
     """广播下载状态变更"""
+    _flush_task_progress(task_id)
     try:
+        rooms = _subscribed_rooms(task_id)
+        if not rooms:
+            return
         socketio.emit('download_status_change', {
             'task_id': task_id,
             'status': status,
             'message': message,
-            'timestamp': str(datetime.utcnow())
-        }, room=f'download_{task_id}')
+            'timestamp': utc_now_iso()
+        }, to=rooms)
         
     except Exception as e:
         logger.error(f"Failed to broadcast download status: {str(e)}")
@@ -103,12 +183,16 @@ def broadcast_download_status(task_id: str, status: str, message: str = None):
 
 def broadcast_download_completed(task_id: str, file_path: str):
     """广播下载完成"""
+    _flush_task_progress(task_id)
     try:
+        rooms = _subscribed_rooms(task_id)
+        if not rooms:
+            return
         socketio.emit('download_completed', {
             'task_id': task_id,
             'file_path': file_path,
-            'timestamp': str(datetime.utcnow())
-        }, room=f'download_{task_id}')
+            'timestamp': utc_now_iso()
+        }, to=rooms)
         
 
         
@@ -118,11 +202,15 @@ def broadcast_download_completed(task_id: str, file_path: str):
 
 def broadcast_download_failed(task_id: str):
     """广播下载失败"""
+    _flush_task_progress(task_id)
     try:
+        rooms = _subscribed_rooms(task_id)
+        if not rooms:
+            return
         socketio.emit('download_failed', {
             'task_id': task_id,
-            'timestamp': str(datetime.utcnow())
-        }, room=f'download_{task_id}')
+            'timestamp': utc_now_iso()
+        }, to=rooms)
         
 
         
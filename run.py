@@ -5,7 +5,18 @@ LLM Manager API 启动脚本
 import os
 import sys
 
+# 协程模式必须在导入应用及其依赖之前打补丁，否则socket/threading等模块仍为阻塞实现
+ASYNC_MODE = os.getenv('SOCKETIO_ASYNC_MODE', 'threading')
+if ASYNC_MODE == 'eventlet':
+    import eventlet
+    eventlet.monkey_patch()
+elif ASYNC_MODE == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
 from api.app import create_app
+from api.services.health_scheduler import start_health_scheduler
+from api.services.notification_service import notification_service
 
 
 def main():
@@ -22,20 +33,32 @@ def main():
     port = int(os.getenv('PORT', 5000))
     debug = app.config.get('DEBUG', False)
 
+    # 部署健康检查调度只在API服务进程中运行：它会把看不到进程的部署标记为已停止，
+    # 与API不在同一主机/容器的Celery worker不能运行它；调试模式下只在重载器启动的子进程中运行
+    reloader_parent = debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+    if not reloader_parent:
+        if app.config.get('DEPLOYMENT_HEALTH_SCHEDULER_ENABLED', True):
+            start_health_scheduler(app)
+        # 通知发件箱同理只在负责WebSocket广播的API服务进程中启用并重放：发件箱表在进程间共享，
+        # 其他进程重放会重复推送仍在广播中的通知
+        notification_service.start_outbox(app)
+
     print(f"🚀 启动 LLM Manager API")
     print(f"📍 环境: {os.getenv('FLASK_ENV', 'development')}")
     print(f"🌐 地址: http://{host}:{port}")
     print(f"🔧 调试模式: {'开启' if debug else '关闭'}")
+    print(f"⚡ 并发模式: {app.socketio.async_mode}")
     print(f"📝 API文档: http://{host}:{port}/")
     print(f"❤️  健康检查: http://{host}:{port}/health")
 
-    # 启动应用
+    # 启动应用：由Flask-SocketIO选择与async_mode匹配的服务器（eventlet/gevent或Werkzeug）
     try:
-        app.run(
+        app.socketio.run(
+            app,
             host=host,
             port=port,
             debug=debug,
-            threaded=True
+            allow_unsafe_werkzeug=True
         )
     except KeyboardInterrupt:
         print("\n👋 应用已停止")
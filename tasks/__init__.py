@@ -1,4 +1,5 @@
 from celery import Celery
+from celery.signals import worker_init, worker_process_init
 
 from api.config import Config
 
@@ -7,19 +8,60 @@ celery = Celery(
     'llm-manager',
     broker=Config.CELERY_BROKER_URL,
     backend=Config.CELERY_RESULT_BACKEND,
-    include=['tasks.download_tasks']
+    include=['tasks.download_tasks', 'tasks.deployment_tasks']
 )
 
 # Celery配置
 celery.conf.update(
-    task_serializer='json',
-    accept_content=['json'],
-    result_serializer='json',
+    # 消息与结果使用MessagePack：下载进度在每个数据块都会写入结果后端，二进制编码更小更快；
+    # 继续接受json，升级期间旧版本投递的消息仍可处理
+    task_serializer='msgpack',
+    accept_content=['msgpack', 'json'],
+    result_serializer='msgpack',
+    result_accept_content=['msgpack', 'json'],
     timezone='UTC',
     enable_utc=True,
     task_track_started=True,
     task_time_limit=30 * 60,  # 30分钟超时
     task_soft_time_limit=25 * 60,  # 25分钟软超时
     worker_prefetch_multiplier=1,
+    # 任务开始执行即确认：worker异常退出时不重新投递，避免从头重复下载数GB的模型
+    task_acks_late=False,
+    # 未使用任务限速，关闭限速记账
+    worker_disable_rate_limits=True,
     worker_max_tasks_per_child=1000,
+    # 下载任务走独立队列，避免长时间下载占满默认队列
+    task_routes={'tasks.download_tasks.*': {'queue': 'downloads'}},
 )
+
+
+@worker_init.connect
+def use_worker_engine_options(**kwargs):
+    """worker启动时（创建Flask应用之前）切换为worker专用的数据库连接池配置"""
+    Config.SQLALCHEMY_ENGINE_OPTIONS = Config.WORKER_SQLALCHEMY_ENGINE_OPTIONS
+
+
+@worker_process_init.connect
+def reset_db_connections(**kwargs):
+    """fork出的worker进程丢弃继承自父进程的数据库连接，由各进程重新建立连接池"""
+    from api.models.model import db
+
+    for engine in list(getattr(db, '_app_engines', {}).values()):
+        for bind_engine in engine.values():
+            bind_engine.dispose(close=False)
+
+
+def get_flask_app():
+    """获取worker进程内共享的Flask应用
+
+    api.app在导入时创建应用实例，每个进程只创建一次；延迟导入避免与服务层的循环依赖
+    """
+    from api.app import app
+
+    return app
+
+
+@worker_process_init.connect
+def init_flask_app(**kwargs):
+    """worker进程启动时预先创建Flask应用，第一个任务无需承担应用初始化开销"""
+    get_flask_app()
@@ -1,12 +1,16 @@
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from celery import chord
+
+from api.config import Config
 from api.models.deployment import Deployment
 from api.models.model import db
 from api.services.deployment_service import DeploymentService
 from api.services.system_service import SystemService
-from . import celery
+from . import celery, get_flask_app
 
 logger = logging.getLogger(__name__)
 
@@ -90,52 +94,86 @@ def auto_deploy_task(self, model_id, source, name, config=None):
         }
 
 
+def _check_deployments_health(deployments):
+    """并发检查一组已加载部署的健康状态，返回每个部署的简要结果
+
+    任务可能运行在任意主机的worker上，看不到部署进程，只检查服务端口，不修改部署状态
+    """
+    # 复用已加载的部署对象，所有部署的服务端口并发检查
+    health_results = DeploymentService().check_all_health(deployments=deployments, probe_only=True)
+
+    return [
+        {
+            'deployment_id': deployment.id,
+            'name': deployment.name,
+            'healthy': result.get('healthy', False),
+            'status': result.get('status', 'unknown')
+        }
+        for deployment, result in zip(deployments, health_results)
+    ]
+
+
+def _summarize_health_results(results):
+    """汇总批量健康检查结果"""
+    total = len(results)
+    healthy_count = sum(1 for r in results if r.get('healthy'))
+    unhealthy_count = total - healthy_count
+
+    logger.info(f"Batch health check completed: {healthy_count}/{total} healthy")
+    return {
+        'total': total,
+        'healthy': healthy_count,
+        'unhealthy': unhealthy_count,
+        'results': results,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+
+@celery.task(name='deployment.health_check_chunk')
+def health_check_chunk_task(deployment_ids):
+    """Health check for one chunk of a distributed batch health check"""
+    with get_flask_app().app_context():
+        deployments = Deployment.query.filter(Deployment.id.in_(deployment_ids)).all()
+        return _check_deployments_health(deployments)
+
+
+@celery.task(name='deployment.summarize_health_check')
+def summarize_health_check_task(chunk_results):
+    """Chord callback: merge chunk results into one batch summary"""
+    return _summarize_health_results([r for chunk in chunk_results for r in chunk])
+
+
 @celery.task(bind=True, name='deployment.batch_health_check')
 def batch_health_check_task(self):
-    """Batch health check task"""
+    """Batch health check task
+
+    部署数量超过DEPLOYMENT_HEALTH_FANOUT_SIZE时按块分发到多个worker并行检查，
+    汇总结果由chord回调任务返回，本任务只返回chord的任务ID
+    """
     try:
         logger.info("Starting batch health check")
 
         # Get all running deployments
         active_deployments = Deployment.get_active_deployments()
 
-        results = []
-        deployment_service = DeploymentService()
+        chunk_size = Config.DEPLOYMENT_HEALTH_FANOUT_SIZE
+        if len(active_deployments) <= chunk_size:
+            return _summarize_health_results(_check_deployments_health(active_deployments))
 
-        for deployment in active_deployments:
-            try:
-                result = deployment_service.check_deployment_health(deployment.id)
-                results.append({
-                    'deployment_id': deployment.id,
-                    'name': deployment.name,
-                    'healthy': result.get('healthy', False),
-                    'status': result.get('status', 'unknown')
-                })
-            except Exception as e:
-                logger.error(f"Health check failed {deployment.id}: {str(e)}")
-                results.append({
-                    'deployment_id': deployment.id,
-                    'name': deployment.name,
-                    'healthy': False,
-                    'error': str(e)
-                })
-
-        # Calculate results
-        total = len(results)
-        healthy_count = sum(1 for r in results if r.get('healthy'))
-        unhealthy_count = total - healthy_count
-
-        summary = {
-            'total': total,
-            'healthy': healthy_count,
-            'unhealthy': unhealthy_count,
-            'results': results,
+        ids = [deployment.id for deployment in active_deployments]
+        chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+        result = chord(
+            health_check_chunk_task.s(chunk) for chunk in chunks
+        )(summarize_health_check_task.s())
+
+        logger.info(f"Batch health check fanned out: {len(ids)} deployments in {len(chunks)} chunks")
+        return {
+            'total': len(ids),
+            'chunks': len(chunks),
+            'summary_task_id': result.id,
             'timestamp': datetime.utcnow().isoformat()
         }
 
-        logger.info(f"Batch health check completed: {healthy_count}/{total} healthy")
-        return summary
-
     except Exception as e:
         logger.error(f"Batch health check task failed: {str(e)}")
         return {
@@ -157,25 +195,31 @@ def cleanup_failed_deployments_task(self):
             Deployment.updated_at < cutoff_time
         ).all()
 
-        cleaned_count = 0
         deployment_service = DeploymentService()
 
-        for deployment in failed_deployments:
+        def stop_resources(deployment):
+            """Clean up resources, returns whether the record can be deleted"""
+            if not deployment.container_id:
+                return True
             try:
-                # Clean up resources
-                if deployment.container_id:
-                    deployment_service._stop_container(deployment.container_id)
-
-                # Delete deployment record
-                db.session.delete(deployment)
-                cleaned_count += 1
-
-                logger.info(f"Cleaned up failed deployment: {deployment.id}")
-
+                return deployment_service._stop_container(deployment.container_id)
             except Exception as e:
                 logger.error(f"Failed to cleanup deployment {deployment.id}: {str(e)}")
-
-        if cleaned_count > 0:
+                return False
+
+        # Docker容器停止可能各需数秒，并发执行
+        ids_to_delete = []
+        if failed_deployments:
+            with ThreadPoolExecutor(max_workers=min(8, len(failed_deployments))) as executor:
+                for deployment, stopped in zip(failed_deployments, executor.map(stop_resources, failed_deployments)):
+                    if stopped:
+                        ids_to_delete.append(deployment.id)
+                        logger.info(f"Cleaned up failed deployment: {deployment.id}")
+
+        # 资源已清理的部署记录一条DELETE删除
+        cleaned_count = len(ids_to_delete)
+        if ids_to_delete:
+            Deployment.query.filter(Deployment.id.in_(ids_to_delete)).delete(synchronize_session=False)
             db.session.commit()
 
         logger.info(f"Cleanup completed, cleaned {cleaned_count} failed deployments")
@@ -264,33 +308,30 @@ def restart_unhealthy_deployments_task(self):
     try:
         logger.info("Starting check and restart unhealthy deployments")
 
-        # Get all running deployments
-        active_deployments = Deployment.query.filter(
-            Deployment.status == 'running'
-        ).all()
-
+        # Check all running deployments concurrently
         restarted_count = 0
         deployment_service = DeploymentService()
+        health_results = deployment_service.check_all_health()
 
-        for deployment in active_deployments:
-            try:
-                # Check health status
-                health_result = deployment_service.check_deployment_health(deployment.id)
+        for health_result in health_results:
+            if health_result.get('healthy'):
+                continue
 
-                if not health_result.get('healthy'):
-                    logger.warning(f"Found unhealthy deployment: {deployment.id}, attempting restart")
+            deployment_id = health_result['deployment_id']
+            try:
+                logger.warning(f"Found unhealthy deployment: {deployment_id}, attempting restart")
 
-                    # Restart deployment
-                    restart_result = deployment_service.restart_deployment(deployment.id)
+                # Restart deployment
+                restart_result = deployment_service.restart_deployment(deployment_id)
 
-                    if restart_result:
-                        restarted_count += 1
-                        logger.info(f"Deployment restart successful: {deployment.id}")
-                    else:
-                        logger.error(f"Deployment restart failed: {deployment.id}")
+                if restart_result:
+                    restarted_count += 1
+                    logger.info(f"Deployment restart successful: {deployment_id}")
+                else:
+                    logger.error(f"Deployment restart failed: {deployment_id}")
 
             except Exception as e:
-                logger.error(f"Check/restart deployment failed {deployment.id}: {str(e)}")
+                logger.error(f"Check/restart deployment failed {deployment_id}: {str(e)}")
 
         logger.info(f"Restart unhealthy deployments completed, restarted {restarted_count} deployments")
         return {
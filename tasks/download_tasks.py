@@ -2,26 +2,51 @@ import logging
 import os
 import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+from celery import group
+from sqlalchemy import update
 
 from api.config import Config
 from api.integrations.huggingface_client import HuggingFaceClient
 from api.integrations.ollama_client import OllamaClient
 from api.models.download_task import DownloadTask
 from api.models.model import db
-from . import celery
+from api.services.download_service import STOP_FLAG_PREFIX
+from . import celery, get_flask_app
 
 logger = logging.getLogger(__name__)
 
+# 清理失败下载文件的并发线程数
+CLEANUP_WORKERS = 8
+
+# 下载速度平滑的时间窗口（秒），速度反映最近约1秒的吞吐
+SPEED_SMOOTHING_WINDOW = 1.0
+
+# 读取停止标记的Redis客户端，worker进程内首次使用时创建
+_stop_flag_client = None
 
-@celery.task(bind=True)
+
+def _stop_requested(task_id: str) -> bool:
+    """检查API是否已请求停止该任务，Redis不可用时返回False（由定期的数据库查询兜底）"""
+    global _stop_flag_client
+    try:
+        if _stop_flag_client is None:
+            _stop_flag_client = redis.from_url(
+                Config.REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5
+            )
+        return bool(_stop_flag_client.exists(f"{STOP_FLAG_PREFIX}{task_id}"))
+    except redis.RedisError as e:
+        logger.debug(f"Failed to read download stop flag {task_id}: {e}")
+        return False
+
+
+@celery.task(bind=True, acks_late=False, reject_on_worker_lost=False)
 def download_model_task(self, task_id: str):
     """下载模型的异步任务"""
-    # 延迟导入避免循环依赖
-    from api.app import create_app
-
-    # 创建应用上下文
-    app = create_app()
-    with app.app_context():
+    # 复用进程内的应用，每个任务使用独立的应用上下文，结束时释放数据库会话
+    with get_flask_app().app_context():
         task = None
         try:
             # 获取任务
@@ -81,35 +106,69 @@ def _download_huggingface_model_with_snapshot(task: DownloadTask, celery_task) -
         # 确保目录存在
         os.makedirs(model_dir, exist_ok=True)
 
+        # 进度回调的状态，由闭包捕获
+        start_time = time.time()
+        state = {
+            'last_ts': start_time,
+            'last_bytes': None,
+            'speed': 0.0,
+            'last_commit_ts': 0.0,
+            'last_pct': 0.0,
+            'last_status_check': start_time
+        }
+
         # 定义进度回调函数
         def progress_callback(progress_info):
-            """进度回调函数"""
+            """进度回调函数
+
+            每个数据块都会回调：Celery状态每次更新，数据库进度按时间间隔或进度增量节流写入；
+            停止请求通过Redis标记检查，数据库中的任务状态只定期查询兜底
+            """
             try:
-                # 检查任务状态
-                current_task = DownloadTask.query.get(task.id)
-                if current_task.status != 'downloading':
-                    logger.info(f"Task {task.id} status changed to {current_task.status}, stopping download")
+                # 检查停止标记
+                if _stop_requested(task.id):
+                    logger.info(f"Task {task.id} stop requested, stopping download")
                     return
 
                 downloaded_size = progress_info['downloaded_size']
                 total_size = progress_info['total_size']
                 progress_percent = progress_info['progress_percent']
 
-                # 计算下载速度（简单估算）
+                # 当前下载速度：瞬时速度的指数加权移动平均，权重随两次回调的间隔增大
                 current_time = time.time()
-                if not hasattr(progress_callback, 'start_time'):
-                    progress_callback.start_time = current_time
-                    progress_callback.last_downloaded = 0
-
-                elapsed_time = current_time - progress_callback.start_time
-                if elapsed_time > 0:
-                    speed = downloaded_size / elapsed_time
-                else:
-                    speed = 0
-
-                # 更新任务进度
-                task.update_progress(downloaded_size, total_size, speed)
-                db.session.commit()
+                interval = current_time - state['last_ts']
+                if state['last_bytes'] is None:
+                    # 第一次回调的已下载量可能包含断点续传前的部分，只作为基准
+                    state['last_ts'] = current_time
+                    state['last_bytes'] = downloaded_size
+                elif interval > 0:
+                    instant_speed = max(downloaded_size - state['last_bytes'], 0) / interval
+                    state['speed'] += min(interval / SPEED_SMOOTHING_WINDOW, 1.0) * (instant_speed - state['speed'])
+                    state['last_ts'] = current_time
+                    state['last_bytes'] = downloaded_size
+                speed = state['speed']
+
+                should_commit = (
+                    current_time - state['last_commit_ts'] >= Config.DOWNLOAD_PROGRESS_COMMIT_INTERVAL
+                    or progress_percent - state['last_pct'] >= Config.DOWNLOAD_PROGRESS_COMMIT_DELTA
+                )
+                # 定期查询数据库确认任务状态
+                if current_time - state['last_status_check'] >= Config.DOWNLOAD_STATUS_CHECK_INTERVAL:
+                    state['last_status_check'] = current_time
+                    current_task = DownloadTask.query.get(task.id)
+                    if current_task.status != 'downloading':
+                        logger.info(f"Task {task.id} status changed to {current_task.status}, stopping download")
+                        return
+
+                if should_commit:
+                    # 更新任务进度
+                    task.update_progress(downloaded_size, total_size, speed)
+                    db.session.commit()
+                    state['last_commit_ts'] = current_time
+                    state['last_pct'] = progress_percent
+
+                    logger.info(f"Download progress: {progress_percent:.1f}% ({downloaded_size}/{total_size} bytes), "
+                                f"speed: {speed / 1024 / 1024:.2f} MB/s, file: {progress_info['filename']}")
 
                 # 更新Celery任务状态
                 celery_task.update_state(
@@ -124,9 +183,6 @@ def _download_huggingface_model_with_snapshot(task: DownloadTask, celery_task) -
                     }
                 )
 
-                logger.info(f"Download progress: {progress_percent:.1f}% ({downloaded_size}/{total_size} bytes), "
-                            f"speed: {speed / 1024 / 1024:.2f} MB/s, file: {progress_info['filename']}")
-
             except Exception as e:
                 logger.error(f"Failed to update progress: {e}")
 
@@ -142,7 +198,8 @@ def _download_huggingface_model_with_snapshot(task: DownloadTask, celery_task) -
             local_dir=model_dir,
             progress_callback=progress_callback,
             ignore_patterns=ignore_patterns,
-            resume_download=True  # 启用断点续传
+            resume_download=True,  # 启用断点续传
+            max_workers=Config.HF_DOWNLOAD_MAX_WORKERS
         )
 
         # 更新任务状态为完成
@@ -191,6 +248,25 @@ def _download_ollama_model(task: DownloadTask, celery_task) -> dict:
         raise
 
 
+def _log_remove_error(func, path, exc_info):
+    """rmtree的错误回调，记录后继续删除其余文件"""
+    if not issubclass(exc_info[0], FileNotFoundError):
+        logger.error(f"Failed to delete {path}: {exc_info[1]}")
+
+
+def _remove_entry(path: str):
+    """删除单个文件或目录树"""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, onerror=_log_remove_error)
+        return
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.error(f"Failed to delete {path}: {e}")
+
+
 @celery.task
 def cleanup_failed_downloads():
     """清理失败的下载任务"""
@@ -200,19 +276,31 @@ def cleanup_failed_downloads():
             DownloadTask.status == 'failed'
         ).all()
 
+        # 模型目录的顶层条目拆分为独立的删除任务，大目录的unlink由多个线程并行完成
+        roots = []
+        entries = []
         for task in failed_tasks:
+            logger.info(f"Cleaning up failed download task: {task.id}")
+            path = task.file_path
+            if not path:
+                continue
             try:
-                # 删除部分下载的文件
-                if task.file_path and os.path.exists(task.file_path):
-                    if os.path.isfile(task.file_path):
-                        os.remove(task.file_path)
-                    elif os.path.isdir(task.file_path):
-                        shutil.rmtree(task.file_path)
+                if os.path.isdir(path) and not os.path.islink(path):
+                    roots.append(path)
+                    with os.scandir(path) as it:
+                        entries.extend(entry.path for entry in it)
+                elif os.path.lexists(path):
+                    entries.append(path)
+            except OSError as e:
+                logger.error(f"Failed to cleanup task {task.id}: {str(e)}")
 
-                logger.info(f"Cleaning up failed download task: {task.id}")
+        if entries:
+            with ThreadPoolExecutor(max_workers=CLEANUP_WORKERS) as executor:
+                list(executor.map(_remove_entry, entries))
 
-            except Exception as e:
-                logger.error(f"Failed to cleanup task {task.id}: {str(e)}")
+        # 条目删除完成后再删除已清空的模型目录
+        for root in roots:
+            shutil.rmtree(root, onerror=_log_remove_error)
 
         return {"cleaned_tasks": len(failed_tasks)}
 
@@ -225,30 +313,27 @@ def cleanup_failed_downloads():
 def retry_failed_downloads():
     """重试失败的下载任务"""
     try:
-        # 获取可重试的失败任务
-        retry_tasks = DownloadTask.query.filter(
-            DownloadTask.status == 'failed'
-        ).all()
-
-        retried_count = 0
-        for task in retry_tasks:
-            try:
-                # 重置任务状态
-                task.status = 'pending'
-                db.session.commit()
-
-                # 重新启动下载
-                download_model_task.delay(task.id)
-                retried_count += 1
-
-                logger.info(f"Retrying download task: {task.id}")
+        # 一条UPDATE重置所有失败任务的状态，只投递本次实际被重置的任务，
+        # 避免与其他操作（如取消、删除、并发重试）竞争时重复投递
+        result = db.session.execute(
+            update(DownloadTask)
+            .where(DownloadTask.status == 'failed')
+            .values(status='pending')
+            .returning(DownloadTask.id)
+        )
+        task_ids = [row.id for row in result]
+        db.session.commit()
+        if not task_ids:
+            return {"retried_tasks": 0}
 
-            except Exception as e:
-                logger.error(f"Failed to retry task {task.id}: {str(e)}")
+        # 一次性投递所有重新下载任务
+        group(download_model_task.s(task_id) for task_id in task_ids).apply_async()
+        logger.info(f"Retrying download tasks: {', '.join(task_ids)}")
 
-        return {"retried_tasks": retried_count}
+        return {"retried_tasks": len(task_ids)}
 
     except Exception as e:
+        db.session.rollback()
         logger.error(f"Error retrying failed download tasks: {str(e)}")
         return {"error": str(e)}
 